@@ -0,0 +1,48 @@
+# api/management/commands/backfill_question_fingerprints.py
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+
+from api.models import GenerationSession, QuestionFingerprint, QuestionSet, SavedQuiz, SessionQuestion
+from api.views import find_category_for_topic
+
+
+class Command(BaseCommand):
+    help = (
+        "Llena el índice global de enunciados servidos (QuestionFingerprint) desde "
+        "GenerationSession.latest_preview y SavedQuiz.questions (sus QuestionSet, o las filas "
+        "SessionQuestion de las sesiones editadas pregunta a pregunta). Es idempotente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Filas leídas por lote")
+
+    def handle(self, *args, **opts):
+        batch = max(1, opts["batch_size"])
+        total = 0
+        for model in (GenerationSession, SavedQuiz):
+            rows = (model.objects.exclude(question_set=None)
+                    .values_list("topic", "category", "difficulty", "question_set_id").order_by())
+            n = 0
+            for topic, category, difficulty, digest in rows.iterator(chunk_size=batch):
+                category = category or find_category_for_topic(topic)
+                n += QuestionFingerprint.record(category, difficulty, QuestionSet.load(digest))
+            self.stdout.write(f"{model.__name__}: {n} huellas registradas")
+            total += n
+
+        # sesiones sin question_set: el preview son sus filas, en orden de posición
+        rows = (SessionQuestion.objects.filter(session__question_set=None)
+                .values_list("session_id", "session__topic", "session__category",
+                             "session__difficulty", "payload")
+                .order_by("session_id", "position"))
+        n = 0
+        for (_, topic, category, difficulty), group in groupby(rows.iterator(chunk_size=batch),
+                                                               key=lambda row: row[:4]):
+            category = category or find_category_for_topic(topic)
+            n += QuestionFingerprint.record(category, difficulty, [row[4] for row in group])
+        self.stdout.write(f"SessionQuestion: {n} huellas registradas")
+        total += n
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo: {total} huellas ({QuestionFingerprint.objects.count()} distintas en el índice)"
+        ))
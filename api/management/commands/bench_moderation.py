@@ -0,0 +1,158 @@
+# api/management/commands/bench_moderation.py
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services import moderation
+
+
+# ---------------------------------------------------------
+# Implementación anterior (referencia para paridad y tiempos)
+# ---------------------------------------------------------
+
+def _legacy_norm_txt(s):
+    return (s or "").strip().lower()
+
+
+def _legacy_has_offense_or_stereotype(text):
+    t = _legacy_norm_txt(text)
+    if any(bw in t for bw in moderation.BAD_WORDS):
+        return True
+    return any(re.search(pat, t) for pat in moderation.STEREOTYPE_PATTERNS)
+
+
+def _legacy_is_ambiguous(text):
+    t = _legacy_norm_txt(text)
+    return any(marker in t for marker in moderation.AMBIG_MARKERS)
+
+
+def _legacy_is_too_subjective(text):
+    t = _legacy_norm_txt(text)
+    return any(w in t for w in moderation.SUBJECTIVE_MARKERS)
+
+
+def _legacy_mcq_has_issues(options):
+    if not isinstance(options, list) or len(options) != 4:
+        return True
+    cleaned = [(_legacy_norm_txt(o) or "") for o in options]
+    if any(not c for c in cleaned):
+        return True
+    if len(set(cleaned)) < 4:
+        return True
+    return False
+
+
+def legacy_review_question(q):
+    issues = []
+    qtype = (q.get("type") or "").lower()
+    question = q.get("question") or ""
+
+    if _legacy_has_offense_or_stereotype(question):
+        issues.append("offensive_or_stereotype")
+    if _legacy_is_ambiguous(question):
+        issues.append("ambiguous")
+    if _legacy_is_too_subjective(question):
+        issues.append("subjective")
+
+    if qtype == "mcq":
+        if _legacy_mcq_has_issues(q.get("options")):
+            issues.append("mcq_invalid")
+        ans = str(q.get("answer","")).strip().upper()[:1]
+        if ans not in ("A","B","C","D"):
+            issues.append("mcq_invalid")
+
+    if qtype == "vf":
+        ans = str(q.get("answer","")).strip().capitalize()
+        if ans not in ("Verdadero","Falso"):
+            issues.append("vf_invalid")
+
+    if len(question) > 300:
+        issues.append("too_long")
+
+    return issues
+
+
+# ---------------------------------------------------------
+# Generador de preguntas sintéticas
+# ---------------------------------------------------------
+
+_WORDS = (
+    "cuál es la complejidad del algoritmo de ordenamiento en el peor caso "
+    "qué protocolo usa la capa de transporte para garantizar entrega ordenada "
+    "los procesos comparten memoria cuando se crean hilos dentro del sistema operativo "
+    "indique la estructura de datos adecuada para implementar una cola de prioridad "
+    "las transacciones cumplen propiedades acid en una base de datos relacional"
+).split()
+
+_MARKERS = (
+    sorted(moderation.BAD_WORDS) + moderation.AMBIG_MARKERS + moderation.SUBJECTIVE_MARKERS
+    + ["los desarrolladores son", "las mujeres son", "Los Hombres  son"]
+)
+
+
+def _synthetic_questions(n, seed, marker_rate):
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        words = rnd.choices(_WORDS, k=rnd.randint(8, 40))
+        if rnd.random() < marker_rate:
+            words.insert(rnd.randint(0, len(words)), rnd.choice(_MARKERS))
+        text = " ".join(words).capitalize() + "?"
+        qtype = rnd.choice(["mcq", "mcq", "vf", "short"])
+        q = {"type": qtype, "question": text, "explanation": "x"}
+        if qtype == "mcq":
+            q["options"] = [f"{l}) opción {rnd.randint(1, 6)}" for l in "ABCD"]
+            q["answer"] = rnd.choice("ABCDE")
+        elif qtype == "vf":
+            q["answer"] = rnd.choice(["Verdadero", "Falso", "Quizás"])
+        else:
+            q["answer"] = "respuesta"
+        out.append(q)
+    return out
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la moderación compilada (services/moderation) con la implementación "
+        "anterior sobre preguntas sintéticas: verifica paridad y mide tiempos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--n", type=int, default=10000, help="Nº de preguntas generadas")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--marker-rate", type=float, default=0.3,
+                            help="Fracción de preguntas con algún marcador/palabra prohibida")
+        parser.add_argument("--repeat", type=int, default=3, help="Repeticiones (se reporta la mejor)")
+
+    def handle(self, *args, **opts):
+        questions = _synthetic_questions(opts["n"], opts["seed"], opts["marker_rate"])
+
+        expected = [legacy_review_question(q) for q in questions]
+        got = moderation.review_questions(questions)
+        mismatches = [i for i, (a, b) in enumerate(zip(expected, got)) if a != b]
+        if mismatches:
+            i = mismatches[0]
+            raise CommandError(
+                f"{len(mismatches)} diferencias; p. ej. #{i}: {questions[i]['question']!r} "
+                f"legacy={expected[i]} compilado={got[i]}"
+            )
+
+        def best_of(fn):
+            times = []
+            for _ in range(max(1, opts["repeat"])):
+                t0 = time.perf_counter()
+                fn()
+                times.append(time.perf_counter() - t0)
+            return min(times)
+
+        legacy_s = best_of(lambda: [legacy_review_question(q) for q in questions])
+        compiled_s = best_of(lambda: moderation.review_questions(questions))
+        flagged = sum(1 for issues in got if issues)
+
+        n = len(questions)
+        self.stdout.write(f"Preguntas: {n} (con issues: {flagged}); paridad OK")
+        self.stdout.write(f"legacy:    {legacy_s * 1000:8.1f} ms  ({legacy_s / n * 1e6:6.2f} µs/pregunta)")
+        self.stdout.write(f"compilado: {compiled_s * 1000:8.1f} ms  ({compiled_s / n * 1e6:6.2f} µs/pregunta)")
+        self.stdout.write(self.style.SUCCESS(f"speedup: x{legacy_s / compiled_s:.2f}"))
@@ -0,0 +1,28 @@
+# api/management/commands/prune_question_sets.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import QuestionSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra los QuestionSet a los que ya no apunta ninguna sesión ni cuestionario "
+        "guardado (previews reemplazados o pasados a SessionQuestion). Sólo toca sets "
+        "sin usar desde hace --min-age-hours, para no competir con guardados en curso."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-age-hours", type=float, default=24, help="Antigüedad mínima (por defecto 24)")
+        parser.add_argument("--dry-run", action="store_true", help="Sólo cuenta los sets que se borrarían")
+
+    def handle(self, *args, **opts):
+        older_than = timezone.now() - timedelta(hours=opts["min_age_hours"])
+        if opts["dry_run"]:
+            n = QuestionSet.unreferenced(older_than).count()
+            self.stdout.write(f"{n} sets sin referencias")
+            return
+        n = QuestionSet.prune(older_than)
+        self.stdout.write(self.style.SUCCESS(f"Listo: {n} sets borrados"))
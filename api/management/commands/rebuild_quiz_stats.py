@@ -0,0 +1,37 @@
+# api/management/commands/rebuild_quiz_stats.py
+from django.core.management.base import BaseCommand
+
+from api.models import QuizStatCounter, SavedQuiz
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula el resumen de estadísticas de cuestionarios guardados (QuizStatCounter) "
+        "con agregados en BD. Útil si se borraron/actualizaron SavedQuiz con operaciones "
+        "masivas que no pasan por save()/delete()."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--progress", action="store_true",
+            help="Recalcula también SavedQuiz.progress antes de agregar",
+        )
+
+    def handle(self, *args, **opts):
+        if opts["progress"]:
+            batch, n = [], 0
+            rows = SavedQuiz.objects.only("id", "current_question", "question_count", "is_completed", "progress")
+            for quiz in rows.iterator(chunk_size=500):
+                progress = quiz.get_progress_percentage()
+                if progress != quiz.progress:
+                    quiz.progress = progress
+                    batch.append(quiz)
+                if len(batch) >= 500:
+                    n += SavedQuiz.objects.bulk_update(batch, ["progress"])
+                    batch = []
+            if batch:
+                n += SavedQuiz.objects.bulk_update(batch, ["progress"])
+            self.stdout.write(f"progress corregido en {n} cuestionarios")
+
+        rows = QuizStatCounter.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Listo: {rows} filas de estadísticas"))
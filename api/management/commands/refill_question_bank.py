@@ -0,0 +1,45 @@
+# api/management/commands/refill_question_bank.py
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from api.models import GenerationSession, DIFFICULTY_CHOICES
+from api.services import question_bank
+
+
+class Command(BaseCommand):
+    help = (
+        "Rellena el banco de preguntas pre-generadas hasta QUESTION_BANK_HIGH_WATER. "
+        "Por defecto usa las categorías más populares de GenerationSession."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--category", action="append", help="Categoría de la taxonomía (repetible)")
+        parser.add_argument("--difficulty", action="append", choices=[d for d, _ in DIFFICULTY_CHOICES])
+        parser.add_argument("--type", dest="types", action="append", choices=["mcq", "vf", "short"])
+        parser.add_argument("--top", type=int, default=10, help="Nº de categorías populares si no se indica --category")
+        parser.add_argument("--force", action="store_true", help="Rellena aunque el bucket esté sobre el low-water")
+
+    def handle(self, *args, **opts):
+        categories = opts["category"] or list(
+            GenerationSession.objects.exclude(category="")
+            .values("category").annotate(n=Count("id")).order_by("-n")
+            .values_list("category", flat=True)[:opts["top"]]
+        )
+        difficulties = opts["difficulty"] or [d for d, _ in DIFFICULTY_CHOICES]
+        types = opts["types"] or ["mcq", "vf"]
+
+        total = 0
+        for category in categories:
+            for difficulty in difficulties:
+                for qtype in types:
+                    try:
+                        added = question_bank.refill(category, difficulty, qtype, force=opts["force"])
+                    except RuntimeError as e:
+                        self.stderr.write(f"{category}/{difficulty}/{qtype}: {e}")
+                        continue
+                    total += added
+                    self.stdout.write(
+                        f"{category}/{difficulty}/{qtype}: +{added} "
+                        f"(nivel {question_bank.level(category, difficulty, qtype)})"
+                    )
+        self.stdout.write(self.style.SUCCESS(f"Banco rellenado: {total} preguntas nuevas"))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_add_original_quiz_hierarchy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankedQuestion',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('category', models.CharField(max_length=100)),
+                ('difficulty', models.CharField(choices=[('Fácil', 'Fácil'), ('Media', 'Media'), ('Difícil', 'Difícil')], max_length=10)),
+                ('qtype', models.CharField(max_length=10)),
+                ('question', models.JSONField()),
+                ('provider', models.CharField(blank=True, max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'question_bank',
+                'indexes': [models.Index(fields=['category', 'difficulty', 'qtype', 'id'], name='question_ba_categor_3f9af9_idx')],
+            },
+        ),
+    ]
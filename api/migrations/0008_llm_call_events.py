@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:54
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_question_bank'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMCallEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('provider', models.CharField(help_text="'gemini' | 'perplexity'", max_length=20)),
+                ('model', models.CharField(blank=True, max_length=100)),
+                ('operation', models.CharField(help_text='generate, regenerate, stream, hint, suggestion...', max_length=30)),
+                ('latency_ms', models.IntegerField()),
+                ('prompt_chars', models.IntegerField(blank=True, null=True)),
+                ('response_chars', models.IntegerField(blank=True, null=True)),
+                ('prompt_tokens', models.IntegerField(blank=True, null=True)),
+                ('completion_tokens', models.IntegerField(blank=True, null=True)),
+                ('outcome', models.CharField(choices=[('success', 'success'), ('schema_error', 'schema_error'), ('no_credits', 'no_credits'), ('timeout', 'timeout'), ('circuit_open', 'circuit_open'), ('cancelled', 'cancelled'), ('error', 'error')], max_length=20)),
+                ('fallback', models.BooleanField(default=False, help_text='Llamada hecha al proveedor de respaldo')),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'llm_call_events',
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['provider', 'operation', 'timestamp'], name='llm_call_ev_provide_156c25_idx'), models.Index(fields=['outcome', 'timestamp'], name='llm_call_ev_outcome_10e047_idx')],
+            },
+        ),
+    ]
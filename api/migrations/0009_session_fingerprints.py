@@ -0,0 +1,73 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:02
+
+import hashlib
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def _fingerprint(question):
+    if not isinstance(question, dict):
+        return None
+    norm = re.sub(r"[\W_]+", " ", (question.get("question") or "").lower()).strip()
+    if not norm:
+        return None
+    return norm, hashlib.sha1(norm.encode("utf-8")).hexdigest()
+
+
+def backfill_fingerprints(apps, schema_editor):
+    GenerationSession = apps.get_model("api", "GenerationSession")
+    RegenerationLog = apps.get_model("api", "RegenerationLog")
+    SessionFingerprint = apps.get_model("api", "SessionFingerprint")
+
+    rows = []
+    for session_id, preview in GenerationSession.objects.values_list("id", "latest_preview").iterator():
+        for i, q in enumerate(preview if isinstance(preview, list) else []):
+            fp = _fingerprint(q)
+            if fp:
+                rows.append(SessionFingerprint(session_id=session_id, kind="preview", index=i,
+                                               digest=fp[1], norm=fp[0]))
+        if len(rows) >= 1000:
+            SessionFingerprint.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+
+    logs = RegenerationLog.objects.values_list("session_id", "index", "old_question", "new_question")
+    for session_id, index, old_q, new_q in logs.iterator():
+        for q in (old_q, new_q):
+            fp = _fingerprint(q)
+            if fp:
+                rows.append(SessionFingerprint(session_id=session_id, kind="regen", index=index,
+                                               digest=fp[1], norm=fp[0]))
+        if len(rows) >= 1000:
+            SessionFingerprint.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+    if rows:
+        SessionFingerprint.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_llm_call_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionFingerprint',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('preview', 'preview'), ('regen', 'regen')], max_length=10)),
+                ('index', models.PositiveIntegerField()),
+                ('digest', models.CharField(max_length=40)),
+                ('norm', models.TextField()),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprints', to='api.generationsession')),
+            ],
+            options={
+                'db_table': 'session_fingerprint',
+                'indexes': [models.Index(fields=['session', 'kind', 'index'], name='session_fin_session_a3f744_idx')],
+                'constraints': [models.UniqueConstraint(fields=('session', 'kind', 'index', 'digest'), name='uniq_session_fingerprint')],
+            },
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
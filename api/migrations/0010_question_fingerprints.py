@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_session_fingerprints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionFingerprint',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('category', models.CharField(max_length=100)),
+                ('difficulty', models.CharField(choices=[('Fácil', 'Fácil'), ('Media', 'Media'), ('Difícil', 'Difícil')], max_length=10)),
+                ('digest', models.CharField(max_length=40)),
+                ('norm', models.TextField()),
+                ('first_seen_at', models.DateTimeField(auto_now_add=True)),
+                ('last_seen_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'question_fingerprint',
+                'indexes': [models.Index(fields=['category', 'difficulty', '-last_seen_at'], name='question_fi_categor_0d80c3_idx')],
+                'constraints': [models.UniqueConstraint(fields=('category', 'difficulty', 'digest'), name='uniq_question_fingerprint')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:07
+
+from django.db import migrations, models
+
+
+def backfill_counters(apps, schema_editor):
+    SavedQuiz = apps.get_model("api", "SavedQuiz")
+    batch = []
+    rows = SavedQuiz.objects.only("id", "questions", "user_answers", "favorite_questions")
+    for quiz in rows.iterator(chunk_size=500):
+        quiz.question_count = len(quiz.questions) if isinstance(quiz.questions, (list, dict)) else 0
+        quiz.answered_count = len(quiz.user_answers) if isinstance(quiz.user_answers, dict) else 0
+        quiz.marked_count = len(quiz.favorite_questions) if isinstance(quiz.favorite_questions, list) else 0
+        batch.append(quiz)
+        if len(batch) >= 500:
+            SavedQuiz.objects.bulk_update(batch, ["question_count", "answered_count", "marked_count"])
+            batch = []
+    if batch:
+        SavedQuiz.objects.bulk_update(batch, ["question_count", "answered_count", "marked_count"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_question_fingerprints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savedquiz',
+            name='answered_count',
+            field=models.PositiveIntegerField(default=0, help_text='len(user_answers)'),
+        ),
+        migrations.AddField(
+            model_name='savedquiz',
+            name='marked_count',
+            field=models.PositiveIntegerField(default=0, help_text='len(favorite_questions)'),
+        ),
+        migrations.AddField(
+            model_name='savedquiz',
+            name='question_count',
+            field=models.PositiveIntegerField(default=0, help_text='len(questions)'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_saved_quiz_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='savedquiz',
+            index=models.Index(fields=['-last_accessed', '-updated_at', 'id'], name='saved_quiz_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:10
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_progress_and_stats(apps, schema_editor):
+    SavedQuiz = apps.get_model("api", "SavedQuiz")
+    QuizStatCounter = apps.get_model("api", "QuizStatCounter")
+
+    batch = []
+    rows = SavedQuiz.objects.only("id", "current_question", "question_count", "is_completed")
+    for quiz in rows.iterator(chunk_size=500):
+        if not quiz.question_count:
+            quiz.progress = 0
+        elif quiz.is_completed:
+            quiz.progress = 100
+        else:
+            quiz.progress = int(quiz.current_question / quiz.question_count * 100)
+        batch.append(quiz)
+        if len(batch) >= 500:
+            SavedQuiz.objects.bulk_update(batch, ["progress"])
+            batch = []
+    if batch:
+        SavedQuiz.objects.bulk_update(batch, ["progress"])
+
+    aggregates = dict(
+        total=Count("id"),
+        completed=Count("id", filter=Q(is_completed=True)),
+        progress_sum=Coalesce(Sum("progress", filter=Q(is_completed=False)), 0),
+    )
+    counters = [QuizStatCounter(dimension="all", value="", **SavedQuiz.objects.aggregate(**aggregates))]
+    for dimension in ("topic", "difficulty"):
+        for row in SavedQuiz.objects.order_by().values(dimension).annotate(**aggregates):
+            value = row.pop(dimension)
+            counters.append(QuizStatCounter(dimension=dimension, value=value, **row))
+    QuizStatCounter.objects.bulk_create(counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_saved_quiz_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizStatCounter',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('dimension', models.CharField(choices=[('all', 'all'), ('topic', 'topic'), ('difficulty', 'difficulty')], max_length=10)),
+                ('value', models.CharField(blank=True, max_length=200)),
+                ('total', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('progress_sum', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'quiz_stat_counter',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='savedquiz',
+            name='saved_quiz_is_comp_0e463e_idx',
+        ),
+        migrations.AddField(
+            model_name='savedquiz',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0, help_text='get_progress_percentage()'),
+        ),
+        migrations.AddIndex(
+            model_name='savedquiz',
+            index=models.Index(fields=['is_completed', 'progress'], name='saved_quiz_is_comp_50affa_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='quizstatcounter',
+            constraint=models.UniqueConstraint(fields=('dimension', 'value'), name='uniq_quiz_stat_counter'),
+        ),
+        migrations.RunPython(backfill_progress_and_stats, migrations.RunPython.noop),
+    ]
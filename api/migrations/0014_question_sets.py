@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_quiz_stat_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionSet',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('payload', models.BinaryField()),
+                ('count', models.PositiveIntegerField(default=0, help_text='len(preguntas)')),
+                ('size', models.PositiveIntegerField(default=0, help_text='bytes del JSON sin comprimir')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'question_set',
+            },
+        ),
+        migrations.AddField(
+            model_name='generationsession',
+            name='question_set',
+            field=models.ForeignKey(blank=True, help_text='Contenido de latest_preview (vacío = None)', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='api.questionset'),
+        ),
+        migrations.AddField(
+            model_name='savedquiz',
+            name='question_set',
+            field=models.ForeignKey(blank=True, help_text='Preguntas generadas del cuestionario (vacío = None)', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='api.questionset'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:13
+
+import hashlib
+import json
+import zlib
+
+from django.db import migrations
+
+LIST_FIELDS = (("GenerationSession", "latest_preview"), ("SavedQuiz", "questions"))
+
+
+def move_questions_to_sets(apps, schema_editor):
+    QuestionSet = apps.get_model("api", "QuestionSet")
+
+    known = set(QuestionSet.objects.values_list("digest", flat=True))
+
+    def intern(questions):
+        if not isinstance(questions, list) or not questions:
+            return None
+        raw = json.dumps(questions, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        if digest not in known:
+            QuestionSet.objects.create(digest=digest, payload=zlib.compress(raw), count=len(questions), size=len(raw))
+            known.add(digest)
+        return digest
+
+    for model_name, field in LIST_FIELDS:
+        model = apps.get_model("api", model_name)
+        batch = []
+        for row in model.objects.only("pk", field).iterator(chunk_size=500):
+            row.question_set_id = intern(getattr(row, field))
+            batch.append(row)
+            if len(batch) >= 500:
+                model.objects.bulk_update(batch, ["question_set"])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ["question_set"])
+
+
+def restore_question_lists(apps, schema_editor):
+    """Inverso: vuelve a escribir el JSON de cada fila desde su QuestionSet."""
+    QuestionSet = apps.get_model("api", "QuestionSet")
+
+    payloads = {}
+
+    def load(digest):
+        if digest not in payloads:
+            payload = QuestionSet.objects.values_list("payload", flat=True).get(pk=digest)
+            payloads[digest] = json.loads(zlib.decompress(bytes(payload)))
+        return payloads[digest]
+
+    for model_name, field in LIST_FIELDS:
+        model = apps.get_model("api", model_name)
+        batch = []
+        rows = model.objects.exclude(question_set=None).only("pk", "question_set")
+        for row in rows.iterator(chunk_size=500):
+            setattr(row, field, load(row.question_set_id))
+            batch.append(row)
+            if len(batch) >= 500:
+                model.objects.bulk_update(batch, [field])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, [field])
+
+
+# Sólo datos: en Postgres no se puede hacer ALTER TABLE en la misma transacción
+# que actualizó filas con FK diferidas ("pending trigger events"), así que el
+# esquema va aparte en 0014 (añadir question_set) y 0016 (quitar columnas).
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_question_sets'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_questions_to_sets, restore_question_lists),
+    ]
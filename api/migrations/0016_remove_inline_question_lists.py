@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:13
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_move_questions_to_sets'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='generationsession',
+            name='latest_preview',
+        ),
+        migrations.RemoveField(
+            model_name='savedquiz',
+            name='questions',
+        ),
+    ]
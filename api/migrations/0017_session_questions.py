@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:16
+
+import hashlib
+import json
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def rows_to_question_sets(apps, schema_editor):
+    """
+    Inverso: las sesiones editadas por filas vuelven a apuntar a un QuestionSet
+    antes de borrar session_question.
+    """
+    QuestionSet = apps.get_model("api", "QuestionSet")
+    GenerationSession = apps.get_model("api", "GenerationSession")
+    SessionQuestion = apps.get_model("api", "SessionQuestion")
+
+    previews = {}
+    for session_id, payload in SessionQuestion.objects.order_by("session_id", "position").values_list("session_id", "payload"):
+        previews.setdefault(session_id, []).append(payload)
+    for session_id, questions in previews.items():
+        raw = json.dumps(questions, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        QuestionSet.objects.get_or_create(
+            digest=digest, defaults=dict(payload=zlib.compress(raw), count=len(questions), size=len(raw)),
+        )
+        GenerationSession.objects.filter(pk=session_id, question_set=None).update(question_set_id=digest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_remove_inline_question_lists'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionQuestion',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('position', models.BigIntegerField()),
+                ('payload', models.JSONField()),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_rows', to='api.generationsession')),
+            ],
+            options={
+                'db_table': 'session_question',
+                'constraints': [models.UniqueConstraint(fields=('session', 'position'), name='uniq_session_question_position')],
+            },
+        ),
+        migrations.RunPython(migrations.RunPython.noop, rows_to_question_sets),
+    ]
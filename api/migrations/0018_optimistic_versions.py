@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_session_questions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationsession',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='savedquiz',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:20
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_optimistic_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionEditLog',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('question_index', models.PositiveIntegerField(help_text='Índice de la pregunta en el array latest_preview')),
+                ('operation_type', models.CharField(choices=[('manual_edit', 'Edición Manual'), ('ai_regeneration', 'Regeneración con IA'), ('duplication', 'Duplicación'), ('creation', 'Creación Nueva')], help_text='Tipo de operación realizada', max_length=20)),
+                ('question_before', models.JSONField(blank=True, help_text='Estado de la pregunta antes de la operación', null=True)),
+                ('question_after', models.JSONField(help_text='Estado de la pregunta después de la operación')),
+                ('changed_fields', models.JSONField(blank=True, default=list, help_text="Lista de campos que cambiaron (ej: ['question', 'explanation'])")),
+                ('ai_provider', models.CharField(blank=True, help_text='Proveedor de IA usado para regeneración (gemini/perplexity/local)', max_length=20, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Momento en que se realizó la operación')),
+                ('session', models.ForeignKey(help_text='Sesión a la que pertenece esta pregunta', on_delete=django.db.models.deletion.CASCADE, related_name='question_edits', to='api.generationsession')),
+            ],
+            options={
+                'db_table': 'question_edit_log',
+                'ordering': ['session', 'question_index', 'created_at'],
+                'indexes': [models.Index(fields=['session', 'question_index'], name='question_ed_session_573b1e_idx'), models.Index(fields=['session', 'created_at'], name='question_ed_session_36c4ef_idx'), models.Index(fields=['operation_type'], name='question_ed_operati_00ee2e_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionOriginMetadata',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('question_index', models.PositiveIntegerField(help_text='Índice de la pregunta')),
+                ('origin_type', models.CharField(choices=[('pure_ai', 'IA Pura (sin ediciones)'), ('ai_edited', 'IA con ediciones manuales'), ('user_created', 'Creada por usuario'), ('duplicated', 'Duplicada de otra')], default='pure_ai', help_text='Tipo de origen final de la pregunta', max_length=20)),
+                ('edit_count', models.PositiveIntegerField(default=0, help_text='Número de ediciones manuales')),
+                ('regeneration_count', models.PositiveIntegerField(default=0, help_text='Número de regeneraciones con IA')),
+                ('initial_ai_provider', models.CharField(blank=True, help_text='Proveedor que generó la pregunta inicialmente', max_length=20, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_modified_at', models.DateTimeField(auto_now=True)),
+                ('session', models.ForeignKey(help_text='Sesión a la que pertenece', on_delete=django.db.models.deletion.CASCADE, related_name='question_metadata', to='api.generationsession')),
+            ],
+            options={
+                'db_table': 'question_origin_metadata',
+                'indexes': [models.Index(fields=['session', 'question_index'], name='question_or_session_88ab01_idx'), models.Index(fields=['origin_type'], name='question_or_origin__fca74e_idx')],
+                'unique_together': {('session', 'question_index')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_question_tracking'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='savedquiz',
+            name='saved_quiz_keyset_idx',
+        ),
+        migrations.AddIndex(
+            model_name='savedquiz',
+            index=models.Index(fields=['-created_at', 'id'], name='saved_quiz_created_keyset_idx'),
+        ),
+    ]
@@ -1,11 +1,20 @@
+import os
+import json
 import uuid
-from django.db import models
+import zlib
+import hashlib
+from functools import lru_cache
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 #from django.contrib.postgres.fields import ArrayField  # si usas Postgres
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import timedelta
 
+from .services import optimistic
+from .services.near_duplicates import normalize as normalize_question
+
 try:
     from django.db.models import JSONField  # Django 3.1+ (alias)
 except ImportError:
@@ -20,7 +29,139 @@ DIFFICULTY_CHOICES = (
     ("Difícil", "Difícil"),
 )
 
-class GenerationSession(models.Model):
+QUESTION_SET_CACHE_SIZE = int(os.getenv("QUESTION_SET_CACHE_SIZE", "512"))
+
+class QuestionSet(models.Model):
+    """
+    Lista de preguntas inmutable y direccionada por contenido: la clave es el
+    sha256 del JSON canónico y el payload va comprimido con zlib. Sesiones y
+    cuestionarios guardados apuntan a un QuestionSet; editar la lista crea (o
+    reutiliza) otro hash, así copiar un cuestionario es copiar el puntero.
+    """
+    digest = models.CharField(max_length=64, primary_key=True)
+    payload = models.BinaryField()
+    count = models.PositiveIntegerField(default=0, help_text="len(preguntas)")
+    size = models.PositiveIntegerField(default=0, help_text="bytes del JSON sin comprimir")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "question_set"
+
+    @staticmethod
+    def encode(questions):
+        """-> (digest, JSON canónico en bytes)"""
+        raw = json.dumps(questions, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        return hashlib.sha256(raw).hexdigest(), raw
+
+    @classmethod
+    def intern(cls, questions, known=None):
+        """
+        Guarda la lista (si no existía) y devuelve su digest; una lista vacía es None.
+        `known`: digest del que se leyó la lista; si no cambió no se escribe nada.
+        """
+        if not questions:
+            return None
+        digest, raw = cls.encode(questions)
+        if digest == known:
+            return digest
+        # Si ya existía se renueva created_at: prune() no borra un set que se
+        # acaba de reutilizar, y el UPDATE bloquea la fila hasta el commit
+        cls.objects.bulk_create(
+            [cls(digest=digest, payload=zlib.compress(raw), count=len(questions), size=len(raw))],
+            update_conflicts=True, unique_fields=["digest"], update_fields=["created_at"],
+        )
+        return digest
+
+    @classmethod
+    def load(cls, digest):
+        """Lista nueva (el llamador puede mutarla) con el contenido de `digest`."""
+        if not digest:
+            return []
+        return json.loads(zlib.decompress(_question_set_payload(digest)))
+
+    @classmethod
+    def unreferenced(cls, older_than):
+        """Sets sin sesión ni cuestionario que apunte a ellos, creados/reusados antes de `older_than`."""
+        qs = cls.objects.filter(created_at__lt=older_than)
+        for model in (GenerationSession, SavedQuiz):
+            qs = qs.exclude(digest__in=model.objects.exclude(question_set=None).values("question_set"))
+        return qs
+
+    @classmethod
+    def prune(cls, older_than, batch_size=500):
+        """
+        Borra los sets huérfanos (previews reemplazados, sesiones materializadas
+        en SessionQuestion, borrados). Devuelve cuántos se borraron.
+        """
+        deleted = 0
+        while True:
+            batch = list(cls.unreferenced(older_than).values_list("digest", flat=True)[:batch_size])
+            if not batch:
+                return deleted
+            # se vuelve a comprobar en el DELETE por si alguien apuntó a uno entretanto
+            n, _ = cls.unreferenced(older_than).filter(digest__in=batch).delete()
+            if not n:
+                return deleted
+            deleted += n
+
+    def __str__(self):
+        return f"qset[{self.digest[:12]}] {self.count} preguntas"
+
+
+@lru_cache(maxsize=QUESTION_SET_CACHE_SIZE)
+def _question_set_payload(digest):
+    # inmutable por construcción: se puede cachear sin invalidar
+    return bytes(QuestionSet.objects.values_list("payload", flat=True).get(pk=digest))
+
+
+_ASSIGNED = object()
+
+
+def _question_list_property(doc, without_set=None):
+    """
+    Propiedad list <-> QuestionSet. La lista se decodifica al primer acceso y se
+    queda en la instancia junto al digest del que salió (si question_set cambia,
+    p. ej. tras refresh_from_db, se vuelve a leer); _store_question_list() la
+    persiste al guardar (aunque se haya mutado en sitio, porque el hash se recalcula).
+    `without_set(instance)` da la lista cuando question_set es None (por defecto []).
+    """
+    def fget(self):
+        cached = self.__dict__.get("_question_list")
+        if cached is not None and (cached[0] is _ASSIGNED or cached[0] == self.question_set_id):
+            return cached[1]
+        if self.question_set_id is None and without_set is not None:
+            questions = without_set(self)
+        else:
+            questions = QuestionSet.load(self.question_set_id)
+        self.__dict__["_question_list"] = (self.question_set_id, questions)
+        return questions
+
+    def fset(self, value):
+        self.__dict__["_question_list"] = (_ASSIGNED, list(value or []))
+
+    return property(fget, fset, doc=doc)
+
+
+def _store_question_list(instance, name, update_fields):
+    """
+    Antes de save(): traduce `name` a question_set en update_fields y, si la
+    lista está cargada, apunta question_set a su hash. Devuelve update_fields.
+    """
+    if update_fields is not None:
+        if name not in update_fields and "question_set" not in update_fields:
+            return update_fields
+        update_fields = [f for f in update_fields if f != name]
+        if "question_set" not in update_fields:
+            update_fields.append("question_set")
+    cached = instance.__dict__.get("_question_list")
+    if cached is not None:
+        known = None if cached[0] is _ASSIGNED else cached[0]
+        instance.question_set_id = QuestionSet.intern(cached[1], known=known)
+        instance.__dict__["_question_list"] = (instance.question_set_id, cached[1])
+    return update_fields
+
+
+class GenerationSession(optimistic.VersionedMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     topic = models.CharField(max_length=200)
     category = models.CharField(max_length=100, blank=True)
@@ -30,15 +171,189 @@ class GenerationSession(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     # Último preview generado para esta sesión (persistimos para HU-05)
-    latest_preview = JSONField(default=list, blank=True)
+    question_set = models.ForeignKey(
+        QuestionSet, on_delete=models.PROTECT, null=True, blank=True, related_name="+",
+        help_text="Contenido de latest_preview (vacío = None)",
+    )
+    # Sin question_set, el preview son filas SessionQuestion (tras editar preguntas sueltas)
+    latest_preview = _question_list_property(
+        "Último preview (lista): question_set o, si es None, las filas SessionQuestion",
+        without_set=lambda session: session._load_question_rows(),
+    )
+    # concurrencia optimista (services/optimistic): sube en cada escritura
+    version = models.PositiveIntegerField(default=1)
 
 
     class Meta:
         db_table = "generation_session"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "question_set_id" in instance.__dict__:
+            instance._stored_question_set_id = instance.question_set_id
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Las huellas del preview (anti-repetición) se mantienen junto con latest_preview
+        update_fields = kwargs.get("update_fields")
+        kwargs["update_fields"] = optimistic.bump_for_save(self, update_fields)
+        if update_fields is not None and not {"latest_preview", "question_set"} & set(update_fields):
+            return super().save(*args, **kwargs)
+        adding = self._state.adding
+        with transaction.atomic():
+            replaced = "_question_list" in self.__dict__
+            kwargs["update_fields"] = _store_question_list(self, "latest_preview", kwargs["update_fields"])
+            super().save(*args, **kwargs)
+            if replaced and not adding and self.__dict__.get("_stored_question_set_id", None) is None:
+                # la lista completa vuelve a un QuestionSet: las filas sueltas sobran
+                SessionQuestion.objects.filter(session_id=self.pk).delete()
+            self._stored_question_set_id = self.question_set_id
+            self._sync_fingerprints(created=adding)
+
+    def _sync_fingerprints(self, created=False):
+        new = SessionFingerprint.sync_preview(self, created=created)
+        if new:
+            QuestionFingerprint.record(self.category, self.difficulty, new)
+
+    # --- edición pregunta a pregunta (una fila por operación) ---
+
+    def _load_question_rows(self):
+        """Lee las filas del preview (una query) y deja (id, position, version) en la instancia."""
+        if self._state.adding:
+            self._question_rows = []
+            return []
+        rows = list(SessionQuestion.objects.filter(session_id=self.pk)
+                    .order_by("position").values_list("id", "position", "version", "payload"))
+        self._question_rows = [row[:3] for row in rows]
+        return [row[3] for row in rows]
+
+    def _materialize_questions(self):
+        """
+        Pasa el preview de question_set a filas SessionQuestion (una vez por sesión)
+        y devuelve la lista vigente, con self._question_rows alineado a ella.
+        """
+        if self.question_set_id is None:
+            questions = self._load_question_rows()
+            self.__dict__["_question_list"] = (None, questions)
+            return questions
+        questions = QuestionSet.load(self.question_set_id)
+        SessionQuestion.objects.filter(session_id=self.pk).delete()
+        SessionQuestion.objects.bulk_create([
+            SessionQuestion(session_id=self.pk, position=(i + 1) * SessionQuestion.POSITION_GAP, payload=q)
+            for i, q in enumerate(questions)
+        ])
+        GenerationSession.objects.filter(pk=self.pk).update(question_set=None)
+        self.question_set_id = self._stored_question_set_id = None
+        questions = self._load_question_rows()
+        self.__dict__["_question_list"] = (None, questions)
+        return questions
+
+    def replace_question(self, index, question, expected_version=None):
+        """
+        latest_preview[index] = question como escritura de una fila; devuelve la
+        versión nueva de esa pregunta. Todas las operaciones por pregunta suben
+        self.version con un UPDATE condicional (VersionConflict si cambió).
+        """
+        with transaction.atomic():
+            optimistic.claim(self, expected_version)
+            questions = self._materialize_questions()
+            if index >= len(questions):
+                # como antes: se rellena con {} hasta llegar al índice
+                while len(questions) < index:
+                    self._insert_row(len(questions), {})
+                    questions.append({})
+                self._insert_row(index, question)
+                questions.append(question)
+                version = 1
+            else:
+                row_id, position, version = self._question_rows[index]
+                SessionQuestion.objects.filter(pk=row_id).update(
+                    payload=question, version=models.F("version") + 1, updated_at=timezone.now()
+                )
+                version += 1
+                self._question_rows[index] = (row_id, position, version)
+                questions[index] = question
+            self._sync_fingerprints()
+        return version
+
+    def insert_question(self, index, question, expected_version=None):
+        """Inserta `question` en la posición `index` (una fila nueva)."""
+        with transaction.atomic():
+            optimistic.claim(self, expected_version)
+            questions = self._materialize_questions()
+            index = max(0, min(index, len(questions)))
+            self._insert_row(index, question)
+            questions.insert(index, question)
+            self._sync_fingerprints()
+        return index
+
+    def duplicate_question(self, index, expected_version=None):
+        """Copia latest_preview[index] justo después; devuelve el índice de la copia."""
+        with transaction.atomic():
+            optimistic.claim(self, expected_version)
+            questions = self._materialize_questions()
+            if not 0 <= index < len(questions):
+                raise IndexError(index)
+            copy = json.loads(json.dumps(questions[index]))
+            self._insert_row(index + 1, copy)
+            questions.insert(index + 1, copy)
+            self._sync_fingerprints()
+        return index + 1
+
+    def _insert_row(self, index, question):
+        """Crea la fila entre las posiciones vecinas; si no queda hueco, renumera."""
+        rows = self._question_rows
+        before = rows[index - 1][1] if index > 0 else 0
+        after = rows[index][1] if index < len(rows) else before + 2 * SessionQuestion.POSITION_GAP
+        if after - before < 2:
+            SessionQuestion.renumber(self.pk)
+            self._load_question_rows()
+            return self._insert_row(index, question)
+        row = SessionQuestion.objects.create(session_id=self.pk, position=(before + after) // 2, payload=question)
+        rows.insert(index, (row.pk, row.position, row.version))
+
     def __str__(self):
         return f"{self.id} - {self.topic} ({self.difficulty})"
 
+class SessionQuestion(models.Model):
+    """
+    Una pregunta del preview de una sesión, para editar preguntas sueltas sin
+    reescribir la lista. `position` es dispersa (saltos de POSITION_GAP) para
+    poder insertar entre dos filas sin mover las demás. Sólo hay filas cuando
+    GenerationSession.question_set es None (ver GenerationSession.latest_preview).
+    """
+    POSITION_GAP = 1024
+
+    id = models.BigAutoField(primary_key=True)
+    session = models.ForeignKey(GenerationSession, on_delete=models.CASCADE, related_name="question_rows")
+    position = models.BigIntegerField()
+    payload = JSONField()
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "session_question"
+        constraints = [
+            models.UniqueConstraint(fields=["session", "position"], name="uniq_session_question_position"),
+        ]
+
+    @classmethod
+    def renumber(cls, session_id):
+        """Vuelve a espaciar las posiciones (sólo cuando una inserción se queda sin hueco)."""
+        rows = list(cls.objects.filter(session_id=session_id).order_by("position").only("id", "position"))
+        # primero a negativos para no chocar con la restricción única
+        for i, row in enumerate(rows):
+            row.position = -(i + 1)
+        cls.objects.bulk_update(rows, ["position"])
+        for i, row in enumerate(rows):
+            row.position = (i + 1) * cls.POSITION_GAP
+        cls.objects.bulk_update(rows, ["position"])
+
+    def __str__(self):
+        return f"sq[{self.session_id}] @{self.position} v{self.version}"
+
+
 class RegenerationLog(models.Model):
     """
     Traza cada regeneración:
@@ -59,11 +374,272 @@ class RegenerationLog(models.Model):
             models.Index(fields=["session", "index"]),
         ]
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                SessionFingerprint.record_regeneration(self)
+                QuestionFingerprint.record(self.session.category, self.session.difficulty, [self.new_question])
+
     def __str__(self):
         return f"regen[{self.session_id}] idx={self.index} at {self.created_at}"
 
 
-class SavedQuiz(models.Model):
+class SessionFingerprint(models.Model):
+    """
+    Enunciados normalizados ya vistos en una sesión (anti-repetición).
+    - kind="preview": una fila por posición de latest_preview (se sincroniza al guardarlo)
+    - kind="regen": old/new de cada RegenerationLog, con su índice
+    build_seen_set lee estas filas con una sola consulta indexada en vez de
+    recorrer el JSON del preview y los logs.
+    """
+    PREVIEW = "preview"
+    REGEN = "regen"
+    KIND_CHOICES = ((PREVIEW, "preview"), (REGEN, "regen"))
+
+    id = models.BigAutoField(primary_key=True)
+    session = models.ForeignKey(GenerationSession, on_delete=models.CASCADE, related_name="fingerprints")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    index = models.PositiveIntegerField()
+    digest = models.CharField(max_length=40)  # sha1 de `norm`
+    norm = models.TextField()
+
+    class Meta:
+        db_table = "session_fingerprint"
+        indexes = [
+            models.Index(fields=["session", "kind", "index"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["session", "kind", "index", "digest"], name="uniq_session_fingerprint"),
+        ]
+
+    @staticmethod
+    def fingerprint(question):
+        """(norm, digest) del enunciado de una pregunta, o None si está vacío."""
+        if not isinstance(question, dict):
+            return None
+        norm = normalize_question(question.get("question", ""))
+        if not norm:
+            return None
+        return norm, hashlib.sha1(norm.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def sync_preview(cls, session, created=False):
+        """
+        Deja las filas "preview" iguales a session.latest_preview (sólo escribe
+        las diferencias). Devuelve las preguntas que entraron nuevas.
+        """
+        preview = session.latest_preview if isinstance(session.latest_preview, list) else []
+        wanted = {}
+        questions = {}
+        for i, q in enumerate(preview):
+            fp = cls.fingerprint(q)
+            if fp:
+                wanted[(i, fp[1])] = fp[0]
+                questions[(i, fp[1])] = q
+
+        current = {}
+        if not created:
+            current = {
+                (index, digest): pk
+                for pk, index, digest in cls.objects
+                .filter(session=session, kind=cls.PREVIEW)
+                .values_list("pk", "index", "digest")
+            }
+        stale = [pk for key, pk in current.items() if key not in wanted]
+        if stale:
+            cls.objects.filter(pk__in=stale).delete()
+        new = [
+            cls(session=session, kind=cls.PREVIEW, index=i, digest=digest, norm=norm)
+            for (i, digest), norm in wanted.items()
+            if (i, digest) not in current
+        ]
+        if new:
+            cls.objects.bulk_create(new, ignore_conflicts=True)
+        return [questions[(row.index, row.digest)] for row in new]
+
+    @classmethod
+    def record_regeneration(cls, log):
+        rows = []
+        for q in (log.old_question, log.new_question):
+            fp = cls.fingerprint(q)
+            if fp:
+                rows.append(cls(session_id=log.session_id, kind=cls.REGEN, index=log.index,
+                                digest=fp[1], norm=fp[0]))
+        if rows:
+            cls.objects.bulk_create(rows, ignore_conflicts=True)
+
+    def __str__(self):
+        return f"fp[{self.session_id}] {self.kind}#{self.index}"
+
+
+class QuestionFingerprint(models.Model):
+    """
+    Huella global de cada enunciado servido, por (categoría, dificultad), entre
+    todas las sesiones y cuestionarios guardados. La consulta services/question_fingerprints
+    para que los prompts eviten repetir lo que ya vieron otros usuarios.
+    """
+    id = models.BigAutoField(primary_key=True)
+    category = models.CharField(max_length=100)
+    difficulty = models.CharField(max_length=10, choices=DIFFICULTY_CHOICES)
+    digest = models.CharField(max_length=40)  # sha1 de `norm`
+    norm = models.TextField()
+    first_seen_at = models.DateTimeField(auto_now_add=True)
+    last_seen_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "question_fingerprint"
+        indexes = [
+            models.Index(fields=["category", "difficulty", "-last_seen_at"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["category", "difficulty", "digest"], name="uniq_question_fingerprint"),
+        ]
+
+    @classmethod
+    def record(cls, category, difficulty, questions):
+        """Inserta las huellas nuevas y actualiza last_seen_at de las existentes (un upsert)."""
+        if not category or not difficulty:
+            return 0
+        now = timezone.now()
+        rows = {}
+        for q in questions or []:
+            fp = SessionFingerprint.fingerprint(q)
+            if fp:
+                rows[fp[1]] = cls(category=category, difficulty=difficulty, digest=fp[1],
+                                  norm=fp[0], first_seen_at=now, last_seen_at=now)
+        if rows:
+            cls.objects.bulk_create(
+                list(rows.values()),
+                update_conflicts=True,
+                unique_fields=["category", "difficulty", "digest"],
+                update_fields=["last_seen_at"],
+            )
+        return len(rows)
+
+    def __str__(self):
+        return f"qfp[{self.category}/{self.difficulty}] {self.norm[:40]}"
+
+
+class BankedQuestion(models.Model):
+    """
+    Pregunta pre-generada y ya moderada, lista para servir previews al instante.
+    Se agrupa por (categoría de la taxonomía, dificultad, tipo); la rellena el
+    worker de services/question_bank y se consume (se borra) al servirse.
+    """
+    id = models.BigAutoField(primary_key=True)
+    category = models.CharField(max_length=100)
+    difficulty = models.CharField(max_length=10, choices=DIFFICULTY_CHOICES)
+    qtype = models.CharField(max_length=10)  # "mcq" | "vf" | "short"
+    question = JSONField()
+    provider = models.CharField(max_length=20, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "question_bank"
+        indexes = [
+            models.Index(fields=["category", "difficulty", "qtype", "id"]),
+        ]
+
+    def __str__(self):
+        return f"bank[{self.category}/{self.difficulty}/{self.qtype}] #{self.id}"
+
+
+class QuizStatCounter(models.Model):
+    """
+    Resumen de SavedQuiz mantenido en incrementos por SavedQuiz.save()/delete()
+    (deltas con F(), sin releer la tabla). Una fila por dimensión:
+    ("all", ""), ("topic", <tema>) y ("difficulty", <dificultad>).
+    progress_sum suma `progress` sólo de los cuestionarios en curso.
+    Si se desincroniza (p. ej. tras un queryset.delete()), rebuild() lo recalcula.
+    """
+    DIMENSION_CHOICES = (
+        ("all", "all"),
+        ("topic", "topic"),
+        ("difficulty", "difficulty"),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES)
+    value = models.CharField(max_length=200, blank=True)
+    total = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    progress_sum = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "quiz_stat_counter"
+        constraints = [
+            models.UniqueConstraint(fields=["dimension", "value"], name="uniq_quiz_stat_counter"),
+        ]
+
+    @staticmethod
+    def _rows_for(state):
+        """state = (topic, difficulty, is_completed, progress) -> {(dim, value): (total, completed, progress)}"""
+        if state is None:
+            return {}
+        topic, difficulty, is_completed, progress = state
+        delta = (1, 1 if is_completed else 0, 0 if is_completed else progress)
+        return {("all", ""): delta, ("topic", topic): delta, ("difficulty", difficulty): delta}
+
+    @classmethod
+    def apply(cls, old, new):
+        """Aplica la diferencia entre dos estados de un SavedQuiz (None = no existe)."""
+        deltas = {}
+        for sign, state in ((-1, old), (1, new)):
+            for key, values in cls._rows_for(state).items():
+                acc = deltas.setdefault(key, [0, 0, 0])
+                for i, v in enumerate(values):
+                    acc[i] += sign * v
+        # orden fijo de filas: dos escritores no se bloquean en orden cruzado
+        for (dimension, value), (d_total, d_completed, d_progress) in sorted(deltas.items()):
+            if not (d_total or d_completed or d_progress):
+                continue
+            changes = dict(
+                total=models.F("total") + d_total,
+                completed=models.F("completed") + d_completed,
+                progress_sum=models.F("progress_sum") + d_progress,
+                updated_at=timezone.now(),
+            )
+            rows = cls.objects.filter(dimension=dimension, value=value)
+            if not rows.update(**changes):
+                cls.objects.bulk_create([cls(dimension=dimension, value=value)], ignore_conflicts=True)
+                rows.update(**changes)
+
+    @classmethod
+    def rebuild(cls):
+        """Recalcula todas las filas con agregados en BD sobre las columnas desnormalizadas."""
+        in_progress = models.Q(is_completed=False)
+        aggregates = dict(
+            total=models.Count("id"),
+            completed=models.Count("id", filter=models.Q(is_completed=True)),
+            progress_sum=Coalesce(models.Sum("progress", filter=in_progress), 0),
+        )
+        rows = [cls(dimension="all", value="", **SavedQuiz.objects.aggregate(**aggregates))]
+        for dimension in ("topic", "difficulty"):
+            for row in SavedQuiz.objects.order_by().values(dimension).annotate(**aggregates):
+                value = row.pop(dimension)
+                rows.append(cls(dimension=dimension, value=value, **row))
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(rows)
+        return len(rows)
+
+    @property
+    def in_progress(self):
+        return self.total - self.completed
+
+    @property
+    def average_progress(self):
+        """Progreso medio de los cuestionarios en curso."""
+        return self.progress_sum / self.in_progress if self.in_progress > 0 else 0
+
+    def __str__(self):
+        return f"stats[{self.dimension}:{self.value}] {self.completed}/{self.total}"
+
+
+class SavedQuiz(optimistic.VersionedMixin, models.Model):
     """
     Cuestionarios guardados por el usuario para continuar más tarde.
     Almacena el estado completo del cuestionario y su configuración.
@@ -79,7 +655,11 @@ class SavedQuiz(models.Model):
     counts = models.JSONField(default=dict, help_text="Cantidad por tipo de pregunta")
     
     # Estado del cuestionario
-    questions = JSONField(default=list, help_text="Preguntas generadas del cuestionario")
+    question_set = models.ForeignKey(
+        QuestionSet, on_delete=models.PROTECT, null=True, blank=True, related_name="+",
+        help_text="Preguntas generadas del cuestionario (vacío = None)",
+    )
+    questions = _question_list_property("Preguntas (lista) guardadas en question_set")
     user_answers = JSONField(default=dict, help_text="Respuestas del usuario {index: respuesta}")
     current_question = models.PositiveIntegerField(default=0, help_text="Índice de la pregunta actual")
     is_completed = models.BooleanField(default=False, help_text="Si el cuestionario fue completado")
@@ -100,6 +680,15 @@ class SavedQuiz(models.Model):
         help_text="Si este es un quiz de repaso, referencia al quiz original del que proviene. Permite trazabilidad de la cadena de repaso."
     )
 
+    # Contadores desnormalizados (los mantiene save()): el listado no carga los JSON
+    question_count = models.PositiveIntegerField(default=0, help_text="len(questions)")
+    answered_count = models.PositiveIntegerField(default=0, help_text="len(user_answers)")
+    marked_count = models.PositiveIntegerField(default=0, help_text="len(favorite_questions)")
+    progress = models.PositiveSmallIntegerField(default=0, help_text="get_progress_percentage()")
+
+    # concurrencia optimista (services/optimistic): sube en cada escritura
+    version = models.PositiveIntegerField(default=1)
+
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -112,24 +701,123 @@ class SavedQuiz(models.Model):
             models.Index(fields=['topic', 'difficulty']),
             models.Index(fields=['created_at']),
             models.Index(fields=['last_accessed']),
-            models.Index(fields=['is_completed']),
+            models.Index(fields=['is_completed', 'progress']),
+            # paginación por cursor del listado (ver views_saved_quizzes.saved_quizzes)
+            models.Index(fields=['-created_at', 'id'], name='saved_quiz_created_keyset_idx'),
         ]
 
+    # campo JSON -> (contador desnormalizado, tipo que se cuenta)
+    _COUNTERS = (
+        ("questions", "question_count", (list, dict)),
+        ("user_answers", "answered_count", dict),
+        ("favorite_questions", "marked_count", list),
+    )
+
+    # campos que determinan la fila del SavedQuiz en QuizStatCounter
+    _STAT_FIELDS = ("topic", "difficulty", "is_completed", "progress")
+    _PROGRESS_SOURCES = ("current_question", "question_count", "is_completed")
+
+    def _sync_counters(self, update_fields):
+        """
+        Recalcula los contadores de los JSON que se van a escribir y `progress`.
+        Los campos diferidos (no cargados) no se tocan; con update_fields se
+        añaden los contadores correspondientes. Devuelve update_fields actualizado.
+        """
+        deferred = self.get_deferred_fields()
+        extra = []
+        for source, counter, kind in self._COUNTERS:
+            column = "question_set" if source == "questions" else source
+            if column in deferred or (update_fields is not None and column not in update_fields):
+                continue
+            if source == "questions" and "_question_list" not in self.__dict__:
+                # lista sin decodificar: sólo cambia si se cambió el puntero
+                if self.question_set_id == self.__dict__.get("_stored_question_set_id", ...):
+                    continue
+                self.question_count = (QuestionSet.objects.values_list("count", flat=True)
+                                       .filter(pk=self.question_set_id).first() or 0)
+                extra.append(counter)
+                continue
+            value = getattr(self, source)
+            setattr(self, counter, len(value) if isinstance(value, kind) else 0)
+            extra.append(counter)
+        written = set(update_fields or ()) | set(extra)
+        if not deferred.intersection(self._PROGRESS_SOURCES) and (
+            update_fields is None or written.intersection(self._PROGRESS_SOURCES)
+        ):
+            self.progress = self.get_progress_percentage()
+            extra.append("progress")
+        if update_fields is None:
+            return None
+        return list(update_fields) + [c for c in extra if c not in update_fields]
+
+    def _stat_state(self):
+        """(topic, difficulty, is_completed, progress) si están cargados; si no, None."""
+        if any(f in self.get_deferred_fields() for f in self._STAT_FIELDS):
+            return None
+        return tuple(getattr(self, f) for f in self._STAT_FIELDS)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_stat_state = instance._stat_state()
+        if "question_set_id" in instance.__dict__:
+            instance._stored_question_set_id = instance.question_set_id
+        return instance
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic():
+            update_fields = optimistic.bump_for_save(self, kwargs.get("update_fields"))
+            update_fields = _store_question_list(self, "questions", update_fields)
+            update_fields = self._sync_counters(update_fields)
+            kwargs["update_fields"] = update_fields
+            touches_stats = adding or update_fields is None or bool(set(update_fields) & set(self._STAT_FIELDS))
+            old = None
+            if touches_stats and not adding:
+                old = getattr(self, "_stored_stat_state", None)
+                if old is None:
+                    old = (SavedQuiz.objects.filter(pk=self.pk)
+                           .values_list(*self._STAT_FIELDS).first())
+            super().save(*args, **kwargs)
+            if touches_stats:
+                new = self._stat_state()
+                if new is None:
+                    new = SavedQuiz.objects.filter(pk=self.pk).values_list(*self._STAT_FIELDS).first()
+                elif old is not None and update_fields is not None:
+                    # lo que no se escribió sigue como estaba en BD
+                    new = tuple(v if f in update_fields else o
+                                for f, v, o in zip(self._STAT_FIELDS, new, old))
+                QuizStatCounter.apply(old, new)
+                self._stored_stat_state = new
+            if "question_set_id" in self.__dict__:
+                self._stored_question_set_id = self.question_set_id
+            if adding:
+                QuestionFingerprint.record(self.category, self.difficulty, self.questions)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            state = self._stat_state() or (
+                SavedQuiz.objects.filter(pk=self.pk).values_list(*self._STAT_FIELDS).first()
+            )
+            result = super().delete(*args, **kwargs)
+            QuizStatCounter.apply(state, None)
+        return result
+
     def __str__(self):
-        status = "Completado" if self.is_completed else f"Pregunta {self.current_question + 1}/{len(self.questions)}"
+        status = "Completado" if self.is_completed else f"Pregunta {self.current_question + 1}/{self.question_count}"
         return f"{self.title} - {self.topic} ({self.difficulty}) - {status}"
 
     def get_progress_percentage(self):
         """Retorna el porcentaje de progreso del cuestionario"""
-        if not self.questions:
+        if not self.question_count:
             return 0
         if self.is_completed:
             return 100
-        return int((self.current_question / len(self.questions)) * 100)
+        return int((self.current_question / self.question_count) * 100)
 
     def is_review_quiz(self):
         """Retorna True si este quiz es un repaso (tiene quiz original)"""
-        return self.original_quiz is not None
+        return self.original_quiz_id is not None
 
     def get_root_quiz(self):
         """
@@ -155,7 +843,7 @@ class SavedQuiz(models.Model):
 
     def get_answered_count(self):
         """Retorna la cantidad de preguntas respondidas"""
-        return len(self.user_answers) if isinstance(self.user_answers, dict) else 0
+        return self.answered_count
     
 class AudioPrivacyPreference(models.Model):
     """Preferencias de privacidad de audio por usuario"""
@@ -333,3 +1021,49 @@ class VoiceMetricEvent(models.Model):
 
     def __str__(self):
         return f"{self.event_type} - {self.timestamp} - User {self.user_id}"
+
+
+class LLMCallEvent(models.Model):
+    """
+    Telemetría por llamada a proveedor LLM (Gemini/Perplexity).
+    Se escribe en lote (write-behind) desde services/llm_telemetry.
+    """
+    OUTCOME_CHOICES = [
+        ("success", "success"),
+        ("schema_error", "schema_error"),
+        ("no_credits", "no_credits"),
+        ("timeout", "timeout"),
+        ("circuit_open", "circuit_open"),
+        ("cancelled", "cancelled"),
+        ("error", "error"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    provider = models.CharField(max_length=20, help_text="'gemini' | 'perplexity'")
+    model = models.CharField(max_length=100, blank=True)
+    operation = models.CharField(max_length=30, help_text="generate, regenerate, stream, hint, suggestion...")
+    latency_ms = models.IntegerField()
+    prompt_chars = models.IntegerField(null=True, blank=True)
+    response_chars = models.IntegerField(null=True, blank=True)
+    prompt_tokens = models.IntegerField(null=True, blank=True)
+    completion_tokens = models.IntegerField(null=True, blank=True)
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES)
+    fallback = models.BooleanField(default=False, help_text="Llamada hecha al proveedor de respaldo")
+    error = models.CharField(max_length=255, blank=True)
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'llm_call_events'
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['provider', 'operation', 'timestamp']),
+            models.Index(fields=['outcome', 'timestamp']),
+        ]
+
+    def __str__(self):
+        return f"{self.provider}/{self.operation} {self.outcome} {self.latency_ms}ms"
+
+
+# Modelos de tracking de ediciones (módulo aparte; se importan aquí para que
+# la app los registre y tengan migración).
+from .models_question_tracking import QuestionEditLog, QuestionOriginMetadata  # noqa: E402,F401
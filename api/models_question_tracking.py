@@ -118,15 +118,16 @@ class QuestionEditLog(models.Model):
         return f"{self.operation_type} - Q{self.question_index} - Session {self.session_id}"
 
     @classmethod
-    def log_manual_edit(cls, session, index, before, after):
+    def log_manual_edit(cls, session, index, before, after, commit=True):
         """
         Helper para crear un log de edición manual.
 
         Args:
             session: GenerationSession instance
             index: índice de la pregunta
-            before: dict con pregunta anterior
+            before: dict con pregunta anterior (None si no se conoce)
             after: dict con pregunta editada
+            commit: False devuelve la instancia sin guardar (para bulk_create)
 
         Returns:
             QuestionEditLog instance
@@ -134,10 +135,11 @@ class QuestionEditLog(models.Model):
         # Detectar qué campos cambiaron
         changed = []
         for key in ['question', 'answer', 'options', 'explanation']:
-            if before.get(key) != after.get(key):
+            if (before or {}).get(key) != after.get(key):
                 changed.append(key)
 
-        return cls.objects.create(
+        return cls._build(
+            commit,
             session=session,
             question_index=index,
             operation_type='manual_edit',
@@ -195,7 +197,7 @@ class QuestionEditLog(models.Model):
         )
 
     @classmethod
-    def log_creation(cls, session, index, question_data):
+    def log_creation(cls, session, index, question_data, commit=True):
         """
         Helper para crear un log de pregunta nueva.
 
@@ -203,11 +205,13 @@ class QuestionEditLog(models.Model):
             session: GenerationSession instance
             index: índice de la pregunta nueva
             question_data: dict con datos de la pregunta
+            commit: False devuelve la instancia sin guardar (para bulk_create)
 
         Returns:
             QuestionEditLog instance
         """
-        return cls.objects.create(
+        return cls._build(
+            commit,
             session=session,
             question_index=index,
             operation_type='creation',
@@ -216,6 +220,10 @@ class QuestionEditLog(models.Model):
             changed_fields=[]
         )
 
+    @classmethod
+    def _build(cls, commit, **fields):
+        return cls.objects.create(**fields) if commit else cls(**fields)
+
     def get_edit_summary(self):
         """
         Retorna un resumen legible de la edición.
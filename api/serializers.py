@@ -71,23 +71,22 @@ class SavedQuizSerializer(serializers.ModelSerializer):
             'types', 'counts', 'questions', 'user_answers',
             'current_question', 'is_completed', 'score',
             'favorite_questions',  # Campo de preguntas marcadas
+            'version',  # Concurrencia optimista: se reenvía en PUT/PATCH
             'created_at', 'updated_at', 'last_accessed',
             'progress_percentage', 'answered_count', 'total_questions',
             'marked_count',  # Conteo de preguntas marcadas
             'is_review',  # Indica si es un quiz de repaso
             'original_quiz_info'  # Información básica del quiz original
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'version', 'created_at', 'updated_at']
 
     def get_total_questions(self, obj):
         """Retorna el número total de preguntas en el quiz"""
-        return len(obj.questions) if obj.questions else 0
+        return obj.question_count
 
     def get_marked_count(self, obj):
         """Retorna el número de preguntas marcadas como favoritas"""
-        if obj.favorite_questions and isinstance(obj.favorite_questions, list):
-            return len(obj.favorite_questions)
-        return 0
+        return obj.marked_count
 
     def get_is_review(self, obj):
         """Indica si este quiz es un repaso de otro quiz"""
@@ -188,8 +187,8 @@ class SavedQuizListSerializer(serializers.ModelSerializer):
         ]
 
     def get_total_questions(self, obj):
-        """Retorna el número total de preguntas en el quiz"""
-        return len(obj.questions) if obj.questions else 0
+        """Retorna el número total de preguntas (contador desnormalizado, sin cargar el JSON)"""
+        return obj.question_count
 
     def get_marked_count(self, obj):
         """
@@ -201,9 +200,7 @@ class SavedQuizListSerializer(serializers.ModelSerializer):
         Returns:
             int: Número de preguntas marcadas (0 si no hay ninguna)
         """
-        if obj.favorite_questions and isinstance(obj.favorite_questions, list):
-            return len(obj.favorite_questions)
-        return 0
+        return obj.marked_count
 
     def get_is_review(self, obj):
         """Indica si este quiz es un repaso"""
@@ -293,6 +290,7 @@ class UpdateQuizProgressSerializer(serializers.Serializer):
     user_answers = serializers.DictField()
     is_completed = serializers.BooleanField(required=False)
     score = serializers.DictField(required=False)
+    version = serializers.IntegerField(min_value=1, required=False, help_text="Versión leída (409 si cambió)")
     favorite_questions = serializers.ListField(
         child=serializers.IntegerField(min_value=0),
         required=False,
@@ -313,6 +311,45 @@ class UpdateQuizProgressSerializer(serializers.Serializer):
         return value
 
 
+class QuizProgressDeltaSerializer(serializers.Serializer):
+    """
+    Serializer para PATCH de progreso incremental
+
+    Sólo trae lo que cambió: respuestas nuevas o corregidas ({índice: respuesta},
+    o el atajo index + answer), y opcionalmente current_question, is_completed y score.
+    """
+    answers = serializers.DictField(required=False, default=dict)
+    index = serializers.IntegerField(min_value=0, required=False)
+    answer = serializers.JSONField(required=False)
+    current_question = serializers.IntegerField(min_value=0, required=False)
+    is_completed = serializers.BooleanField(required=False)
+    score = serializers.DictField(required=False)
+    version = serializers.IntegerField(min_value=1, required=False, help_text="Versión leída (409 si cambió)")
+
+    def validate_answers(self, value):
+        normalized = {}
+        for key, answer in value.items():
+            try:
+                index = int(key)
+            except (TypeError, ValueError):
+                raise serializers.ValidationError(f"Índice inválido: {key!r}")
+            if index < 0:
+                raise serializers.ValidationError(f"Índice inválido: {key!r}")
+            normalized[str(index)] = answer
+        return normalized
+
+    def validate(self, data):
+        if 'index' in data:
+            if 'answer' not in data:
+                raise serializers.ValidationError({'answer': 'Requerido junto con index'})
+            data['answers'][str(data.pop('index'))] = data.pop('answer')
+        elif 'answer' in data:
+            raise serializers.ValidationError({'index': 'Requerido junto con answer'})
+        if not (data['answers'] or {'current_question', 'is_completed', 'score'} & set(data)):
+            raise serializers.ValidationError('No hay cambios que aplicar')
+        return data
+
+
 # ============================================================================
 # NUEVOS SERIALIZERS PARA EDICIÓN Y VALIDACIÓN ROBUSTA DE PREGUNTAS
 # ============================================================================
@@ -0,0 +1,60 @@
+# api/services/access_tracker.py
+"""
+Registro diferido de SavedQuiz.last_accessed.
+
+Leer un cuestionario (GET detalle, load) no escribe en la petición: touch()
+deja el instante en un WriteBehindBuffer por id (varios accesos al mismo quiz
+se fusionan) y el hilo del buffer lo vuelca con un bulk_update cada
+SAVED_QUIZ_ACCESS_FLUSH_S segundos, al llegar a SAVED_QUIZ_ACCESS_BATCH ids
+distintos, o al terminar el proceso.
+
+El volcado usa GREATEST(last_accessed, t): un acceso encolado nunca pisa un
+valor más reciente escrito por save() (p. ej. un PUT de progreso).
+
+SAVED_QUIZ_ACCESS_WRITE_BEHIND=0 vuelve a la escritura síncrona.
+"""
+
+import os
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+from django.db.models import DateTimeField, F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from ..models import SavedQuiz
+from .write_behind import WriteBehindBuffer
+
+WRITE_BEHIND = os.getenv("SAVED_QUIZ_ACCESS_WRITE_BEHIND", "true").lower() in ("1", "true", "yes")
+BATCH_SIZE = int(os.getenv("SAVED_QUIZ_ACCESS_BATCH", "200"))
+FLUSH_INTERVAL_S = float(os.getenv("SAVED_QUIZ_ACCESS_FLUSH_S", "5"))
+
+
+def _latest(at: datetime):
+    return Greatest(F("last_accessed"), Value(at, output_field=DateTimeField()))
+
+
+def _write(items: Iterable[Tuple[str, datetime]]):
+    rows = []
+    for quiz_id, at in items:
+        quiz = SavedQuiz(id=quiz_id)
+        quiz.last_accessed = _latest(at)
+        rows.append(quiz)
+    SavedQuiz.objects.bulk_update(rows, ["last_accessed"], batch_size=BATCH_SIZE)
+
+
+buffer = WriteBehindBuffer("saved-quiz-access", _write, max_items=BATCH_SIZE, interval_s=FLUSH_INTERVAL_S)
+
+
+def touch(quiz: SavedQuiz, at: Optional[datetime] = None) -> None:
+    """Marca el acceso: actualiza la instancia en memoria y encola la escritura."""
+    at = at or timezone.now()
+    quiz.last_accessed = at
+    if WRITE_BEHIND:
+        buffer.add((quiz.pk, at), key=quiz.pk)
+    else:
+        SavedQuiz.objects.filter(pk=quiz.pk).update(last_accessed=_latest(at))
+
+
+def flush() -> int:
+    return buffer.flush()
@@ -1,6 +1,6 @@
 # api/services/azure_speech.py
 import time, hashlib, os, base64
-import requests
+from . import http_client, circuit_breaker
 from django.conf import settings
 
 SPEECH_REGION = os.getenv("SPEECH_REGION", "")
@@ -19,7 +19,7 @@ def _hash_key(voice: str, fmt: str, text: str) -> str:
 
 def issue_token() -> str:
     # Token ~10 min
-    r = requests.post(
+    r = http_client.post(
         TOKEN_URL,
         headers={"Ocp-Apim-Subscription-Key": SPEECH_KEY},
         timeout=10,
@@ -39,6 +39,16 @@ def synthesize(text: str,
         with open(cached, "rb") as f:
             return f.read()
 
+    with circuit_breaker.guard("azure_speech"):
+        audio, latency_ms = _synthesize_remote(text, voice, fmt)
+
+    # guarda cache
+    with open(cached, "wb") as f:
+        f.write(audio)
+
+    return audio, latency_ms
+
+def _synthesize_remote(text: str, voice: str, fmt: str):
     token = issue_token()
     ssml = f"""
 <speak version="1.0" xml:lang="es-ES">
@@ -54,13 +64,7 @@ def synthesize(text: str,
         "User-Agent": "quizgenai-backend"
     }
     t0 = time.perf_counter()
-    r = requests.post(TTS_URL, data=ssml.encode("utf-8"), headers=headers, timeout=30)
+    r = http_client.post(TTS_URL, data=ssml.encode("utf-8"), headers=headers, timeout=30)
     latency_ms = int((time.perf_counter() - t0) * 1000)
     r.raise_for_status()
-    audio = r.content
-
-    # guarda cache
-    with open(cached, "wb") as f:
-        f.write(audio)
-
-    return audio, latency_ms
+    return r.content, latency_ms
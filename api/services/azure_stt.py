@@ -1,7 +1,7 @@
 # api/services/azure_stt.py
 import os
 import time
-import requests
+from . import http_client, circuit_breaker
 
 SPEECH_REGION = os.getenv("SPEECH_REGION", "")
 SPEECH_KEY = os.getenv("SPEECH_KEY", "")
@@ -15,7 +15,7 @@ _STT_URL = (
 )
 
 def issue_token() -> str:
-    r = requests.post(
+    r = http_client.post(
         _TOKEN_URL,
         headers={"Ocp-Apim-Subscription-Key": SPEECH_KEY},
         timeout=10,
@@ -35,7 +35,8 @@ def recognize_short_audio(
     """
     assert SPEECH_REGION and SPEECH_KEY, "Configura SPEECH_REGION y SPEECH_KEY"
 
-    token = issue_token()
+    with circuit_breaker.guard("azure_speech"):
+        token = issue_token()
     params = {"language": language, "format": result_format}
 
     headers = {
@@ -48,9 +49,10 @@ def recognize_short_audio(
     }
 
     t0 = time.perf_counter()
-    r = requests.post(_STT_URL, params=params, headers=headers, data=audio_bytes, timeout=60)
-    latency_ms = int((time.perf_counter() - t0) * 1000)
-    r.raise_for_status()
+    with circuit_breaker.guard("azure_speech"):
+        r = http_client.post(_STT_URL, params=params, headers=headers, data=audio_bytes, timeout=60)
+        latency_ms = int((time.perf_counter() - t0) * 1000)
+        r.raise_for_status()
     data = r.json()
 
     # "detailed" devuelve NBest; "simple" devuelve DisplayText
@@ -0,0 +1,215 @@
+# api/services/circuit_breaker.py
+"""
+Circuit breaker por proveedor externo (gemini, perplexity, azure_speech).
+
+Estados:
+  - closed: las llamadas pasan; se cuentan fallos en una ventana de CB_WINDOW_S.
+  - open: tras CB_FAILURE_THRESHOLD fallos, o UN error de límite de peticiones
+    (429) o de créditos (402), las llamadas fallan al instante con CircuitOpen
+    durante el cooldown: CB_COOLDOWN_S, o CB_CREDITS_COOLDOWN_S sólo si fue por
+    créditos (un 429 pasajero no deja fuera al proveedor 15 minutos).
+  - half_open: vencido el cooldown, sólo UNA petición hace de sonda; si va bien
+    se cierra, si falla se vuelve a abrir.
+
+El estado vive en la caché de Django. Sólo es común a todos los workers de
+gunicorn con una caché compartida (REDIS_URL, ver CACHES en settings); con la
+LocMemCache por defecto cada proceso tiene su propio circuito.
+Si la caché falla, el breaker deja pasar las llamadas (nunca bloquea por sí mismo).
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ["gemini", "perplexity", "azure_speech"]
+
+FAILURE_THRESHOLD = int(os.getenv("CB_FAILURE_THRESHOLD", "5"))
+WINDOW_S = int(os.getenv("CB_WINDOW_S", "60"))
+COOLDOWN_S = int(os.getenv("CB_COOLDOWN_S", "30"))
+CREDITS_COOLDOWN_S = int(os.getenv("CB_CREDITS_COOLDOWN_S", "900"))
+PROBE_TIMEOUT_S = int(os.getenv("CB_PROBE_TIMEOUT_S", "60"))
+
+_PREFIX = "cb:"
+
+# Un 429 manda aunque el mensaje hable de cuota o facturación (Gemini lo hace)
+_RATE_LIMIT_KEYWORDS = [
+    "429", "too many requests", "rate limit", "rate_limit", "resource_exhausted", "resource exhausted",
+]
+_NO_CREDITS_KEYWORDS = [
+    "quota", "over quota", "insufficient", "billing", "payment required",
+    "credit", "out of credits", "402",
+]
+
+
+class CircuitOpen(RuntimeError):
+    """El circuito del proveedor está abierto; no se intentó la llamada."""
+
+    def __init__(self, provider: str, reason: str, retry_in: float):
+        self.provider = provider
+        self.reason = reason
+        self.retry_in = max(0.0, retry_in)
+        # "no_credits"/"rate_limited" en el mensaje -> is_no_credits()/is_rate_limited()
+        # lo reconocen (fallback/503)
+        super().__init__(f"circuit_open: {provider} ({reason}, retry in {int(self.retry_in)}s)")
+
+
+def is_rate_limited(err) -> bool:
+    """Heurística de 429/límite de peticiones sobre una excepción o mensaje."""
+    m = str(err or "").lower()
+    return any(kw in m for kw in _RATE_LIMIT_KEYWORDS)
+
+
+def is_no_credits(err) -> bool:
+    """Heurística de 402/cuota/créditos agotados (no un 429) sobre una excepción o mensaje."""
+    m = str(err or "").lower()
+    return not is_rate_limited(m) and any(kw in m for kw in _NO_CREDITS_KEYWORDS)
+
+
+def _key(provider: str, part: str) -> str:
+    return f"{_PREFIX}{provider}:{part}"
+
+
+def allow(provider: str) -> None:
+    """
+    Lanza CircuitOpen si el circuito no admite la llamada. En half-open sólo
+    la primera petición que lo pide obtiene la sonda.
+    """
+    try:
+        opened = cache.get(_key(provider, "open"))
+    except Exception:
+        return
+    if not opened:
+        return
+
+    now = time.time()
+    if now < opened["until"]:
+        raise CircuitOpen(provider, opened["reason"], opened["until"] - now)
+    try:
+        got_probe = cache.add(_key(provider, "probe"), now, timeout=PROBE_TIMEOUT_S)
+    except Exception:
+        return
+    if not got_probe:
+        raise CircuitOpen(provider, f"{opened['reason']}, probing", PROBE_TIMEOUT_S)
+    logger.info("Circuit %s half-open: probando", provider)
+
+
+def is_available(provider: str) -> bool:
+    """Consulta sin efectos: False si el circuito está abierto y en cooldown."""
+    try:
+        opened = cache.get(_key(provider, "open"))
+    except Exception:
+        return True
+    return not opened or time.time() >= opened["until"]
+
+
+def record_success(provider: str) -> None:
+    try:
+        if cache.get(_key(provider, "open")):
+            logger.info("Circuit %s cerrado tras sonda correcta", provider)
+        cache.delete_many([_key(provider, "open"), _key(provider, "probe"), _key(provider, "failures")])
+    except Exception:
+        pass
+
+
+def record_failure(provider: str, no_credits: bool = False, rate_limited: bool = False) -> None:
+    """
+    Cuenta un fallo; abre el circuito si se supera el umbral o si fue por
+    créditos (CB_CREDITS_COOLDOWN_S) o por límite de peticiones (CB_COOLDOWN_S).
+    """
+    try:
+        probing = cache.get(_key(provider, "probe")) is not None
+        if no_credits or rate_limited or probing:
+            failures = FAILURE_THRESHOLD
+        else:
+            key = _key(provider, "failures")
+            if cache.add(key, 1, timeout=WINDOW_S):
+                failures = 1
+            else:
+                failures = cache.incr(key)
+        if failures >= FAILURE_THRESHOLD:
+            if no_credits:
+                _open(provider, "no_credits", CREDITS_COOLDOWN_S)
+            else:
+                _open(provider, "rate_limited" if rate_limited else "failures", COOLDOWN_S)
+    except Exception:
+        pass
+
+
+def _open(provider: str, reason: str, cooldown_s: int) -> None:
+    until = time.time() + cooldown_s
+    cache.set(_key(provider, "open"), {"until": until, "reason": reason}, timeout=None)
+    cache.delete_many([_key(provider, "probe"), _key(provider, "failures")])
+    logger.warning("Circuit %s abierto (%s) durante %ss", provider, reason, cooldown_s)
+
+
+def _counts_as_failure(exc: BaseException) -> bool:
+    # Respuestas mal formadas o lotes cortos (ValueError) no indican caída del proveedor
+    return not isinstance(exc, (CircuitOpen, ValueError))
+
+
+@contextmanager
+def guard(provider: str):
+    """
+    with guard("gemini"): ...  -> consulta el circuito antes y registra el
+    resultado después (éxito, fallo, límite de peticiones o fallo por créditos).
+    """
+    allow(provider)
+    try:
+        yield
+    except Exception as exc:
+        if _counts_as_failure(exc):
+            record_failure(provider, no_credits=is_no_credits(exc), rate_limited=is_rate_limited(exc))
+        else:
+            _release_probe(provider)
+        raise
+    except BaseException:
+        # GeneratorExit (cliente cerró un stream), KeyboardInterrupt...: sin veredicto
+        _release_probe(provider)
+        raise
+    else:
+        record_success(provider)
+
+
+def _release_probe(provider: str) -> None:
+    # la sonda no debe quedar tomada hasta PROBE_TIMEOUT_S
+    try:
+        cache.delete(_key(provider, "probe"))
+    except Exception:
+        pass
+
+
+def call(provider: str, fn: Callable, *args, **kwargs):
+    """Ejecuta fn(*args, **kwargs) protegida por el circuito de `provider`."""
+    with guard(provider):
+        return fn(*args, **kwargs)
+
+
+def snapshot(providers: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+    """{proveedor: {state, reason, retry_in_s, recent_failures}} para métricas."""
+    out = {}
+    now = time.time()
+    for provider in list(providers or PROVIDERS):
+        try:
+            opened = cache.get(_key(provider, "open"))
+            failures = int(cache.get(_key(provider, "failures")) or 0)
+            probing = cache.get(_key(provider, "probe")) is not None
+        except Exception:
+            opened, failures, probing = None, 0, False
+        if not opened:
+            out[provider] = {"state": "closed", "reason": None, "retry_in_s": 0, "recent_failures": failures}
+        else:
+            remaining = opened["until"] - now
+            out[provider] = {
+                "state": "open" if remaining > 0 else "half_open",
+                "probing": probing,
+                "reason": opened["reason"],
+                "retry_in_s": max(0, int(remaining)),
+                "recent_failures": failures,
+            }
+    return out
@@ -0,0 +1,82 @@
+# api/services/gemini_registry.py
+"""
+Registro de modelos Gemini reutilizables por proceso.
+
+genai.configure() y la construcción de GenerativeModel/GenerationConfig se
+hacen una sola vez por combinación (modelo, schema, parámetros de muestreo) y
+se comparten entre peticiones e hilos. Si GEMINI_API_KEY cambia (rotación),
+se reconfigura el SDK y se descartan los modelos construidos con la clave vieja.
+"""
+
+import json
+import os
+import threading
+from typing import Optional
+
+_lock = threading.Lock()
+_models = {}
+_configured_key: Optional[str] = None
+
+
+def _import_genai():
+    """
+    Import tardío para evitar que Azure cargue primero /agents/python y rompa typing_extensions.
+    Si falla la importación, elevamos un RuntimeError 'genai_unavailable' que se maneja como 503.
+    """
+    try:
+        import google.generativeai as genai  # import perezoso
+        return genai
+    except Exception as e:
+        raise RuntimeError(f"genai_unavailable: {e}")
+
+
+def get_genai():
+    """Devuelve el módulo genai configurado con la GEMINI_API_KEY vigente."""
+    global _configured_key
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise RuntimeError("GEMINI_API_KEY not set")
+    genai = _import_genai()
+    if api_key != _configured_key:
+        with _lock:
+            if api_key != _configured_key:
+                genai.configure(api_key=api_key)
+                _models.clear()
+                _configured_key = api_key
+    return genai
+
+
+def get_model(model_name: str, schema: Optional[dict] = None, **sampling):
+    """
+    GenerativeModel compartido para (model_name, schema, sampling).
+    - schema: JSON schema de respuesta (activa response_mime_type=application/json)
+    - sampling: temperature, top_p, top_k, max_output_tokens...
+    """
+    genai = get_genai()
+    key = (
+        model_name,
+        json.dumps(schema, sort_keys=True) if schema is not None else None,
+        tuple(sorted(sampling.items())),
+    )
+    model = _models.get(key)
+    if model is None:
+        with _lock:
+            model = _models.get(key)
+            if model is None:
+                config = None
+                if schema is not None or sampling:
+                    params = dict(sampling)
+                    if schema is not None:
+                        params.update(response_mime_type="application/json", response_schema=schema)
+                    config = genai.GenerationConfig(**params)
+                model = genai.GenerativeModel(model_name, generation_config=config)
+                _models[key] = model
+    return model
+
+
+def invalidate() -> None:
+    """Fuerza reconfiguración y reconstrucción en el próximo uso."""
+    global _configured_key
+    with _lock:
+        _models.clear()
+        _configured_key = None
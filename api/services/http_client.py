@@ -0,0 +1,105 @@
+# api/services/http_client.py
+"""
+Cliente HTTP saliente compartido por todos los proveedores externos
+(Perplexity, Gemini REST, Azure Speech).
+
+- Una requests.Session por host, con su propio pool de conexiones keep-alive,
+  para no pagar TCP+TLS en cada llamada.
+- Política de reintentos con backoff sólo para errores de conexión y 502/503/504.
+  No se reintentan timeouts de lectura ni 402/429: una llamada LLM que ya se
+  procesó (o que falló por créditos) no debe cobrarse dos veces.
+- pool_stats() expone cuántas peticiones reutilizaron una conexión abierta.
+"""
+
+import os
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+RETRY_TOTAL = int(os.getenv("HTTP_RETRY_TOTAL", "2"))
+RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.5"))
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+
+_sessions: Dict[str, requests.Session] = {}
+_lock = threading.Lock()
+
+
+def _build_session() -> requests.Session:
+    retry = Retry(
+        total=RETRY_TOTAL,
+        connect=RETRY_TOTAL,
+        read=0,
+        status=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "POST"}),
+        raise_on_status=False,
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def session_for(url: str) -> requests.Session:
+    """Session (y pool) dedicada al host de `url`; se crea la primera vez."""
+    host = urlsplit(url).netloc.lower()
+    session = _sessions.get(host)
+    if session is None:
+        with _lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = _sessions[host] = _build_session()
+    return session
+
+
+def _timeout(timeout) -> tuple:
+    # Un número se interpreta como timeout de lectura; la conexión usa CONNECT_TIMEOUT
+    if isinstance(timeout, (tuple, list)):
+        return tuple(timeout)
+    return (CONNECT_TIMEOUT, timeout)
+
+
+def request(method: str, url: str, timeout: Optional[float] = 30, **kwargs) -> requests.Response:
+    return session_for(url).request(method, url, timeout=_timeout(timeout), **kwargs)
+
+
+def post(url: str, timeout: Optional[float] = 30, **kwargs) -> requests.Response:
+    return request("POST", url, timeout=timeout, **kwargs)
+
+
+def get(url: str, timeout: Optional[float] = 30, **kwargs) -> requests.Response:
+    return request("GET", url, timeout=timeout, **kwargs)
+
+
+def pool_stats() -> Dict[str, dict]:
+    """
+    {host: {requests, connections_opened, reused, reuse_rate, idle}} por host.
+    `requests` cuenta intentos HTTP (incluye reintentos) desde el arranque del proceso.
+    """
+    stats = {}
+    for host, session in list(_sessions.items()):
+        totals = {"requests": 0, "connections_opened": 0, "idle": 0}
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                totals["requests"] += pool.num_requests
+                totals["connections_opened"] += pool.num_connections
+                # la cola del pool se precarga con None; sólo cuentan conexiones reales
+                if pool.pool is not None:
+                    totals["idle"] += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+        reused = max(0, totals["requests"] - totals["connections_opened"])
+        totals["reused"] = reused
+        totals["reuse_rate"] = round(reused / totals["requests"], 4) if totals["requests"] else 0.0
+        stats[host] = totals
+    return stats
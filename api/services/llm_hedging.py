@@ -0,0 +1,100 @@
+# api/services/llm_hedging.py
+"""
+Peticiones "hedged" entre proveedores LLM (opt-in).
+
+Se lanza el proveedor primario; si no responde antes de un umbral de latencia
+(por defecto su p90 observado), se lanza también el secundario y se devuelve
+el primer resultado válido. La llamada perdedora no se puede cancelar (HTTP en
+curso), así que se deja terminar en segundo plano: ese es el gasto extra que se
+registra en los contadores `hedge_*` de llm_stats.
+"""
+
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Optional, Tuple
+
+from . import llm_stats
+
+HEDGE_ENABLED = os.getenv("LLM_HEDGING", "false").lower() in ("1", "true", "yes")
+# Hedging duplica el gasto de LLM: la cabecera X-LLM-Hedge sólo se respeta si se permite aquí
+HEDGE_HEADER_ALLOWED = os.getenv("LLM_HEDGE_HEADER_ALLOWED", "false").lower() in ("1", "true", "yes")
+# Umbral fijo en segundos; si no se define se usa el percentil observado
+HEDGE_AFTER_S = os.getenv("LLM_HEDGE_AFTER_S")
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "90"))
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_DEFAULT_AFTER_S = float(os.getenv("LLM_HEDGE_DEFAULT_AFTER_S", "8"))
+
+
+class HedgeFailed(RuntimeError):
+    """Ambos proveedores fallaron; `errors` = {proveedor: excepción}."""
+
+    def __init__(self, errors: Dict[str, BaseException]):
+        super().__init__(f"hedge_failed: {list(errors)}")
+        self.errors = errors
+
+
+def hedge_threshold(provider: str, operation: str) -> float:
+    """Segundos a esperar al primario antes de lanzar el secundario."""
+    if HEDGE_AFTER_S:
+        return float(HEDGE_AFTER_S)
+    observed = llm_stats.latency_percentile(
+        provider, operation, HEDGE_PERCENTILE, min_samples=HEDGE_MIN_SAMPLES
+    )
+    return observed if observed is not None else HEDGE_DEFAULT_AFTER_S
+
+
+def hedged_call(
+    primary: str,
+    secondary: str,
+    call: Callable[[str], object],
+    operation: str,
+    threshold_s: Optional[float] = None,
+) -> Tuple[object, str, Dict[str, BaseException], dict]:
+    """
+    call(provider) debe devolver un resultado ya validado o lanzar excepción.
+
+    Devuelve (resultado, proveedor_ganador, errores, reporte) donde reporte es
+    {"hedged": bool, "threshold_s": float, "winner": str, "extra_calls": int}.
+    Si el primario falla antes del umbral, el secundario se lanza de inmediato
+    (fallback normal, sin contar como hedge). Si ambos fallan -> HedgeFailed.
+    """
+    after = hedge_threshold(primary, operation) if threshold_s is None else threshold_s
+    report = {"hedged": False, "threshold_s": round(after, 3), "winner": None, "extra_calls": 0}
+    errors: Dict[str, BaseException] = {}
+
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="llm-hedge")
+
+    def _submit(prov):
+        return pool.submit(
+            contextvars.copy_context().run, llm_stats.timed, prov, operation, call, prov
+        )
+
+    try:
+        futures = {_submit(primary): primary}
+        done, _ = wait(futures, timeout=after)
+        if not done:
+            report["hedged"] = True
+            report["extra_calls"] = 1
+            llm_stats.incr("hedge_launched")
+            futures[_submit(secondary)] = secondary
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                prov = futures[fut]
+                exc = fut.exception()
+                if exc is None:
+                    report["winner"] = prov
+                    if report["hedged"]:
+                        llm_stats.incr("hedge_won_primary" if prov == primary else "hedge_won_secondary")
+                    return fut.result(), prov, errors, report
+                errors[prov] = exc
+                if prov == primary and secondary not in futures.values():
+                    fallback = _submit(secondary)
+                    futures[fallback] = secondary
+                    pending.add(fallback)
+        raise HedgeFailed(errors)
+    finally:
+        pool.shutdown(wait=False)
@@ -0,0 +1,78 @@
+# api/services/llm_stats.py
+"""
+Contadores y latencias ligeras de las llamadas a proveedores LLM.
+
+- Los contadores viven en la caché de Django. Sólo se agregan entre workers de
+  gunicorn si hay REDIS_URL (ver CACHES en settings); con la LocMemCache por
+  defecto cada proceso cuenta lo suyo.
+- Las latencias observadas se guardan en memoria del proceso (ventana
+  deslizante) y sólo se usan para decisiones locales, como el umbral de hedging.
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, Iterable, Optional
+
+from django.core.cache import cache
+
+_COUNTER_PREFIX = "llm_stats:"
+
+# Contadores conocidos (se reportan aunque valgan 0)
+COUNTERS = [
+    "hedge_launched",        # se lanzó el proveedor secundario en paralelo
+    "hedge_won_primary",     # hedging lanzado pero ganó el primario
+    "hedge_won_secondary",   # hedging lanzado y ganó el secundario
+    "topup",                 # lote corto completado pidiendo sólo las faltantes
+    "topup_questions",       # preguntas pedidas en esos top-ups
+]
+
+_LATENCY_WINDOW = 200
+_latencies: Dict[tuple, deque] = defaultdict(lambda: deque(maxlen=_LATENCY_WINDOW))
+_lat_lock = threading.Lock()
+
+
+def incr(name: str, n: int = 1) -> None:
+    """Incrementa un contador global sin romper el flujo si la caché falla."""
+    key = _COUNTER_PREFIX + name
+    try:
+        if not cache.add(key, n, timeout=None):
+            cache.incr(key, n)
+    except Exception:
+        try:
+            cache.set(key, (cache.get(key) or 0) + n, timeout=None)
+        except Exception:
+            pass
+
+
+def counters(names: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """Snapshot {nombre: valor} de los contadores."""
+    names = list(names or COUNTERS)
+    try:
+        raw = cache.get_many([_COUNTER_PREFIX + n for n in names])
+    except Exception:
+        raw = {}
+    return {n: int(raw.get(_COUNTER_PREFIX + n) or 0) for n in names}
+
+
+def record_latency(provider: str, operation: str, seconds: float) -> None:
+    with _lat_lock:
+        _latencies[(provider, operation)].append(seconds)
+
+
+def latency_percentile(provider: str, operation: str, pct: float, min_samples: int = 1) -> Optional[float]:
+    """Percentil (0-100) de la ventana local, o None si no hay muestras suficientes."""
+    with _lat_lock:
+        values = sorted(_latencies.get((provider, operation), ()))
+    if len(values) < max(1, min_samples):
+        return None
+    pos = min(len(values) - 1, int(round((pct / 100.0) * (len(values) - 1))))
+    return values[pos]
+
+
+def timed(provider: str, operation: str, fn, *args, **kwargs):
+    """Ejecuta fn y registra su latencia si termina bien."""
+    t0 = time.monotonic()
+    result = fn(*args, **kwargs)
+    record_latency(provider, operation, time.monotonic() - t0)
+    return result
@@ -0,0 +1,221 @@
+# api/services/llm_telemetry.py
+"""
+Telemetría por llamada a proveedores LLM (tabla llm_call_events).
+
+    with llm_telemetry.track("gemini", "generate", fallback=False):
+        ...                                   # llamada + parseo/validación
+        llm_telemetry.annotate(prompt=p, response=txt, prompt_tokens=..., completion_tokens=...)
+
+- track() mide la latencia y clasifica el resultado (success, schema_error,
+  no_credits, timeout, circuit_open, cancelled, error) según la excepción que salga.
+- annotate() se llama desde el punto de más bajo nivel (HTTP/SDK) y suma
+  tamaños y tokens al registro activo; sin track() activo no hace nada.
+  Varias llamadas dentro de un mismo track (p. ej. top-ups) se acumulan.
+- Los eventos se escriben en lote con WriteBehindBuffer: la petición sólo
+  paga un append en memoria.
+
+LLM_TELEMETRY_ENABLED=0 lo desactiva.
+"""
+
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+from ..models import LLMCallEvent
+from . import circuit_breaker
+from .voice_metrics import _calculate_percentile, _parse_date
+from .write_behind import WriteBehindBuffer
+
+TELEMETRY_ENABLED = os.getenv("LLM_TELEMETRY_ENABLED", "true").lower() in ("1", "true", "yes")
+BATCH_SIZE = int(os.getenv("LLM_TELEMETRY_BATCH", "50"))
+FLUSH_INTERVAL_S = float(os.getenv("LLM_TELEMETRY_FLUSH_S", "5"))
+
+_current: contextvars.ContextVar = contextvars.ContextVar("llm_telemetry_current", default=None)
+
+
+def _write(events):
+    LLMCallEvent.objects.bulk_create(events, batch_size=BATCH_SIZE)
+
+
+buffer = WriteBehindBuffer("llm-telemetry", _write, max_items=BATCH_SIZE, interval_s=FLUSH_INTERVAL_S)
+
+
+def classify(exc: Optional[BaseException]) -> str:
+    if exc is None:
+        return "success"
+    if not isinstance(exc, Exception):
+        return "cancelled"  # GeneratorExit: el cliente cerró el stream
+    if isinstance(exc, circuit_breaker.CircuitOpen):
+        return "circuit_open"
+    msg = str(exc).lower()
+    if circuit_breaker.is_no_credits(msg) or circuit_breaker.is_rate_limited(msg):
+        return "no_credits"
+    if isinstance(exc, TimeoutError) or "timed out" in msg or "timeout" in msg or "deadline" in msg:
+        return "timeout"
+    if isinstance(exc, ValueError) or "invalid_response" in msg:
+        return "schema_error"
+    return "error"
+
+
+@contextmanager
+def track(provider: str, operation: str, model: str = "", fallback: bool = False):
+    """Registra una llamada lógica al proveedor (ver docstring del módulo)."""
+    if not TELEMETRY_ENABLED:
+        yield None
+        return
+
+    record = {
+        "model": model,
+        "prompt_chars": None, "response_chars": None,
+        "prompt_tokens": None, "completion_tokens": None,
+    }
+    token = _current.set(record)
+    started = time.monotonic()
+    exc = None
+    try:
+        yield record
+    except BaseException as e:
+        exc = e
+        raise
+    finally:
+        _current.reset(token)
+        try:
+            buffer.add(LLMCallEvent(
+                provider=provider,
+                model=(record["model"] or "")[:100],
+                operation=operation,
+                latency_ms=int((time.monotonic() - started) * 1000),
+                prompt_chars=record["prompt_chars"],
+                response_chars=record["response_chars"],
+                prompt_tokens=record["prompt_tokens"],
+                completion_tokens=record["completion_tokens"],
+                outcome=classify(exc),
+                fallback=fallback,
+                error=str(exc)[:255] if exc is not None else "",
+                timestamp=timezone.now(),
+            ))
+        except Exception:
+            pass  # la telemetría nunca rompe la llamada
+
+
+def _add(record: dict, field: str, value) -> None:
+    if value is None:
+        return
+    record[field] = (record[field] or 0) + int(value)
+
+
+def annotate(prompt: Optional[str] = None, response: Optional[str] = None,
+             prompt_tokens=None, completion_tokens=None, model: Optional[str] = None) -> None:
+    """Suma tamaños/tokens a la llamada en curso (no-op fuera de track)."""
+    record = _current.get()
+    if record is None:
+        return
+    if prompt is not None:
+        _add(record, "prompt_chars", len(prompt))
+    if response is not None:
+        _add(record, "response_chars", len(response))
+    _add(record, "prompt_tokens", prompt_tokens)
+    _add(record, "completion_tokens", completion_tokens)
+    if model and not record["model"]:
+        record["model"] = model
+
+
+def annotate_gemini(resp, prompt: Optional[str] = None, model: Optional[str] = None) -> None:
+    """annotate() con el usage_metadata de una respuesta del SDK de Gemini."""
+    usage = getattr(resp, "usage_metadata", None)
+    try:
+        text = resp.text
+    except Exception:
+        text = None
+    annotate(
+        prompt=prompt, response=text, model=model,
+        prompt_tokens=getattr(usage, "prompt_token_count", None),
+        completion_tokens=getattr(usage, "candidates_token_count", None),
+    )
+
+
+def annotate_openai_usage(usage: Optional[dict], prompt: Optional[str] = None,
+                          response: Optional[str] = None, model: Optional[str] = None) -> None:
+    """annotate() con el bloque `usage` de una respuesta tipo chat/completions (Perplexity)."""
+    usage = usage or {}
+    annotate(
+        prompt=prompt, response=response, model=model,
+        prompt_tokens=usage.get("prompt_tokens"),
+        completion_tokens=usage.get("completion_tokens"),
+    )
+
+
+# =========================================================
+# Agregación (GET /api/metrics/llm/)
+# =========================================================
+
+def compute_llm_metrics(start: Optional[str] = None, end: Optional[str] = None,
+                        provider: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Por (proveedor, operación): calls, outcomes, fallback_calls, p50/p95/p99 de
+    latencia (sólo llamadas exitosas) y tokens medios. Sin fechas -> últimos 7 días.
+    """
+    buffer.flush()  # incluir lo pendiente de este worker
+
+    qs = LLMCallEvent.objects.all()
+    start_dt = _parse_date(start)
+    end_dt = _parse_date(end)
+    if not start_dt and not end_dt:
+        qs = qs.filter(timestamp__gte=timezone.now() - timedelta(days=7))
+    if start_dt:
+        qs = qs.filter(timestamp__gte=start_dt)
+    if end_dt:
+        qs = qs.filter(timestamp__lt=(end_dt + timedelta(days=1)))
+    if provider:
+        qs = qs.filter(provider=provider)
+
+    groups = (
+        qs.values("provider", "operation")
+        .annotate(
+            calls=Count("id"),
+            fallback_calls=Count("id", filter=Q(fallback=True)),
+            avg_prompt_tokens=Avg("prompt_tokens"),
+            avg_completion_tokens=Avg("completion_tokens"),
+            sum_prompt_tokens=Sum("prompt_tokens"),
+            sum_completion_tokens=Sum("completion_tokens"),
+        )
+        .order_by("provider", "operation")
+    )
+    outcomes = {}
+    for row in qs.values("provider", "operation", "outcome").annotate(n=Count("id")).order_by():
+        outcomes.setdefault((row["provider"], row["operation"]), {})[row["outcome"]] = row["n"]
+
+    latencies = {}
+    for prov, op, ms in qs.filter(outcome="success").values_list("provider", "operation", "latency_ms"):
+        latencies.setdefault((prov, op), []).append(ms)
+
+    rows = []
+    for g in groups:
+        key = (g["provider"], g["operation"])
+        lat = latencies.get(key, [])
+        by_outcome = outcomes.get(key, {})
+        rows.append({
+            "provider": g["provider"],
+            "operation": g["operation"],
+            "calls": g["calls"],
+            "success_rate": round(by_outcome.get("success", 0) / g["calls"], 4) if g["calls"] else 0.0,
+            "outcomes": by_outcome,
+            "fallback_calls": g["fallback_calls"],
+            "latency_p50_ms": round(_calculate_percentile(lat, 50), 2),
+            "latency_p95_ms": round(_calculate_percentile(lat, 95), 2),
+            "latency_p99_ms": round(_calculate_percentile(lat, 99), 2),
+            "avg_prompt_tokens": round(g["avg_prompt_tokens"] or 0.0, 1),
+            "avg_completion_tokens": round(g["avg_completion_tokens"] or 0.0, 1),
+            "total_tokens": (g["sum_prompt_tokens"] or 0) + (g["sum_completion_tokens"] or 0),
+        })
+
+    return {
+        "by_provider_operation": rows,
+        "filters": {"start": start, "end": end, "provider": provider},
+    }
@@ -3,8 +3,9 @@ from collections import Counter, defaultdict
 from datetime import datetime, timedelta
 from typing import Dict, Any, Iterable, Tuple, Optional
 
-from django.db.models import QuerySet
+from django.db.models import F, QuerySet
 from ..models import GenerationSession, RegenerationLog
+from . import llm_stats
 
 
 def _has_created_at(model_cls) -> bool:
@@ -43,7 +44,10 @@ def _count_questions_from_sessions(sessions: Iterable[GenerationSession]) -> int
     total = 0
     for s in sessions:
         try:
-            if isinstance(s.latest_preview, list):
+            # preview_count: anotado desde QuestionSet.count (sin decodificar el preview)
+            if hasattr(s, "preview_count"):
+                total += s.preview_count or 0
+            elif isinstance(s.latest_preview, list):
                 total += len(s.latest_preview)
             else:
                 # Fallback: suma por configuración counts si existe
@@ -85,12 +89,13 @@ def compute_metrics(start: Optional[str] = None, end: Optional[str] = None) -> D
       - total_regenerations
       - regeneration_rate
       - distribution: { difficulty: {...}, type: {...} }
+      - llm_counters: contadores de proveedores LLM (hedging, etc.; sin filtro de fechas)
     Admite filtros de fecha (YYYY-MM-DD) si los modelos tienen created_at.
     """
     sessions_qs = _apply_date_range(GenerationSession.objects.all(), start, end)
     regens_qs = _apply_date_range(RegenerationLog.objects.all(), start, end)
 
-    sessions_list = list(sessions_qs)
+    sessions_list = list(sessions_qs.annotate(preview_count=F("question_set__count")))
     total_sessions = len(sessions_list)
     total_questions_generated = _count_questions_from_sessions(sessions_list)
     total_regenerations = regens_qs.count()
@@ -108,6 +113,7 @@ def compute_metrics(start: Optional[str] = None, end: Optional[str] = None) -> D
             "difficulty": _distribution_by_difficulty(sessions_list),
             "type": _distribution_by_type_counts(sessions_list),
         },
+        "llm_counters": llm_stats.counters(),
         "filters": {
             "start": start,
             "end": end,
@@ -139,6 +145,9 @@ def build_metrics_csv(metrics: Dict[str, Any]) -> str:
     for k, m in dist.get("type", {}).items():
         add(f"distribution.type.{k}", m)
 
+    for k, m in metrics.get("llm_counters", {}).items():
+        add(f"llm_counters.{k}", m)
+
     filters = metrics.get("filters", {})
     add("filters.start", filters.get("start") or "")
     add("filters.end", filters.get("end") or "")
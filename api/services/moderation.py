@@ -0,0 +1,177 @@
+# api/services/moderation.py
+"""
+Moderación / calidad de preguntas (HU-08) con un motor compilado.
+
+Las listas de palabras (offensive, ambiguous, subjective) y los patrones de
+estereotipo se compilan UNA vez en una sola expresión regular:
+  - las palabras se agrupan en un trie (alternancias con prefijo común),
+  - los patrones que empiezan con \\b<letra> se reescriben como <letra>(?<!\\w<letra>)
+    (equivalente) para que todas las alternativas empiecen con un literal y el
+    motor de `re` pueda saltar en C las posiciones que no pueden coincidir.
+Cada enunciado se normaliza una vez y se recorre con una sola búsqueda; sólo
+se vuelve a Python cuando hay coincidencia, y desde ahí se sigue con el
+patrón de las categorías que aún no aparecieron.
+
+Semántica idéntica a las funciones originales (subcadena para las listas,
+re.search para los patrones): lo comprueba `manage.py bench_moderation`.
+"""
+
+import re
+from itertools import combinations
+from typing import Dict, FrozenSet, Iterable, List
+
+BAD_WORDS = {
+    "idiota","estúpido","imbécil","tarado","mierda","maldito","pendejo","marica","negro de ****",
+}
+STEREOTYPE_PATTERNS = [
+    r"\blas\s+mujeres\s+son\b",
+    r"\blos\s+hombres\s+son\b",
+    r"\blos\s+\w+\s+son\b",
+]
+AMBIG_MARKERS = [
+    "etc.", "etc", "...", "depende", "generalmente", "a veces", "comúnmente",
+    "de manera subjetiva", "podría ser cualquiera", "no hay respuesta correcta",
+]
+SUBJECTIVE_MARKERS = ["mejor", "peor", "más bonito", "más feo"]
+
+# categoría -> issue de review_question (en el orden en que se reportan)
+_CATEGORY_ISSUES = {
+    "offensive": "offensive_or_stereotype",
+    "ambiguous": "ambiguous",
+    "subjective": "subjective",
+}
+
+
+def _trie_regex(words: Iterable[str]) -> str:
+    """Alternancia de literales factorizada por prefijos: a(?:b|c) en vez de ab|ac."""
+    root: dict = {}
+    for w in words:
+        if not w:
+            continue
+        node = root
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node) -> str:
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        if "" in node:
+            body = ("(?:" + body + ")" if len(alts) == 1 else body) + "?"
+        return body
+
+    return build(root)
+
+
+def _leading_literal(pattern: str) -> str:
+    r"""\bl... -> l(?<!\wl)...: misma semántica, pero el patrón empieza con un literal."""
+    return re.sub(r"^\\b(\w)", lambda m: f"{m.group(1)}(?<!\\w{m.group(1)})", pattern)
+
+
+class ModerationEngine:
+    """Listas y patrones compilados; reutilizable entre hilos (sólo lectura)."""
+
+    def __init__(self, bad_words, stereotype_patterns, ambig_markers, subjective_markers):
+        self._words = {
+            "offensive": set(bad_words),
+            "ambiguous": set(ambig_markers),
+            "subjective": set(subjective_markers),
+        }
+        self._patterns = {
+            "offensive": [_leading_literal(p) for p in stereotype_patterns],
+            "ambiguous": [],
+            "subjective": [],
+        }
+        cats = [c for c in self._words if self._words[c] or self._patterns[c]]
+        self._categories = frozenset(cats)
+        self._single = {c: re.compile(self._source([c])) for c in cats}
+        # un patrón combinado por subconjunto de categorías aún no encontradas
+        self._combined: Dict[FrozenSet[str], re.Pattern] = {
+            frozenset(subset): re.compile(self._source(subset))
+            for size in range(1, len(cats) + 1)
+            for subset in combinations(cats, size)
+        }
+
+    def _source(self, cats) -> str:
+        words = set().union(*(self._words[c] for c in cats))
+        alts = [p for c in cats for p in self._patterns[c]]
+        if words:
+            alts.insert(0, _trie_regex(words))
+        return "|".join(alts)
+
+    def categories(self, text: str) -> set:
+        """Categorías presentes en `text` (ya normalizado) con un único recorrido."""
+        found = set()
+        remaining = self._categories
+        pos = 0
+        while remaining:
+            m = self._combined[remaining].search(text, pos)
+            if m is None:
+                break
+            start = m.start()
+            # qué categorías coinciden aquí (puede ser más de una en la misma posición)
+            for cat in remaining:
+                if self._single[cat].match(text, start):
+                    found.add(cat)
+            remaining = remaining - found
+            pos = start + 1
+        return found
+
+    def review_question(self, q: dict) -> list:
+        """
+        Devuelve lista de issues:
+        ["offensive_or_stereotype","ambiguous","subjective","mcq_invalid","vf_invalid","too_long"]
+        Si lista vacía => OK.
+        """
+        qtype = (q.get("type") or "").lower()
+        question = q.get("question") or ""
+
+        found = self.categories(question.strip().lower())
+        issues = [issue for cat, issue in _CATEGORY_ISSUES.items() if cat in found]
+
+        if qtype == "mcq":
+            if _mcq_has_issues(q.get("options")):
+                issues.append("mcq_invalid")
+            ans = str(q.get("answer","")).strip().upper()[:1]
+            if ans not in ("A","B","C","D"):
+                issues.append("mcq_invalid")
+
+        if qtype == "vf":
+            ans = str(q.get("answer","")).strip().capitalize()
+            if ans not in ("Verdadero","Falso"):
+                issues.append("vf_invalid")
+
+        if len(question) > 300:
+            issues.append("too_long")
+
+        return issues
+
+    def review_questions(self, questions: Iterable[dict]) -> List[list]:
+        """review_question para un lote; devuelve las listas de issues en el mismo orden."""
+        review = self.review_question
+        return [review(q) for q in questions]
+
+
+def _mcq_has_issues(options) -> bool:
+    if not isinstance(options, list) or len(options) != 4:
+        return True
+    cleaned = [(o or "").strip().lower() if isinstance(o, str) else str(o).strip().lower() for o in options]
+    if any(not c for c in cleaned):
+        return True
+    return len(set(cleaned)) < 4
+
+
+engine = ModerationEngine(BAD_WORDS, STEREOTYPE_PATTERNS, AMBIG_MARKERS, SUBJECTIVE_MARKERS)
+review_question = engine.review_question
+review_questions = engine.review_questions
+
+
+def moderation_severity(issues: list) -> str:
+    """'severe' si hay ofensa/estereotipo; 'minor' para el resto; '' si vacío."""
+    if not issues:
+        return ""
+    if "offensive_or_stereotype" in issues:
+        return "severe"
+    return "minor"
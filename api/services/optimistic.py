@@ -0,0 +1,169 @@
+# api/services/optimistic.py
+"""
+Concurrencia optimista para modelos con columna `version` (GenerationSession,
+SavedQuiz), sin bloquear filas mientras el usuario lee y modifica.
+
+    optimistic.save(quiz, update_fields=[...], expected_version=v)
+        El save() normal (contadores, QuestionSet, huellas) con el predicado de
+        versión dentro de su único UPDATE:
+            UPDATE ... SET ..., version = v + 1 WHERE id = ? AND version = v
+        (VersionedMixin._do_update). 0 filas -> VersionConflict.
+
+    optimistic.claim(session, expected_version=v)
+        Sólo el UPDATE condicional; para escrituras que no pasan por save()
+        (p. ej. filas SessionQuestion).
+
+    optimistic.retry(fn)
+        Reintenta fn() (que debe releer el objeto) ante VersionConflict, hasta
+        OPTIMISTIC_MAX_RETRIES veces. Para peticiones sin versión del cliente.
+
+    optimistic.modify(obj, mutate, update_fields=..., expected_version=None)
+        mutate(obj) + save() condicionado. Con versión del cliente, un conflicto
+        es un 409; sin ella, se relee la fila y se vuelve a aplicar mutate.
+
+    optimistic.conflict_response(exc)
+        409 estructurado para el cliente.
+
+Un save() normal (sin este módulo) también sube la versión, a ciegas: los
+escritores con versión se enteran de cualquier cambio.
+"""
+
+import logging
+import os
+import time
+from typing import Callable, Iterable, Optional, TypeVar
+
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = int(os.getenv("OPTIMISTIC_MAX_RETRIES", "3"))
+RETRY_BACKOFF_S = float(os.getenv("OPTIMISTIC_RETRY_BACKOFF_S", "0.01"))
+
+T = TypeVar("T")
+
+
+class VersionConflict(Exception):
+    """Otra escritura cambió la fila desde que se leyó (version != expected)."""
+
+    def __init__(self, instance, expected: int, current: Optional[int]):
+        self.model = type(instance).__name__
+        self.pk = instance.pk
+        self.expected = expected
+        self.current = current  # None: la fila ya no existe
+        super().__init__(f"version_conflict: {self.model} {self.pk} (esperada {expected}, actual {current})")
+
+
+class VersionedMixin:
+    """
+    Para los modelos con `version`: si optimistic.save() fijó la versión
+    esperada, el UPDATE de save() lleva también `AND version = esperada`.
+    """
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        expected = self.__dict__.get("_expected_version")
+        if expected is None:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        if super()._do_update(base_qs.filter(version=expected), using, pk_val, values,
+                              update_fields, forced_update):
+            return True
+        # sin esto, save() sin update_fields intentaría un INSERT
+        current = base_qs.filter(pk=pk_val).values_list("version", flat=True).first()
+        raise VersionConflict(self, expected, current)
+
+
+def bump_for_save(instance, update_fields: Optional[Iterable[str]]):
+    """
+    Para el save() de los modelos versionados: sube `version` (a esperada + 1
+    si viene de optimistic.save()). Devuelve update_fields con "version" incluido.
+    """
+    if instance._state.adding:
+        return update_fields
+    expected = instance.__dict__.get("_expected_version")
+    instance.version = instance.version + 1 if expected is None else expected + 1
+    if update_fields is None:
+        return None
+    update_fields = list(update_fields)
+    if "version" not in update_fields:
+        update_fields.append("version")
+    return update_fields
+
+
+def claim(instance, expected_version: Optional[int] = None) -> int:
+    """
+    UPDATE ... SET version = n + 1 WHERE pk = ? AND version = n (n = expected_version
+    o la versión leída). Llamar dentro de transaction.atomic(): la fila queda
+    tomada hasta el commit. Devuelve la versión nueva.
+    """
+    expected = instance.version if expected_version is None else int(expected_version)
+    model = type(instance)
+    if not model._default_manager.filter(pk=instance.pk, version=expected).update(version=expected + 1):
+        current = model._default_manager.filter(pk=instance.pk).values_list("version", flat=True).first()
+        raise VersionConflict(instance, expected, current)
+    instance.version = expected + 1
+    return instance.version
+
+
+def save(instance, update_fields: Optional[Iterable[str]] = None, expected_version: Optional[int] = None):
+    """
+    save() condicionado a que la versión en BD siga siendo `expected_version`
+    (por defecto, la leída). Un solo UPDATE; el modelo debe usar VersionedMixin.
+    """
+    before = instance.version
+    instance._expected_version = before if expected_version is None else int(expected_version)
+    try:
+        instance.save(update_fields=update_fields)
+    except Exception:
+        instance.version = before
+        raise
+    finally:
+        instance.__dict__.pop("_expected_version", None)
+    return instance
+
+
+def retry(fn: Callable[[], T], attempts: Optional[int] = None) -> T:
+    """Ejecuta fn(); ante VersionConflict la repite (fn debe releer) hasta `attempts` veces."""
+    attempts = max(1, attempts or MAX_RETRIES)
+    for attempt in range(1, attempts + 1):
+        try:
+            return fn()
+        except VersionConflict as exc:
+            if attempt == attempts or exc.current is None:
+                raise
+            logger.info("optimistic: reintento %d/%d tras %s", attempt, attempts, exc)
+            time.sleep(RETRY_BACKOFF_S * attempt)
+
+
+def modify(
+    instance,
+    mutate: Callable[[T], None],
+    update_fields: Optional[Iterable[str]] = None,
+    expected_version: Optional[int] = None,
+    reload: Optional[Callable[[], T]] = None,
+):
+    """
+    Lectura-modificación-escritura sin locks. El primer intento usa `instance`;
+    los reintentos releen con reload() (por defecto, por pk con el manager por
+    defecto). Devuelve el objeto guardado.
+    """
+    model = type(instance)
+    reload = reload or (lambda: model._default_manager.get(pk=instance.pk))
+    pending = [instance]
+
+    def attempt():
+        obj = pending.pop() if pending else reload()
+        mutate(obj)
+        return save(obj, update_fields=update_fields, expected_version=expected_version)
+
+    return retry(attempt, attempts=1 if expected_version is not None else None)
+
+
+def conflict_response(exc: VersionConflict) -> JsonResponse:
+    return JsonResponse({
+        'error': 'Conflicto de versión: el recurso cambió desde que se leyó',
+        'code': 'version_conflict',
+        'resource': exc.model,
+        'id': str(exc.pk),
+        'expected_version': exc.expected,
+        'current_version': exc.current,
+    }, status=409 if exc.current is not None else 404)
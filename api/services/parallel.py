@@ -0,0 +1,57 @@
+# api/services/parallel.py
+"""
+Ejecución concurrente acotada para llamadas lentas a proveedores LLM.
+
+Las llamadas a Gemini/Perplexity son I/O puro (HTTP), así que un pool de hilos
+pequeño basta para solaparlas sin bloquear el worker más de lo necesario.
+"""
+
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+
+class DeadlineExceeded(TimeoutError):
+    """La tarea no terminó antes del deadline compartido."""
+
+
+def map_bounded(
+    fn: Callable[[Any], Any],
+    items: Iterable[Any],
+    max_workers: int = 4,
+    deadline_s: Optional[float] = None,
+) -> List[Tuple[bool, Any]]:
+    """
+    Ejecuta fn(item) para cada item con como máximo `max_workers` hilos y
+    un único deadline (en segundos) para todo el lote.
+
+    Devuelve una lista en el MISMO orden que `items` con tuplas:
+      - (True, resultado) si la tarea terminó bien
+      - (False, excepción) si falló o no terminó a tiempo (DeadlineExceeded)
+
+    Las tareas que no alcanzan el deadline se abandonan: no se espera a que
+    terminen (el hilo acaba en segundo plano y su resultado se descarta).
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    workers = max(1, min(int(max_workers or 1), len(items)))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-par")
+    try:
+        # copy_context: los contextvars (p.ej. telemetría) viajan a cada hilo
+        futures = [pool.submit(contextvars.copy_context().run, fn, it) for it in items]
+        wait(futures, timeout=deadline_s)
+
+        results: List[Tuple[bool, Any]] = []
+        for fut in futures:
+            if not fut.done():
+                fut.cancel()
+                results.append((False, DeadlineExceeded("deadline_exceeded")))
+                continue
+            exc = fut.exception()
+            results.append((False, exc) if exc is not None else (True, fut.result()))
+        return results
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
@@ -0,0 +1,170 @@
+# api/services/question_bank.py
+"""
+Banco de preguntas pre-generadas para previews instantáneos.
+
+- Clave: (categoría de find_category_for_topic, dificultad, tipo). El banco
+  sólo sirve cuando el tema pedido ES la categoría (mismo texto plegado):
+  "Estructura de Datos" sale del banco de "estructura de datos", pero
+  "listas enlazadas en estructura de datos" (que también cae en esa
+  categoría) se genera en vivo.
+- take(): arma un preview completo desde el banco o devuelve None (miss) sin
+  consumir nada; en ese caso el caller genera en vivo.
+- Relleno en segundo plano: cuando un bucket baja de QUESTION_BANK_LOW_WATER
+  se generan preguntas hasta QUESTION_BANK_HIGH_WATER. Sólo se guardan las que
+  pasan review_question sin issues, no repiten enunciado dentro del bucket ni
+  coinciden con lo ya servido (services/question_fingerprints).
+
+Desactivado por defecto (consume créditos LLM en segundo plano):
+QUESTION_BANK_ENABLED=1 para activarlo.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from django.db import connection, transaction
+
+from ..models import BankedQuestion
+from .near_duplicates import NearDuplicateIndex
+from . import question_fingerprints, taxonomy
+
+logger = logging.getLogger(__name__)
+
+BANK_ENABLED = os.getenv("QUESTION_BANK_ENABLED", "false").lower() in ("1", "true", "yes")
+LOW_WATER = int(os.getenv("QUESTION_BANK_LOW_WATER", "10"))
+HIGH_WATER = int(os.getenv("QUESTION_BANK_HIGH_WATER", "40"))
+REFILL_BATCH = int(os.getenv("QUESTION_BANK_REFILL_BATCH", "10"))
+REFILL_PROVIDER = os.getenv("QUESTION_BANK_PROVIDER", "gemini")
+MAX_REFILL_ROUNDS = 6
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="qbank-refill")
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def serves(topic: Optional[str], category: Optional[str]) -> bool:
+    """¿Un preview del bucket de `category` responde a `topic`? Sólo si son el mismo tema."""
+    return bool(category) and (topic is None or taxonomy.fold(topic) == taxonomy.fold(category))
+
+
+def take(category: str, difficulty: str, types: Iterable[str], counts: Dict[str, int],
+         topic: Optional[str] = None) -> Optional[List[dict]]:
+    """
+    Consume del banco exactamente counts[t] preguntas por tipo, en el orden de `types`.
+    Devuelve None si algún bucket no alcanza (no consume nada en ese caso) o si
+    `topic` no es la propia categoría (ver serves()).
+    """
+    needs = {t: int(counts.get(t, 0) or 0) for t in types}
+    needs = {t: n for t, n in needs.items() if n > 0}
+    if not needs or not serves(topic, category):
+        return None
+
+    picked = {}
+    with transaction.atomic():
+        for qtype, n in needs.items():
+            rows = list(
+                BankedQuestion.objects
+                .select_for_update(skip_locked=True)
+                .filter(category=category, difficulty=difficulty, qtype=qtype)
+                .order_by("id")
+                .values_list("id", "question")[:n]
+            )
+            if len(rows) < n:
+                picked = None
+                break
+            picked[qtype] = rows
+
+        if picked is not None:
+            ids = [row_id for rows in picked.values() for row_id, _ in rows]
+            deleted, _ = BankedQuestion.objects.filter(id__in=ids).delete()
+            if deleted != len(ids):
+                # Otro worker se llevó parte de las filas: no servimos un preview incompleto
+                transaction.set_rollback(True)
+                picked = None
+
+    schedule_refill(category, difficulty, needs.keys())
+    if picked is None:
+        return None
+    return [q for qtype in needs for _, q in picked[qtype]]
+
+
+def level(category: str, difficulty: str, qtype: str) -> int:
+    return BankedQuestion.objects.filter(category=category, difficulty=difficulty, qtype=qtype).count()
+
+
+def schedule_refill(category: str, difficulty: str, qtypes: Iterable[str]) -> None:
+    """Encola el relleno (uno a la vez por bucket) si el banco está activado."""
+    if not BANK_ENABLED:
+        return
+    for qtype in qtypes:
+        key = (category, difficulty, qtype)
+        with _pending_lock:
+            if key in _pending:
+                continue
+            _pending.add(key)
+        _executor.submit(_refill_task, key)
+
+
+def _refill_task(key) -> None:
+    try:
+        refill(*key)
+    except Exception:
+        logger.exception("Error rellenando banco de preguntas %s", key)
+    finally:
+        with _pending_lock:
+            _pending.discard(key)
+        # hilo propio -> conexión propia; no dejarla abierta
+        connection.close()
+
+
+def refill(category: str, difficulty: str, qtype: str, force: bool = False) -> int:
+    """
+    Rellena el bucket hasta HIGH_WATER si está por debajo de LOW_WATER
+    (o siempre, con force=True). Devuelve cuántas preguntas se añadieron.
+    """
+    # Import tardío: views importa este módulo
+    from ..views import _generate_with_fallback, review_question, _norm_for_cmp
+
+    current = level(category, difficulty, qtype)
+    if current >= HIGH_WATER or (current >= LOW_WATER and not force):
+        return 0
+
+    existing = NearDuplicateIndex(
+        _norm_for_cmp((q or {}).get("question", ""))
+        for q in BankedQuestion.objects
+        .filter(category=category, difficulty=difficulty, qtype=qtype)
+        .values_list("question", flat=True)
+    )
+    # lo ya servido a usuarios (índice global) tampoco entra al banco
+    served = question_fingerprints.index_for(category, difficulty)
+
+    added = 0
+    for _ in range(MAX_REFILL_ROUNDS):
+        missing = HIGH_WATER - current - added
+        if missing <= 0:
+            break
+        n = min(REFILL_BATCH, missing)
+        questions, provider, _, _ = _generate_with_fallback(
+            category, difficulty, [qtype], {qtype: n}, REFILL_PROVIDER,
+            global_avoid=question_fingerprints.avoid_phrases(category, difficulty)
+        )
+
+        rows = []
+        for q in questions:
+            norm = _norm_for_cmp(q.get("question", ""))
+            if q.get("type") != qtype or not norm or norm in existing or norm in served or review_question(q):
+                continue
+            existing.add(norm)
+            rows.append(BankedQuestion(
+                category=category, difficulty=difficulty, qtype=qtype,
+                question=q, provider=provider,
+            ))
+        if not rows:
+            break
+        BankedQuestion.objects.bulk_create(rows)
+        added += len(rows)
+
+    logger.info("Banco %s/%s/%s: +%d preguntas", category, difficulty, qtype, added)
+    return added
@@ -0,0 +1,91 @@
+# api/services/question_fingerprints.py
+"""
+Índice global de enunciados ya servidos, por (categoría, dificultad).
+
+Las filas (QuestionFingerprint) se escriben solas al guardar el preview de una
+sesión, un RegenerationLog o un SavedQuiz nuevo (ver models.py); aquí está la
+lectura:
+- avoid_phrases(): los k más recientes, para listarlos en los prompts. Es una
+  consulta LIMIT k sobre el índice (category, difficulty, -last_seen_at): se
+  llama en cada petición de generación.
+- index_for(): NearDuplicateIndex con los GLOBAL_FP_INDEX_SIZE enunciados más
+  recientes de la clave, cacheado en el proceso GLOBAL_FP_CACHE_S segundos.
+  Construirlo cuesta ~100 ms con 2000 enunciados: sólo para trabajos fuera de
+  la petición (p. ej. question_bank.refill), no en vistas.
+- seen_before() / similar(): pertenencia y similitud (también paráfrasis), sobre index_for().
+
+`manage.py backfill_question_fingerprints` lo llena desde los datos existentes.
+GLOBAL_FP_ENABLED=0 lo desactiva (los prompts no llevan lista global).
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from ..models import QuestionFingerprint
+from .near_duplicates import NearDuplicateIndex, normalize
+
+GLOBAL_FP_ENABLED = os.getenv("GLOBAL_FP_ENABLED", "true").lower() in ("1", "true", "yes")
+GLOBAL_FP_INDEX_SIZE = int(os.getenv("GLOBAL_FP_INDEX_SIZE", "2000"))
+GLOBAL_FP_CACHE_S = float(os.getenv("GLOBAL_FP_CACHE_S", "60"))
+GLOBAL_AVOID_PROMPT_K = int(os.getenv("GLOBAL_AVOID_PROMPT_K", "10"))
+
+_cache: Dict[Tuple[str, str], Tuple[float, NearDuplicateIndex]] = {}
+_lock = threading.Lock()
+
+
+def index_for(category: Optional[str], difficulty: Optional[str]) -> NearDuplicateIndex:
+    """
+    Índice (sólo lectura) de lo servido en la clave; vacío si no hay categoría.
+    Caro de construir: no usar en el camino de una petición (ver docstring del módulo).
+    """
+    if not GLOBAL_FP_ENABLED or not category or not difficulty:
+        return NearDuplicateIndex()
+    key = (category, difficulty)
+    now = time.monotonic()
+    with _lock:
+        hit = _cache.get(key)
+    if hit and now - hit[0] < GLOBAL_FP_CACHE_S:
+        return hit[1]
+
+    norms = (
+        QuestionFingerprint.objects
+        .filter(category=category, difficulty=difficulty)
+        .order_by("-last_seen_at")
+        .values_list("norm", flat=True)[:GLOBAL_FP_INDEX_SIZE]
+    )
+    index = NearDuplicateIndex(norms)  # orden: más reciente primero
+    with _lock:
+        _cache[key] = (now, index)
+    return index
+
+
+def invalidate(category: Optional[str] = None, difficulty: Optional[str] = None) -> None:
+    with _lock:
+        if category is None:
+            _cache.clear()
+        else:
+            _cache.pop((category, difficulty), None)
+
+
+def seen_before(category: Optional[str], difficulty: Optional[str], question_text: str) -> bool:
+    """True si el enunciado (o una paráfrasis cercana) ya se sirvió en la clave."""
+    return normalize(question_text) in index_for(category, difficulty)
+
+
+def similar(category: Optional[str], difficulty: Optional[str], question_text: str) -> Tuple[Optional[str], float]:
+    """(enunciado normalizado más parecido, similitud) o (None, 0.0)."""
+    return index_for(category, difficulty).find(normalize(question_text))
+
+
+def avoid_phrases(category: Optional[str], difficulty: Optional[str], k: int = GLOBAL_AVOID_PROMPT_K) -> List[str]:
+    """Los k enunciados servidos más recientemente, para el bloque "evita" de los prompts."""
+    if k <= 0 or not GLOBAL_FP_ENABLED or not category or not difficulty:
+        return []
+    return list(
+        QuestionFingerprint.objects
+        .filter(category=category, difficulty=difficulty)
+        .order_by("-last_seen_at")
+        .values_list("norm", flat=True)[:k]
+    )
@@ -17,7 +17,7 @@ logger = logging.getLogger(__name__)
 # Intentar importar clases NLU para fallback a LLM
 try:
     import os
-    import requests
+    from . import http_client, circuit_breaker, llm_telemetry
 
     class GeminiNLU:
         """
@@ -54,19 +54,27 @@ try:
                     }
                 }
 
-                response = requests.post(
-                    f"{self.api_url}?key={self.api_key}",
-                    headers=headers,
-                    json=payload,
-                    timeout=10
-                )
-
-                if response.status_code != 200:
-                    logger.warning(f"Gemini API error: {response.status_code}")
-                    return None
-
-                data = response.json()
-                text = data.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "").strip()
+                with llm_telemetry.track("gemini", "suggestion", model=self.model), \
+                        circuit_breaker.guard("gemini"):
+                    response = http_client.post(
+                        f"{self.api_url}?key={self.api_key}",
+                        headers=headers,
+                        json=payload,
+                        timeout=10
+                    )
+                    if response.status_code != 200:
+                        logger.warning(f"Gemini API error: {response.status_code}")
+                        response.raise_for_status()
+                        return None
+
+                    data = response.json()
+                    text = data.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "").strip()
+                    usage = data.get("usageMetadata") or {}
+                    llm_telemetry.annotate(
+                        prompt=prompt, response=text,
+                        prompt_tokens=usage.get("promptTokenCount"),
+                        completion_tokens=usage.get("candidatesTokenCount"),
+                    )
                 return text if text else None
 
             except Exception as e:
@@ -116,19 +124,22 @@ try:
                     "max_tokens": max_words * 2
                 }
 
-                response = requests.post(
-                    self.api_url,
-                    headers=headers,
-                    json=payload,
-                    timeout=10
-                )
-
-                if response.status_code != 200:
-                    logger.warning(f"Perplexity API error: {response.status_code}")
-                    return None
-
-                data = response.json()
-                text = data.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
+                with llm_telemetry.track("perplexity", "suggestion", model=self.model), \
+                        circuit_breaker.guard("perplexity"):
+                    response = http_client.post(
+                        self.api_url,
+                        headers=headers,
+                        json=payload,
+                        timeout=10
+                    )
+                    if response.status_code != 200:
+                        logger.warning(f"Perplexity API error: {response.status_code}")
+                        response.raise_for_status()
+                        return None
+
+                    data = response.json()
+                    text = data.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
+                    llm_telemetry.annotate_openai_usage(data.get("usage"), prompt=prompt, response=text)
                 return text if text else None
 
             except Exception as e:
@@ -436,8 +447,8 @@ La sugerencia debe ser motivadora y específica. Responde SOLO con el texto de l
         suggestion_text = None
         source = None
 
-        # Intentar con Gemini primero
-        if self.gemini:
+        # Intentar con Gemini primero (si su circuito no está abierto)
+        if self.gemini and circuit_breaker.is_available("gemini"):
             logger.info("Intentando generar sugerencia con Gemini")
             try:
                 suggestion_text = self.gemini.generate_text(prompt, max_words=20)
@@ -448,7 +459,7 @@ La sugerencia debe ser motivadora y específica. Responde SOLO con el texto de l
                 logger.error(f"Error usando Gemini para sugerencia: {e}")
 
         # Fallback a Perplexity si Gemini falla
-        if not suggestion_text and self.perplexity:
+        if not suggestion_text and self.perplexity and circuit_breaker.is_available("perplexity"):
             logger.info("Intentando generar sugerencia con Perplexity")
             try:
                 suggestion_text = self.perplexity.generate_text(prompt, max_words=20)
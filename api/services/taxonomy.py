@@ -0,0 +1,204 @@
+# api/services/taxonomy.py
+"""
+Taxonomía de temas permitidos (HU-06) y matcher indexado de tema -> categoría.
+
+El matcher se construye una vez sobre ALLOWED_TAXONOMY:
+- fold(): minúsculas, sin tildes ni puntuación ("Teoría de la Computación!" ->
+  "teoria de la computacion"); c++, c# conservan su sufijo.
+- índice invertido token -> categorías, y un trie de tokens para variantes por
+  prefijo (algoritmo/algoritmos, estructuras/estructura).
+- score en [0, 1]: cobertura de los tokens de la categoría (60 %) y del tema
+  (40 %); la categoría completa dentro del tema puntúa >= 0.85 y la igualdad 1.0.
+  Se devuelve la MEJOR categoría (no la primera que coincida).
+- Resultados cacheados por tema normalizado (LRU).
+
+TAXONOMY_MIN_SCORE fija el score mínimo para aceptar un tema.
+"""
+
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+ALLOWED_TAXONOMY = [
+    "algoritmos", "estructura de datos", "complejidad computacional", "np-completitud",
+    "teoría de la computación", "autómatas y gramáticas", "compiladores", "intérpretes",
+    "lenguajes de programación", "sistemas de tipos", "verificación formal", "model checking",
+    "programación orientada a objetos", "patrones de diseño", "programación funcional",
+    "metodologías ágiles", "scrum", "kanban", "devops", "sre", "observabilidad",
+    "logging", "monitoring", "tracing", "apm", "optimización de rendimiento", "profiling",
+    "cachés", "cdn", "sistemas operativos", "gestión de memoria", "concurrencia",
+    "paralelismo", "hilos", "procesos", "bloqueos y semáforos", "sistemas distribuidos",
+    "consenso", "microservicios", "arquitectura hexagonal", "ddd", "event sourcing",
+    "mensajería asíncrona", "kafka", "rabbitmq", "mqtt", "rest", "graphql", "grpc",
+    "redes de computadores", "tcp/ip", "enrutamiento", "dns", "http/2", "http/3", "quic",
+    "seguridad informática", "owasp", "criptografía", "pki", "ssl/tls", "iam",
+    "seguridad en redes", "seguridad web", "pentesting", "forense digital",
+    "bases de datos", "modelado relacional", "normalización", "transacciones",
+    "aislamiento y concurrencia", "sql", "pl/sql", "postgresql", "mysql", "sqlite",
+    "mariadb", "nosql", "mongodb", "redis", "elasticsearch", "data warehousing",
+    "etl", "elt", "data lakes", "big data", "hadoop", "spark", "procesamiento en stream",
+    "procesamiento batch", "ingeniería de datos", "mlops", "machine learning",
+    "deep learning", "nlp", "computer vision", "reinforcement learning",
+    "transformers", "embeddings", "llms", "prompt engineering", "evaluación de llms",
+    "edge ai", "federated learning", "differential privacy", "autoML", "explicabilidad (xai)",
+    "estadística", "probabilidad", "álgebra lineal", "cálculo", "matemática discreta",
+    "optimización", "investigación de operaciones", "series de tiempo",
+    "arquitectura de software", "requisitos de software", "uml", "pruebas unitarias",
+    "pruebas de integración", "tdd", "ci/cd", "contenedores", "docker", "kubernetes",
+    "serverless", "nubes públicas", "aws", "azure", "gcp", "iac (terraform)", "ansible",
+    "backend", "frontend", "fullstack", "html", "css", "javascript",
+    "typescript", "react", "next.js", "vue", "angular", "svelte", "node.js", "deno",
+    "python", "java", "c", "c++", "c#", "go", "rust", "php", "ruby", "swift", "kotlin", "r",
+    "matlab", "apis", "sockets", "iot", "sistemas embebidos", "esp32", "arduino", "robótica",
+    "gráficos por computador", "opengl", "unity", "unreal", "ar/vr", "hci", "accesibilidad",
+    "ux/ui", "bioinformática", "gis", "fintech", "e-commerce", "blockchain",
+    "contratos inteligentes", "zk-proofs", "escalado blockchain", "privacidad", "etica en ia"
+]
+
+TAXONOMY_MIN_SCORE = float(os.getenv("TAXONOMY_MIN_SCORE", "0.5"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+[+#]*")
+_STOPWORDS = frozenset(
+    "a al con de del e el en la las los o para por sobre u un una unos unas y".split()
+)
+_FUZZY_MIN_PREFIX = 4
+_FUZZY_MAX_SUFFIX = 3
+_FUZZY_WEIGHT = 0.8
+
+
+class TopicMatch(NamedTuple):
+    category: str
+    score: float
+    coverage: float  # fracción de los tokens de la categoría presentes en el tema
+
+
+def fold(text: str) -> str:
+    """Minúsculas, sin tildes ni puntuación, tokens separados por un espacio."""
+    t = unicodedata.normalize("NFKD", (text or "").lower())
+    t = "".join(ch for ch in t if not unicodedata.combining(ch))
+    return " ".join(_TOKEN_RE.findall(t))
+
+
+def _content(tokens: Tuple[str, ...]) -> Tuple[str, ...]:
+    content = tuple(t for t in tokens if t not in _STOPWORDS)
+    return content or tokens
+
+
+class TaxonomyMatcher:
+    """Índice de solo lectura (seguro entre hilos); ver docstring del módulo."""
+
+    def __init__(self, categories: List[str], cache_size: int = 4096):
+        self.categories = list(categories)
+        self._phrases: List[str] = []
+        self._content: List[Tuple[str, ...]] = []
+        self._postings: Dict[str, List[int]] = {}
+        self._trie: dict = {}
+        for cid, name in enumerate(self.categories):
+            phrase = fold(name)
+            content = _content(tuple(phrase.split()))
+            self._phrases.append(phrase)
+            self._content.append(content)
+            for tok in set(content):
+                if tok not in self._postings:
+                    self._postings[tok] = []
+                    self._trie_add(tok)
+                self._postings[tok].append(cid)
+        self._ranked = lru_cache(maxsize=cache_size)(self._rank)
+
+    # --- trie de tokens del vocabulario ---
+    def _trie_add(self, token: str) -> None:
+        node = self._trie
+        for ch in token:
+            node = node.setdefault(ch, {})
+        node[""] = token
+
+    def _with_prefix(self, prefix: str) -> List[str]:
+        node = self._trie
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return []
+        out, stack = [], [node]
+        while stack:
+            n = stack.pop()
+            for ch, child in n.items():
+                if ch == "":
+                    out.append(child)
+                else:
+                    stack.append(child)
+        return out
+
+    def _token_matches(self, token: str) -> Dict[str, float]:
+        """Tokens del vocabulario que equivalen a `token` (exacto 1.0, variante por prefijo 0.8)."""
+        found = {token: 1.0} if token in self._postings else {}
+        if len(token) >= _FUZZY_MIN_PREFIX:
+            for vocab in self._with_prefix(token[:_FUZZY_MIN_PREFIX]):
+                if vocab in found:
+                    continue
+                common = len(os.path.commonprefix([token, vocab]))
+                if common >= max(len(token), len(vocab)) - _FUZZY_MAX_SUFFIX:
+                    found[vocab] = _FUZZY_WEIGHT
+        return found
+
+    # --- ranking ---
+    def _rank(self, folded: str) -> Tuple[TopicMatch, ...]:
+        topic_content = _content(tuple(folded.split()))
+        if not folded:
+            return ()
+        # por categoría candidata: mejor similitud de cada token suyo y de cada token del tema
+        cat_hits: Dict[int, Dict[str, float]] = {}
+        topic_hits: Dict[int, Dict[str, float]] = {}
+        for tok in topic_content:
+            for vocab, sim in self._token_matches(tok).items():
+                for cid in self._postings[vocab]:
+                    ch = cat_hits.setdefault(cid, {})
+                    ch[vocab] = max(ch.get(vocab, 0.0), sim)
+                    th = topic_hits.setdefault(cid, {})
+                    th[tok] = max(th.get(tok, 0.0), sim)
+
+        padded = f" {folded} "
+        out = []
+        for cid, hits in cat_hits.items():
+            coverage = sum(hits.values()) / len(self._content[cid])
+            topic_cov = sum(topic_hits[cid].values()) / len(topic_content)
+            score = 0.6 * coverage + 0.4 * topic_cov
+            phrase = self._phrases[cid]
+            if phrase == folded:
+                score = 1.0
+            elif f" {phrase} " in padded:
+                score = max(score, 0.85 + 0.15 * topic_cov)
+            out.append((round(min(score, 1.0), 4), round(coverage, 4), cid))
+        out.sort(key=lambda x: (-x[0], -x[1], x[2]))  # empate: orden de la taxonomía
+        return tuple(TopicMatch(self.categories[cid], score, cov) for score, cov, cid in out)
+
+    def match(self, topic: str, limit: int = 5, min_score: Optional[float] = None) -> List[TopicMatch]:
+        """Categorías ordenadas por score (>= min_score; por defecto TAXONOMY_MIN_SCORE)."""
+        threshold = TAXONOMY_MIN_SCORE if min_score is None else min_score
+        ranked = self._ranked(fold(topic))
+        return [m for m in ranked if m.score >= threshold][:limit]
+
+    def best(self, topic: str) -> Optional[TopicMatch]:
+        found = self.match(topic, limit=1)
+        return found[0] if found else None
+
+    def suggest(self, topic: str, limit: int = 5) -> List[str]:
+        """Categorías más cercanas aunque no lleguen al umbral (para mensajes de error)."""
+        return [m.category for m in self.match(topic, limit=limit, min_score=0.0)]
+
+    def extract(self, text: str) -> Optional[TopicMatch]:
+        """
+        Tema mencionado dentro de una frase libre ("genera un quiz de redes"):
+        se elige por cobertura de la categoría, que no depende del resto de palabras.
+        """
+        ranked = [m for m in self._ranked(fold(text)) if m.coverage >= 0.5]
+        if not ranked:
+            return None
+        return max(ranked, key=lambda m: m.coverage)
+
+    def cache_info(self):
+        return self._ranked.cache_info()
+
+
+matcher = TaxonomyMatcher(ALLOWED_TAXONOMY)
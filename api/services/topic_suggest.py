@@ -0,0 +1,205 @@
+# api/services/topic_suggest.py
+"""
+Autocompletado de temas (GET /api/topics/suggest/?q=).
+
+Índice de prefijos en memoria sobre:
+  - las categorías de ALLOWED_TAXONOMY (peso base TOPIC_SUGGEST_TAXONOMY_BOOST
+    + nº de sesiones de la categoría),
+  - los temas escritos por usuarios en GenerationSession.topic que caen en la
+    taxonomía y se repiten al menos TOPIC_SUGGEST_MIN_COUNT veces (peso = nº de sesiones).
+    Se descartan los que moderación marca como ofensivos (también sin tildes):
+    lo que escribe un usuario se sugiere a todos los demás.
+
+Para cada entrada se indexan los prefijos (hasta MAX_PREFIX caracteres, texto
+plegado con taxonomy.fold) desde el inicio de cada palabra, así "datos" sugiere
+"estructura de datos". Cada prefijo guarda ya sus TOP_K entradas por peso:
+una consulta es un dict lookup.
+
+Reconstrucción sin bloquear: get_index() devuelve siempre el índice vigente y,
+si tiene más de TOPIC_SUGGEST_REFRESH_S segundos, lanza la reconstrucción en
+un hilo. El primer índice (sólo taxonomía, sin BD) se arma al vuelo.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from django.db import connection
+from django.db.models import Count
+
+from ..models import GenerationSession
+from . import moderation, taxonomy
+
+logger = logging.getLogger(__name__)
+
+REFRESH_S = float(os.getenv("TOPIC_SUGGEST_REFRESH_S", "300"))
+HISTORY_LIMIT = int(os.getenv("TOPIC_SUGGEST_HISTORY_LIMIT", "2000"))
+MIN_COUNT = int(os.getenv("TOPIC_SUGGEST_MIN_COUNT", "2"))
+TAXONOMY_BOOST = int(os.getenv("TOPIC_SUGGEST_TAXONOMY_BOOST", "10"))
+MAX_PREFIX = 20
+TOP_K = 20
+
+# BAD_WORDS de una palabra, plegadas: "estupidos" no lleva tilde ni es la forma exacta
+_FOLDED_BAD_WORDS = tuple(sorted(
+    taxonomy.fold(w) for w in moderation.BAD_WORDS if len(taxonomy.fold(w).split()) == len(w.split()) == 1
+))
+
+
+def _is_offensive(topic: str, folded: str) -> bool:
+    if "offensive" in moderation.engine.categories(topic.lower()):
+        return True
+    return any(token.startswith(_FOLDED_BAD_WORDS) for token in folded.split())
+
+
+class SuggestIndex:
+    """Índice inmutable: se reemplaza entero al reconstruir."""
+
+    def __init__(self, entries: List[dict]):
+        # entries: {"topic", "category", "source", "count", "weight"}
+        self.entries = sorted(entries, key=lambda e: (-e["weight"], e["topic"]))
+        self.built_at = time.time()
+        self._keys: List[List[str]] = []
+        self._labels: List[str] = []
+        prefixes: Dict[str, List[int]] = {}
+        for eid, entry in enumerate(self.entries):
+            tokens = taxonomy.fold(entry["topic"]).split()
+            keys = [" ".join(tokens[i:]) for i in range(len(tokens))]
+            self._keys.append(keys)
+            self._labels.append(keys[0] if keys else "")
+            seen = set()
+            for key in keys:
+                for n in range(1, min(len(key), MAX_PREFIX) + 1):
+                    p = key[:n]
+                    if p in seen:
+                        continue
+                    seen.add(p)
+                    bucket = prefixes.setdefault(p, [])
+                    # entries ya va ordenado por peso: basta con cortar en TOP_K
+                    if len(bucket) < TOP_K:
+                        bucket.append(eid)
+        self._prefixes = prefixes
+
+    def suggest(self, q: str, limit: int = 8) -> List[dict]:
+        folded = taxonomy.fold(q)
+        if not folded:
+            ids = range(min(limit, len(self.entries)))
+        elif len(folded) <= MAX_PREFIX:
+            ids = self._prefixes.get(folded, ())
+        else:
+            # consultas largas (raras): recorrido lineal
+            ids = [eid for eid, keys in enumerate(self._keys) if any(k.startswith(folded) for k in keys)]
+
+        out, shown = [], set()
+        for eid in ids:
+            entry = self.entries[eid]
+            label = self._labels[eid]
+            if label in shown:
+                continue
+            shown.add(label)
+            out.append({k: entry[k] for k in ("topic", "category", "source", "count")})
+            if len(out) >= limit:
+                break
+        return out
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def _taxonomy_entries(category_counts: Optional[Counter] = None) -> List[dict]:
+    counts = category_counts or Counter()
+    return [
+        {"topic": cat, "category": cat, "source": "taxonomy", "count": counts.get(cat, 0),
+         "weight": TAXONOMY_BOOST + counts.get(cat, 0)}
+        for cat in taxonomy.ALLOWED_TAXONOMY
+    ]
+
+
+def build_index() -> SuggestIndex:
+    """Índice completo: taxonomía + temas históricos (una consulta agregada)."""
+    rows = (
+        GenerationSession.objects
+        .values("topic", "category")
+        .annotate(n=Count("id"))
+        .order_by("-n")[:HISTORY_LIMIT * 4]
+    )
+    category_counts: Counter = Counter()
+    by_folded: Dict[str, dict] = {}
+    for row in rows:
+        topic = (row["topic"] or "").strip()
+        category = row["category"]
+        if not category:
+            found = taxonomy.matcher.best(topic)
+            category = found.category if found else None
+        if not topic or not category:
+            continue
+        category_counts[category] += row["n"]
+        folded = taxonomy.fold(topic)
+        if _is_offensive(topic, folded):
+            continue
+        entry = by_folded.get(folded)
+        if entry is None:
+            # la grafía más usada es la que se muestra (rows viene por n desc)
+            by_folded[folded] = {"topic": topic, "category": category, "source": "history",
+                                 "count": row["n"], "weight": row["n"]}
+        else:
+            entry["count"] += row["n"]
+            entry["weight"] += row["n"]
+
+    taxonomy_folded = {taxonomy.fold(c) for c in taxonomy.ALLOWED_TAXONOMY}
+    history = sorted(
+        (e for f, e in by_folded.items() if e["count"] >= MIN_COUNT and f not in taxonomy_folded),
+        key=lambda e: -e["count"],
+    )[:HISTORY_LIMIT]
+    return SuggestIndex(_taxonomy_entries(category_counts) + history)
+
+
+_index: Optional[SuggestIndex] = None
+_lock = threading.Lock()
+_rebuilding = threading.Event()
+
+
+def _rebuild() -> None:
+    global _index
+    try:
+        fresh = build_index()
+        with _lock:
+            _index = fresh
+    except Exception:
+        logger.exception("topic_suggest: no se pudo reconstruir el índice")
+        with _lock:
+            if _index is not None:
+                _index.built_at = time.time()  # reintentar tras otro REFRESH_S
+    finally:
+        _rebuilding.clear()
+        connection.close()
+
+
+def _schedule_rebuild() -> None:
+    if _rebuilding.is_set():
+        return
+    with _lock:
+        if _rebuilding.is_set():
+            return
+        _rebuilding.set()
+    threading.Thread(target=_rebuild, name="topic-suggest-rebuild", daemon=True).start()
+
+
+def get_index() -> SuggestIndex:
+    global _index
+    current = _index
+    if current is None:
+        with _lock:
+            if _index is None:
+                _index = SuggestIndex(_taxonomy_entries())
+                _index.built_at = 0.0  # fuerza la reconstrucción completa
+            current = _index
+    if time.time() - current.built_at > REFRESH_S:
+        _schedule_rebuild()
+    return current
+
+
+def suggest(q: str, limit: int = 8) -> List[dict]:
+    return get_index().suggest(q, limit=limit)
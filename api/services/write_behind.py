@@ -0,0 +1,113 @@
+# api/services/write_behind.py
+"""
+Buffer de escritura diferida (write-behind) para datos que no deben costar
+una query por petición: se acumulan en memoria del proceso y un hilo los
+vuelca en lote cada `interval_s` segundos, cuando se llega a `max_items`, o
+al terminar el proceso (atexit).
+
+Es best-effort: si el proceso muere sin vaciar, se pierde lo pendiente.
+No usar para datos que deban ser exactos.
+
+Con settings.WRITE_BEHIND_SYNC (activo en `manage.py test`) add() escribe al
+momento y no queda nada pendiente para el hilo ni para atexit.
+"""
+
+import atexit
+import itertools
+import logging
+import threading
+from typing import Any, Callable, Hashable, List, Optional
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    flush_fn(items) recibe la lista de elementos pendientes (en orden de
+    llegada) y debe persistirlos. Con add(item, key=...) los elementos con la
+    misma clave se fusionan: sólo se escribe el último.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush_fn: Callable[[List[Any]], None],
+        max_items: int = 100,
+        interval_s: float = 5.0,
+        max_pending: Optional[int] = None,
+    ):
+        self.name = name
+        self._flush_fn = flush_fn
+        self.max_items = max_items
+        self.interval_s = interval_s
+        self.max_pending = max_pending or max_items * 20
+        self._items = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.dropped = 0
+        atexit.register(self.flush)
+
+    def add(self, item: Any, key: Optional[Hashable] = None) -> None:
+        if getattr(settings, "WRITE_BEHIND_SYNC", False):
+            self._write([item])
+            return
+        with self._lock:
+            if key is None:
+                key = ("_seq", next(self._seq))
+            else:
+                self._items.pop(key, None)  # re-insertar al final
+            self._items[key] = item
+            if len(self._items) > self.max_pending:
+                # BD caída o lenta: descartar lo más antiguo antes que crecer sin límite
+                self._items.pop(next(iter(self._items)))
+                self.dropped += 1
+            full = len(self._items) >= self.max_items
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def pending(self) -> int:
+        return len(self._items)
+
+    def flush(self) -> int:
+        """Vuelca lo pendiente de forma síncrona; devuelve cuántos elementos se escribieron."""
+        with self._flush_lock:
+            with self._lock:
+                items = list(self._items.values())
+                self._items = {}
+            return self._write(items)
+
+    def _write(self, items: List[Any]) -> int:
+        if not items:
+            return 0
+        try:
+            self._flush_fn(items)
+        except Exception:
+            logger.exception("write-behind %s: no se pudieron escribir %d elementos", self.name, len(items))
+            return 0
+        return len(items)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name=f"write-behind-{self.name}", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
+            self.flush()
+            # hilo propio -> conexión propia; no dejarla abierta entre lotes
+            connection.close()
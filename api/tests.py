@@ -1,3 +1,1410 @@
-from django.test import TestCase
+import io
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import timedelta
+import threading
+import time
+from types import SimpleNamespace
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from .models import (
+    BankedQuestion, GenerationSession, LLMCallEvent, QuestionFingerprint, QuestionSet, QuizStatCounter,
+    RegenerationLog, SavedQuiz, SessionFingerprint, SessionQuestion,
+)
+from .models_question_tracking import QuestionEditLog, QuestionOriginMetadata
+from .services import (
+    access_tracker, circuit_breaker, gemini_registry, http_client, llm_telemetry, moderation, optimistic,
+    question_bank, taxonomy, topic_suggest,
+)
+from .services.llm_hedging import HedgeFailed, hedged_call
+from .services.near_duplicates import NearDuplicateIndex
+from .utils.cursor import InvalidCursor, decode_cursor, encode_cursor
+from .views import (
+    _generate_with_fallback, _header_hedge, _norm_for_cmp, _repair_flagged_questions, build_seen_set,
+    preview_questions_stream,
+)
+from .management.commands import bench_moderation
+from .views_question_editing import create_session_with_edits
+
+
+def _mcq(n, **tracking):
+    return {
+        'type': 'mcq',
+        'question': f'¿Cuál es la complejidad del algoritmo número {n}?',
+        'options': ['A) O(1)', 'B) O(n)', 'C) O(log n)', 'D) O(n^2)'],
+        'answer': 'C',
+        'explanation': 'Divide el problema a la mitad en cada paso.',
+        **tracking,
+    }
+
+
+def _edited_questions(total):
+    """Mezcla de preguntas IA puras, editadas y nuevas."""
+    questions = []
+    for i in range(total):
+        if i % 3 == 0:
+            questions.append(_mcq(i, originalIndex=i))
+        elif i % 3 == 1:
+            questions.append(_mcq(i, isModified=True, originalIndex=i))
+        else:
+            questions.append(_mcq(i, isNew=True, originalIndex=-1))
+    return questions
+
+
+class CreateSessionWithEditsTests(TestCase):
+    factory = APIRequestFactory()
+
+    def post(self, questions=None, total=None):
+        payload = {
+            'topic': 'algoritmos',
+            'difficulty': 'Media',
+            'types': ['mcq'],
+            'counts': {'mcq': total or len(questions)},
+        }
+        if questions is not None:
+            payload['questions'] = questions
+        request = self.factory.post('/api/sessions/create-with-edits/', payload, format='json')
+        return create_session_with_edits(request)
+
+    def count_queries(self, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post(**kwargs)
+        self.assertEqual(response.status_code, 201, response.content)
+        return len(ctx.captured_queries)
+
+    def test_edited_questions_query_count_does_not_grow_with_questions(self):
+        few = self.count_queries(questions=_edited_questions(3))
+        many = self.count_queries(questions=_edited_questions(15))
+        self.assertEqual(few, many)
+
+        with self.assertNumQueries(few):
+            self.post(questions=_edited_questions(20))
+
+    def test_edited_questions_tracking_rows(self):
+        response = self.post(questions=_edited_questions(6))
+        self.assertEqual(response.status_code, 201)
+        session = GenerationSession.objects.get()
+
+        logs = QuestionEditLog.objects.filter(session=session)
+        self.assertEqual(
+            sorted(logs.values_list('question_index', 'operation_type')),
+            [(1, 'manual_edit'), (2, 'creation'), (4, 'manual_edit'), (5, 'creation')],
+        )
+
+        metadata = dict(
+            QuestionOriginMetadata.objects.filter(session=session)
+            .values_list('question_index', 'origin_type')
+        )
+        self.assertEqual(metadata, {
+            0: 'pure_ai', 1: 'ai_edited', 2: 'user_created',
+            3: 'pure_ai', 4: 'ai_edited', 5: 'user_created',
+        })
+        edited = QuestionOriginMetadata.objects.get(session=session, question_index=1)
+        self.assertEqual(edited.edit_count, 1)
+
+    def test_tracking_failure_rolls_back_session(self):
+        with mock.patch.object(
+            QuestionOriginMetadata.objects, 'bulk_create', side_effect=RuntimeError('boom')
+        ):
+            response = self.post(questions=_edited_questions(4))
+
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(GenerationSession.objects.exists())
+        self.assertFalse(QuestionEditLog.objects.exists())
+
+    @mock.patch('api.views_question_editing.question_fingerprints.avoid_phrases', return_value=[])
+    @mock.patch('api.views_question_editing._generate_with_fallback')
+    def test_ai_generation_query_count_does_not_grow_with_questions(self, generate, _avoid):
+        generate.side_effect = lambda *args, **kwargs: (
+            [_mcq(i) for i in range(args[3]['mcq'])], 'gemini', False, []
+        )
+
+        few = self.count_queries(total=2)
+        many = self.count_queries(total=12)
+        self.assertEqual(few, many)
+
+        session = GenerationSession.objects.latest('created_at')
+        metadata = QuestionOriginMetadata.objects.filter(session=session)
+        self.assertEqual(metadata.count(), 12)
+        self.assertEqual(
+            set(metadata.values_list('origin_type', 'initial_ai_provider')),
+            {('pure_ai', 'gemini')},
+        )
+
+    @mock.patch('api.views_question_editing.question_fingerprints.avoid_phrases', return_value=[])
+    @mock.patch(
+        'api.views_question_editing._generate_with_fallback',
+        side_effect=RuntimeError('no_providers_available'),
+    )
+    def test_ai_generation_failure_writes_nothing(self, _generate, _avoid):
+        with self.assertNumQueries(0):
+            response = self.post(total=3)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(GenerationSession.objects.exists())
+
+
+class NearDuplicateThresholdTests(SimpleTestCase):
+    # Cambian el término clave: son preguntas distintas
+    DIFFERENT = [
+        ("¿Cuál es la complejidad temporal de la búsqueda binaria en el peor caso?",
+         "¿Cuál es la complejidad temporal de la búsqueda lineal en el peor caso?"),
+        ("¿Cuál es la complejidad promedio del algoritmo quicksort?",
+         "¿Cuál es la complejidad promedio del algoritmo mergesort?"),
+        ("¿Qué principio de acceso sigue una pila?",
+         "¿Qué principio de acceso sigue una cola?"),
+        ("¿Qué puerto usa por defecto el protocolo HTTP?",
+         "¿Qué puerto usa por defecto el protocolo HTTPS?"),
+        ("¿Qué devuelve len([1,2,3]) en Python?",
+         "¿Qué devuelve len([1,2]) en Python?"),
+        ("En Python, ¿qué tipo de dato es inmutable: la lista o la tupla?",
+         "En Python, ¿qué tipo de dato es mutable: la lista o la tupla?"),
+    ]
+    # Misma pregunta con tildes, puntuación, artículos o espacios distintos
+    SAME = [
+        ("¿Cuál es la complejidad temporal de la búsqueda binaria en el peor caso?",
+         "Cual es la complejidad temporal de una busqueda binaria en el peor caso"),
+        ("¿Qué principio de acceso sigue una pila?",
+         "¿Que principio de acceso sigue la pila?"),
+        ("¿Qué devuelve len([1,2,3]) en Python?",
+         "¿Qué devuelve len([1, 2, 3]) en  Python?"),
+        ("¿Cuál es la complejidad promedio del algoritmo quicksort?",
+         "¿Cuál es la complejidad promedio de el algoritmo Quicksort?"),
+    ]
+
+    def test_different_questions_are_not_near_duplicates(self):
+        for a, b in self.DIFFERENT:
+            with self.subTest(b=b):
+                self.assertNotIn(b, NearDuplicateIndex([a]))
+
+    def test_trivial_variants_are_near_duplicates(self):
+        for a, b in self.SAME:
+            with self.subTest(b=b):
+                index = NearDuplicateIndex([a])
+                self.assertIn(b, index)
+                self.assertEqual(index.find(b)[0], a)
+
+    def test_lookup_among_many_entries(self):
+        a, b = self.SAME[0]
+        others = [x for pair in self.DIFFERENT[1:] for x in pair]
+        index = NearDuplicateIndex(others + [a])
+        self.assertIn(b, index)
+        self.assertNotIn(self.DIFFERENT[0][1], index)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    provider = "gemini"
+
+    def setUp(self):
+        cache.clear()
+        self.now = 1000.0
+        clock = mock.patch.object(circuit_breaker, "time", SimpleNamespace(time=lambda: self.now))
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.addCleanup(cache.clear)
+
+    def state(self):
+        return circuit_breaker.snapshot([self.provider])[self.provider]
+
+    def fail(self, exc):
+        with self.assertRaises(type(exc)):
+            with circuit_breaker.guard(self.provider):
+                raise exc
+
+    def test_opens_after_threshold_failures(self):
+        for _ in range(circuit_breaker.FAILURE_THRESHOLD - 1):
+            self.fail(RuntimeError("connection reset"))
+        self.assertEqual(self.state()["state"], "closed")
+        circuit_breaker.allow(self.provider)
+
+        self.fail(RuntimeError("connection reset"))
+        self.assertEqual(self.state()["state"], "open")
+        self.assertEqual(self.state()["reason"], "failures")
+        with self.assertRaises(circuit_breaker.CircuitOpen):
+            circuit_breaker.allow(self.provider)
+
+    def test_success_resets_failure_count(self):
+        for _ in range(circuit_breaker.FAILURE_THRESHOLD - 1):
+            self.fail(RuntimeError("boom"))
+        circuit_breaker.call(self.provider, lambda: "ok")
+        self.fail(RuntimeError("boom"))
+        self.assertEqual(self.state(), {
+            "state": "closed", "reason": None, "retry_in_s": 0, "recent_failures": 1,
+        })
+
+    def test_malformed_responses_do_not_count(self):
+        for _ in range(circuit_breaker.FAILURE_THRESHOLD + 1):
+            self.fail(ValueError("invalid_response"))
+        self.assertEqual(self.state()["state"], "closed")
+
+    def test_half_open_single_probe_then_close(self):
+        circuit_breaker.record_failure(self.provider, rate_limited=True)
+        self.now += circuit_breaker.COOLDOWN_S + 1
+        self.assertEqual(self.state()["state"], "half_open")
+
+        circuit_breaker.allow(self.provider)  # esta petición es la sonda
+        with self.assertRaises(circuit_breaker.CircuitOpen):
+            circuit_breaker.allow(self.provider)
+
+        circuit_breaker.record_success(self.provider)
+        self.assertEqual(self.state()["state"], "closed")
+        circuit_breaker.allow(self.provider)
+
+    def test_failed_probe_reopens(self):
+        circuit_breaker.record_failure(self.provider, rate_limited=True)
+        self.now += circuit_breaker.COOLDOWN_S + 1
+        self.fail(RuntimeError("still down"))
+        state = self.state()
+        self.assertEqual(state["state"], "open")
+        self.assertEqual(state["retry_in_s"], circuit_breaker.COOLDOWN_S)
+
+    def test_rate_limit_uses_normal_cooldown(self):
+        self.fail(RuntimeError(
+            "429 You exceeded your current quota, please check your plan and billing details."
+        ))
+        state = self.state()
+        self.assertEqual((state["state"], state["reason"]), ("open", "rate_limited"))
+        self.assertEqual(state["retry_in_s"], circuit_breaker.COOLDOWN_S)
+
+        self.now += circuit_breaker.COOLDOWN_S + 1
+        circuit_breaker.allow(self.provider)
+
+    def test_no_credits_uses_long_cooldown(self):
+        self.fail(RuntimeError("402 Payment Required: out of credits"))
+        state = self.state()
+        self.assertEqual((state["state"], state["reason"]), ("open", "no_credits"))
+        self.assertEqual(state["retry_in_s"], circuit_breaker.CREDITS_COOLDOWN_S)
+
+        self.now += circuit_breaker.COOLDOWN_S + 1
+        with self.assertRaises(circuit_breaker.CircuitOpen):
+            circuit_breaker.allow(self.provider)
+
+    def test_error_classification(self):
+        self.assertTrue(circuit_breaker.is_rate_limited("HTTP 429 Too Many Requests"))
+        self.assertFalse(circuit_breaker.is_no_credits("429 quota exceeded, check billing"))
+        self.assertTrue(circuit_breaker.is_no_credits("402 Payment Required"))
+        self.assertTrue(circuit_breaker.is_no_credits("insufficient credits"))
+        self.assertFalse(circuit_breaker.is_rate_limited("402 Payment Required"))
+        self.assertFalse(circuit_breaker.is_no_credits("connection reset by peer"))
+
+
+@mock.patch('api.views.question_fingerprints.avoid_phrases', return_value=[])
+class PreviewStreamTests(TestCase):
+    factory = APIRequestFactory()
+    OLD = [_mcq(100)]
+
+    def setUp(self):
+        self.session = GenerationSession.objects.create(
+            topic='algoritmos', category='algoritmos', difficulty='Media',
+            types=['mcq'], counts={'mcq': 2}, latest_preview=self.OLD,
+        )
+
+    def stream(self, questions, **body):
+        def fake_stream(items):
+            yield from items
+            raise RuntimeError('stream cortado')
+
+        request = self.factory.post(
+            '/api/preview/stream/', {'session_id': str(self.session.id), **body}, format='json'
+        )
+        # el proveedor preferido entrega `questions`; el de respaldo falla sin entregar nada
+        streams = [fake_stream(questions), fake_stream([])]
+        with mock.patch('api.views.stream_questions', side_effect=streams):
+            response = preview_questions_stream(request)
+            return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_complete_stream_persists_preview(self, _avoid):
+        events = self.stream([_mcq(1), _mcq(2)])
+        self.assertEqual(events[-1]['event'], 'done')
+        self.session.refresh_from_db()
+        self.assertEqual([q['question'] for q in self.session.latest_preview],
+                         [_mcq(1)['question'], _mcq(2)['question']])
+        self.assertEqual(events[-1]['version'], self.session.version)
+
+    def test_partial_stream_keeps_last_good_preview(self, _avoid):
+        events = self.stream([_mcq(1)])
+        self.assertEqual(events[-1]['event'], 'error')
+        self.assertEqual(events[-1]['delivered'], 1)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.latest_preview, self.OLD)
+
+    def test_malformed_items_do_not_count(self, _avoid):
+        events = self.stream([
+            {'type': 'mcq'}, {'type': 'mcq', 'question': 42}, 'texto', {'type': 'vf', 'question': '¿Sí?'},
+            _mcq(1),
+        ])
+        questions = [e for e in events if e['event'] == 'question']
+        self.assertEqual(len(questions), 1)
+        self.assertEqual(events[-1]['missing'], {'mcq': 1})
+
+    def test_concurrent_edit_is_not_overwritten(self, _avoid):
+        stale = self.session.version
+        self.session.latest_preview = [_mcq(200)]
+        self.session.save()
+
+        events = self.stream([_mcq(1), _mcq(2)], version=stale)
+        self.assertEqual(events[-1]['event'], 'error')
+        self.assertEqual(events[-1]['error'], 'version_conflict')
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.latest_preview, [_mcq(200)])
+
+
+class QuizStatCounterTests(TestCase):
+
+    def make_quiz(self, topic, difficulty, n=4):
+        return SavedQuiz.objects.create(
+            title=f'{topic} {difficulty}', topic=topic, difficulty=difficulty,
+            types=['mcq'], counts={'mcq': n}, questions=[_mcq(i) for i in range(n)],
+        )
+
+    def snapshot(self):
+        return {
+            (c.dimension, c.value): (c.total, c.completed, c.progress_sum)
+            for c in QuizStatCounter.objects.all()
+            if c.total or c.progress_sum
+        }
+
+    def test_incremental_counters_match_rebuild(self):
+        a = self.make_quiz('redes', 'Media')
+        b = self.make_quiz('redes', 'Fácil')
+        c = self.make_quiz('algoritmos', 'Media', n=5)
+        d = self.make_quiz('algoritmos', 'Difícil')
+
+        a.current_question = 1
+        a.save(update_fields=['current_question'])
+        a.current_question = 3
+        a.save(update_fields=['current_question'])
+        c.current_question = 2
+        c.save()
+        b.current_question = 3
+        b.is_completed = True
+        b.save(update_fields=['current_question', 'is_completed'])
+        d.topic = 'bases de datos'
+        d.current_question = 1
+        d.save()
+        c.delete()
+
+        incremental = self.snapshot()
+        QuizStatCounter.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+        self.assertEqual(incremental[('all', '')], (3, 1, 75 + 25))
+
+    def test_progress_changes_are_written_with_the_quiz(self):
+        quiz = self.make_quiz('redes', 'Media')
+        for i in (1, 2, 3):
+            quiz.current_question = i
+            quiz.save(update_fields=['current_question'])
+        self.assertEqual(self.snapshot()[('all', '')], (1, 0, 75))
+        self.assertEqual(self.snapshot()[('topic', 'redes')], (1, 0, 75))
+
+        # el rollback del save() deshace también sus deltas
+        before = self.snapshot()
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                quiz.current_question = 0
+                quiz.save(update_fields=['current_question'])
+                raise RuntimeError('rollback')
+        self.assertEqual(self.snapshot(), before)
+
+
+class OptimisticSaveTests(TestCase):
+
+    def setUp(self):
+        self.quiz = SavedQuiz.objects.create(
+            title='t', topic='redes', difficulty='Media', types=['mcq'],
+            counts={'mcq': 2}, questions=[_mcq(0), _mcq(1)],
+        )
+
+    def test_single_conditional_update(self):
+        self.quiz.title = 'nuevo'
+        with CaptureQueriesContext(connection) as ctx:
+            optimistic.save(self.quiz, update_fields=['title'], expected_version=1)
+        updates = [q['sql'] for q in ctx.captured_queries
+                   if q['sql'].startswith('UPDATE') and 'saved_quiz' in q['sql'].split('SET')[0]]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('version', updates[0].split('WHERE')[1])
+        # sólo el atomic() propio de SavedQuiz.save()
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('SAVEPOINT')]), 1)
+        self.quiz.refresh_from_db()
+        self.assertEqual((self.quiz.title, self.quiz.version), ('nuevo', 2))
+
+    def test_stale_version_conflicts(self):
+        SavedQuiz.objects.filter(pk=self.quiz.pk).update(version=5)
+        self.quiz.title = 'perdido'
+        with self.assertRaises(optimistic.VersionConflict) as cm:
+            optimistic.save(self.quiz, expected_version=1)
+        self.assertEqual((cm.exception.expected, cm.exception.current), (1, 5))
+        self.assertEqual(self.quiz.version, 1)
+        self.assertEqual(SavedQuiz.objects.count(), 1)
+        self.assertEqual(SavedQuiz.objects.get().title, 't')
+
+
+class TopicSuggestModerationTests(TestCase):
+
+    def test_offensive_history_is_not_indexed(self):
+        for topic in ('grafos dirigidos', 'algoritmos para estupidos', 'algoritmos para idiotas'):
+            for _ in range(topic_suggest.MIN_COUNT):
+                GenerationSession.objects.create(
+                    topic=topic, category='algoritmos', difficulty='Media',
+                    types=['mcq'], counts={'mcq': 1},
+                )
+        topics = {e['topic'] for e in topic_suggest.build_index().entries}
+        self.assertIn('grafos dirigidos', topics)
+        self.assertNotIn('algoritmos para estupidos', topics)
+        self.assertNotIn('algoritmos para idiotas', topics)
+
+
+class QuestionBankTopicTests(TestCase):
+
+    def setUp(self):
+        BankedQuestion.objects.bulk_create(
+            BankedQuestion(category='estructura de datos', difficulty='Media', qtype='mcq', question=_mcq(i))
+            for i in range(3)
+        )
+
+    def test_specific_topic_is_not_served_from_category_bucket(self):
+        got = question_bank.take('estructura de datos', 'Media', ['mcq'], {'mcq': 2}, topic='listas enlazadas en estructura de datos')
+        self.assertIsNone(got)
+        self.assertEqual(BankedQuestion.objects.count(), 3)
+
+    def test_category_topic_is_served(self):
+        got = question_bank.take('estructura de datos', 'Media', ['mcq'], {'mcq': 2}, topic='Estructura de Datos')
+        self.assertEqual(len(got), 2)
+        self.assertEqual(BankedQuestion.objects.count(), 1)
+
+
+class GenerateFallbackCarryTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_fallback_keeps_questions_from_failed_topup(self):
+        first = [_mcq(0), _mcq(1)]
+        rest = [_mcq(2), _mcq(3)]
+        with mock.patch('api.views.generate_questions_with_gemini',
+                        side_effect=[first, RuntimeError('connection reset')]) as gemini, \
+                mock.patch('api.views.generate_questions_with_pplx', return_value=rest) as pplx:
+            got, provider, fallback, errors = _generate_with_fallback(
+                'algoritmos', 'Media', ['mcq'], {'mcq': 4}, 'gemini', hedge=False)
+
+        self.assertEqual(gemini.call_count, 2)
+        self.assertEqual(pplx.call_args.args[3], {'mcq': 2})
+        self.assertEqual(got, first + rest)
+        self.assertEqual((provider, fallback), ('perplexity', True))
+
+
+class HedgeHeaderTests(SimpleTestCase):
+
+    def request(self, value):
+        return APIRequestFactory().post('/api/preview/', {}, format='json', HTTP_X_LLM_HEDGE=value)
+
+    def test_header_ignored_unless_allowed(self):
+        with mock.patch('api.views.HEDGE_HEADER_ALLOWED', False):
+            self.assertIsNone(_header_hedge(self.request('1')))
+            self.assertIsNone(_header_hedge(self.request('0')))
+
+    def test_header_honoured_when_allowed(self):
+        with mock.patch('api.views.HEDGE_HEADER_ALLOWED', True):
+            self.assertIs(_header_hedge(self.request('1')), True)
+            self.assertIs(_header_hedge(self.request('off')), False)
+
+
+class SavedQuizCursorTests(TestCase):
+
+    def test_cursor_round_trip(self):
+        values = {'last_accessed': timezone.now(), 'updated_at': timezone.now(), 'id': 'abc'}
+        self.assertEqual(decode_cursor(encode_cursor(values), datetime_keys=('last_accessed', 'updated_at')), values)
+        for bad in ('%%%', encode_cursor({'id': 'x'}), 'WzFd'):
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(bad, datetime_keys=('last_accessed',))
+
+    def make_quizzes(self, n):
+        now = timezone.now()
+        quizzes = [
+            SavedQuiz.objects.create(title=f'q{i}', topic='redes', difficulty='Media', types=['mcq'],
+                                     counts={'mcq': 1}, questions=[_mcq(i)])
+            for i in range(n)
+        ]
+        # empates en created_at: los desempata el id
+        for i, quiz in enumerate(quizzes):
+            SavedQuiz.objects.filter(pk=quiz.pk).update(created_at=now - timedelta(minutes=i // 3))
+        return quizzes
+
+    def walk(self, on_page=None):
+        seen, cursor = [], None
+        while True:
+            url = '/api/saved-quizzes/?page_size=2' + (f'&cursor={cursor}' if cursor else '')
+            body = self.client.get(url, secure=True).json()
+            seen += [q['id'] for q in body['saved_quizzes']]
+            self.assertEqual(body['count'], SavedQuiz.objects.count())
+            cursor = body['next_cursor']
+            if not body['has_more']:
+                self.assertIsNone(cursor)
+                return seen
+            if on_page:
+                on_page(seen)
+
+    def test_pages_cover_every_quiz_once(self):
+        self.make_quizzes(7)
+        expected = [str(q.id) for q in SavedQuiz.objects.order_by('-created_at', 'id')]
+        self.assertEqual(self.walk(), expected)
+
+    def test_access_during_pagination_does_not_move_rows(self):
+        quizzes = self.make_quizzes(7)
+        expected = [str(q.id) for q in SavedQuiz.objects.order_by('-created_at', 'id')]
+
+        def open_quizzes(seen):
+            # abrir (GET detalle / load) un quiz ya servido y otro pendiente
+            for quiz in quizzes:
+                if str(quiz.id) == seen[0] or str(quiz.id) == expected[-1]:
+                    with mock.patch.object(access_tracker, 'WRITE_BEHIND', False):
+                        access_tracker.touch(quiz, at=timezone.now() + timedelta(hours=len(seen)))
+
+        self.assertEqual(self.walk(on_page=open_quizzes), expected)
+
+    def test_invalid_cursor_is_400(self):
+        self.assertEqual(self.client.get('/api/saved-quizzes/?cursor=%25%25', secure=True).status_code, 400)
+
+
+class HedgedCallTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.release = threading.Event()
+        self.calls = []
+
+    def tearDown(self):
+        self.release.set()  # deja terminar a los perdedores bloqueados
+
+    def provider(self, results):
+        """call(prov): results[prov] es un valor, una excepción o ('slow', valor|excepción)."""
+        def call(prov):
+            self.calls.append(prov)
+            outcome = results[prov]
+            if isinstance(outcome, tuple):
+                self.release.wait(5)
+                outcome = outcome[1]
+            if isinstance(outcome, BaseException):
+                raise outcome
+            return outcome
+        return call
+
+    def test_fast_primary_wins_without_hedge(self):
+        call = self.provider({'gemini': 'g', 'perplexity': 'p'})
+        result, winner, errors, report = hedged_call('gemini', 'perplexity', call, 'generate', threshold_s=1)
+        self.assertEqual((result, winner, errors), ('g', 'gemini', {}))
+        self.assertEqual((report['hedged'], report['extra_calls']), (False, 0))
+        self.assertEqual(self.calls, ['gemini'])
+
+    def test_slow_primary_is_hedged_and_loser_ignored(self):
+        call = self.provider({'gemini': ('slow', 'tarde'), 'perplexity': 'p'})
+        result, winner, errors, report = hedged_call('gemini', 'perplexity', call, 'generate', threshold_s=0.01)
+        self.release.set()
+        self.assertEqual((result, winner), ('p', 'perplexity'))
+        self.assertEqual((report['hedged'], report['winner'], report['extra_calls']), (True, 'perplexity', 1))
+        self.assertEqual(errors, {})
+
+    def test_loser_error_after_win_is_not_reported(self):
+        call = self.provider({'gemini': ('slow', RuntimeError('timeout')), 'perplexity': 'p'})
+        result, winner, errors, _ = hedged_call('gemini', 'perplexity', call, 'generate', threshold_s=0.01)
+        self.release.set()
+        self.assertEqual((result, winner, errors), ('p', 'perplexity', {}))
+
+    def test_primary_error_falls_back_without_hedge(self):
+        boom = RuntimeError('402 insufficient credits')
+        call = self.provider({'gemini': boom, 'perplexity': 'p'})
+        result, winner, errors, report = hedged_call('gemini', 'perplexity', call, 'generate', threshold_s=1)
+        self.assertEqual((result, winner), ('p', 'perplexity'))
+        self.assertIs(errors['gemini'], boom)
+        self.assertFalse(report['hedged'])
+
+    def test_both_failing_raises_hedge_failed(self):
+        call = self.provider({'gemini': RuntimeError('a'), 'perplexity': ValueError('b')})
+        with self.assertRaises(HedgeFailed) as cm:
+            hedged_call('gemini', 'perplexity', call, 'generate', threshold_s=1)
+        self.assertEqual(set(cm.exception.errors), {'gemini', 'perplexity'})
+        self.assertIsInstance(cm.exception.errors['perplexity'], ValueError)
+
+    def test_generate_returns_only_the_winners_questions(self):
+        # el perdedor (lento) llega a juntar preguntas parciales: no se mezclan con las del ganador
+        def gemini(*args):
+            self.release.wait(5)
+            return [_mcq(10), _mcq(11)]
+
+        with mock.patch('api.views.generate_questions_with_gemini', side_effect=gemini), \
+                mock.patch('api.views.generate_questions_with_pplx', return_value=[_mcq(i) for i in range(4)]), \
+                mock.patch('api.services.llm_hedging.HEDGE_AFTER_S', '0.01'):
+            got, provider, _, _ = _generate_with_fallback(
+                'algoritmos', 'Media', ['mcq'], {'mcq': 4}, 'gemini', hedge=True)
+        self.release.set()
+        self.assertEqual(provider, 'perplexity')
+        self.assertEqual(got, [_mcq(i) for i in range(4)])
+
+
+class RepairFlaggedQuestionsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.release = threading.Event()
+        self.preview = [_mcq(0), _mcq(1), _mcq(2), _mcq(3)]
+        self.seen = {_norm_for_cmp(self.preview[0]['question']), _norm_for_cmp(self.preview[2]['question'])}
+
+    def tearDown(self):
+        self.release.set()
+
+    def repair(self, variants, flagged, delays=None):
+        """variants/delays: {texto de la pregunta original: variante / segundos}."""
+        delays = delays or {}
+
+        def regenerate(topic, difficulty, qtype, base_q, *args):
+            time.sleep(delays.get(base_q['question'], 0))
+            return variants[base_q['question']]
+
+        with mock.patch('api.views.regenerate_question_with_pplx', side_effect=regenerate):
+            return _repair_flagged_questions(flagged, self.preview, self.seen, 'algoritmos', 'Media', 'perplexity')
+
+    def test_variants_fill_their_own_slots(self):
+        q1, q3 = self.preview[1], self.preview[3]
+        v1, v3 = _mcq(11), _mcq(13)
+        # la variante de q1 llega después que la de q3
+        report = self.repair({q1['question']: v1, q3['question']: v3},
+                             [(1, q1, 'minor'), (3, q3, 'minor')], delays={q1['question']: 0.05})
+        self.assertEqual(report, {'attempted': 2, 'timed_out': 0})
+        self.assertEqual(self.preview, [_mcq(0), v1, _mcq(2), v3])
+        self.assertTrue({_norm_for_cmp(v1['question']), _norm_for_cmp(v3['question'])} <= self.seen)
+
+    def test_duplicate_variant_is_rejected_in_index_order(self):
+        q1, q3 = self.preview[1], self.preview[3]
+        same = _mcq(99)
+        self.repair({q1['question']: same, q3['question']: dict(same)},
+                    [(1, q1, 'minor'), (3, q3, 'severe')], delays={q1['question']: 0.05})
+        # el índice 1 se aplica primero aunque llegue último; el 3 choca con él
+        self.assertEqual(self.preview[1], same)
+        self.assertIn('Pregunta ajustada por moderación', self.preview[3]['question'])
+        self.assertEqual(len(self.seen), 4)
+
+    def test_deadline_cancels_further_provider_calls(self):
+        q1 = self.preview[1]
+
+        def slow_pplx(*args):
+            self.release.wait(5)
+            raise RuntimeError('connection reset')
+
+        with mock.patch('api.views.PREVIEW_REPAIR_DEADLINE_S', 0.05), \
+                mock.patch('api.views.regenerate_question_with_pplx', side_effect=slow_pplx), \
+                mock.patch('api.views.regenerate_question_with_gemini', return_value=_mcq(50)) as gemini:
+            report = _repair_flagged_questions([(1, q1, 'minor')], self.preview, self.seen,
+                                               'algoritmos', 'Media', 'perplexity')
+            self.assertEqual(report, {'attempted': 1, 'timed_out': 1})
+            self.assertEqual(self.preview[1], q1)
+
+            self.release.set()
+            for t in threading.enumerate():
+                if t.name.startswith('llm-par'):
+                    t.join(2)
+        # el fallo tardío de perplexity no lanza el fallback a gemini
+        gemini.assert_not_called()
+
+
+class BackfillQuestionFingerprintsTests(TestCase):
+
+    def test_row_backed_sessions_are_backfilled(self):
+        session = GenerationSession.objects.create(
+            topic='algoritmos', category='algoritmos', difficulty='Media',
+            types=['mcq'], counts={'mcq': 2}, latest_preview=[_mcq(0), _mcq(1)],
+        )
+        session.insert_question(1, _mcq(7))  # pasa el preview a filas SessionQuestion
+        session.refresh_from_db()
+        self.assertIsNone(session.question_set_id)
+        QuestionFingerprint.objects.all().delete()
+
+        call_command('backfill_question_fingerprints', stdout=io.StringIO())
+
+        norms = set(QuestionFingerprint.objects.filter(category='algoritmos', difficulty='Media')
+                    .values_list('norm', flat=True))
+        self.assertEqual(norms, {_norm_for_cmp(_mcq(i)['question']) for i in (0, 1, 7)})
+
+
+class LLMTelemetryTests(TestCase):
+
+    def setUp(self):
+        # las llamadas hechas desde hilos (hedging, reparación) escriben con su propia
+        # conexión, fuera de la transacción del test: partir de la tabla vacía
+        llm_telemetry.buffer.flush()
+        LLMCallEvent.objects.all().delete()
+
+    def test_successful_call_is_recorded(self):
+        with llm_telemetry.track('gemini', 'generate', model='gemini-1.5-flash'):
+            llm_telemetry.annotate(prompt='abc', response='defgh', prompt_tokens=3, completion_tokens=5)
+            llm_telemetry.annotate(prompt='xy', prompt_tokens=2)  # top-up dentro del mismo track
+
+        event = LLMCallEvent.objects.get()
+        self.assertEqual((event.provider, event.operation, event.outcome, event.fallback),
+                         ('gemini', 'generate', 'success', False))
+        self.assertEqual((event.prompt_chars, event.response_chars), (5, 5))
+        self.assertEqual((event.prompt_tokens, event.completion_tokens), (5, 5))
+        self.assertEqual(event.model, 'gemini-1.5-flash')
+
+    def test_failure_is_classified_and_reraised(self):
+        with self.assertRaises(RuntimeError):
+            with llm_telemetry.track('perplexity', 'regenerate', fallback=True):
+                raise RuntimeError('402 Payment Required: insufficient credits')
+        event = LLMCallEvent.objects.get()
+        self.assertEqual((event.outcome, event.fallback), ('no_credits', True))
+        self.assertIn('insufficient credits', event.error)
+
+    @override_settings(WRITE_BEHIND_SYNC=False)
+    def test_buffered_events_are_written_on_flush(self):
+        llm_telemetry.buffer.flush()
+        for _ in range(3):
+            with llm_telemetry.track('gemini', 'generate'):
+                pass
+        self.assertEqual(LLMCallEvent.objects.count(), 0)
+        self.assertEqual(llm_telemetry.buffer.flush(), 3)
+        self.assertEqual(LLMCallEvent.objects.count(), 3)
+
+    @override_settings(WRITE_BEHIND_SYNC=False)
+    def test_metrics_include_pending_events(self):
+        with llm_telemetry.track('gemini', 'generate'):
+            pass
+        rows = llm_telemetry.compute_llm_metrics()['by_provider_operation']
+        self.assertEqual([(r['provider'], r['operation'], r['calls']) for r in rows], [('gemini', 'generate', 1)])
+
+
+class QuizProgressPatchTests(TestCase):
+
+    def setUp(self):
+        self.quiz = SavedQuiz.objects.create(
+            title='t', topic='redes', difficulty='Media', types=['mcq'],
+            counts={'mcq': 3}, questions=[_mcq(0), _mcq(1), _mcq(2)], user_answers={'0': 'A'},
+        )
+        self.url = f'/api/saved-quizzes/{self.quiz.id}/progress/'
+
+    def patch(self, body):
+        return self.client.patch(self.url, data=json.dumps(body), content_type='application/json', secure=True)
+
+    def test_delta_merges_answers_and_bumps_version(self):
+        resp = self.patch({'answers': {'1': 'C'}, 'current_question': 2, 'version': 1})
+        self.assertEqual(resp.status_code, 200)
+        body = resp.json()
+        self.assertEqual((body['current_question'], body['answered_count'], body['version']), (2, 2, 2))
+
+        self.quiz.refresh_from_db()
+        self.assertEqual(self.quiz.user_answers, {'0': 'A', '1': 'C'})
+        self.assertEqual(self.quiz.questions, [_mcq(0), _mcq(1), _mcq(2)])
+        self.assertEqual(self.quiz.title, 't')
+
+    def test_stale_version_returns_409_and_writes_nothing(self):
+        self.assertEqual(self.patch({'answers': {'1': 'C'}, 'version': 1}).status_code, 200)
+
+        resp = self.patch({'answers': {'2': 'B'}, 'current_question': 2, 'version': 1})
+        self.assertEqual(resp.status_code, 409)
+        body = resp.json()
+        self.assertEqual((body['code'], body['expected_version'], body['current_version']),
+                         ('version_conflict', 1, 2))
+        self.quiz.refresh_from_db()
+        self.assertEqual(self.quiz.user_answers, {'0': 'A', '1': 'C'})
+        self.assertEqual((self.quiz.current_question, self.quiz.version), (0, 2))
+
+    def test_out_of_range_index_is_rejected(self):
+        resp = self.patch({'answers': {'3': 'A'}})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.json()['details'], {'answers': ['3']})
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpClientPoolTests(SimpleTestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _KeepAliveHandler)
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.host = f'127.0.0.1:{self.server.server_address[1]}'
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(lambda: http_client._sessions.pop(self.host, None))
+
+    def test_one_session_per_host(self):
+        a = http_client.session_for(f'http://{self.host}/a')
+        self.assertIs(http_client.session_for(f'http://{self.host.upper()}/b?x=1'), a)
+        self.addCleanup(lambda: http_client._sessions.pop('other.invalid', None))
+        self.assertIsNot(http_client.session_for('https://other.invalid/chat'), a)
+
+    def test_keep_alive_connection_is_reused(self):
+        for _ in range(3):
+            resp = http_client.get(f'http://{self.host}/ping', timeout=5)
+            self.assertEqual(resp.json(), {'ok': True})
+        stats = http_client.pool_stats()[self.host]
+        self.assertEqual((stats['requests'], stats['connections_opened'], stats['reused']), (3, 1, 2))
+        self.assertEqual(stats['idle'], 1)
+
+    def test_retry_policy_never_replays_reads_or_billing_errors(self):
+        retry = http_client.session_for(f'http://{self.host}/').get_adapter(f'http://{self.host}/').max_retries
+        self.assertEqual(retry.read, 0)
+        self.assertEqual(set(retry.status_forcelist), {502, 503, 504})
+        self.assertNotIn(402, retry.status_forcelist)
+        self.assertNotIn(429, retry.status_forcelist)
+
+    def test_number_timeout_is_read_timeout(self):
+        self.assertEqual(http_client._timeout(12), (http_client.CONNECT_TIMEOUT, 12))
+        self.assertEqual(http_client._timeout((1, 2)), (1, 2))
+
+
+class GeminiRegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        self.genai = mock.MagicMock()
+        self.genai.GenerativeModel.side_effect = lambda name, generation_config=None: SimpleNamespace(
+            name=name, config=generation_config)
+        patches = [
+            mock.patch.object(gemini_registry, '_import_genai', return_value=self.genai),
+            mock.patch.dict('os.environ', {'GEMINI_API_KEY': 'k1'}),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        gemini_registry.invalidate()
+        self.addCleanup(gemini_registry.invalidate)
+
+    def test_model_is_built_once_per_configuration(self):
+        schema = {'type': 'object', 'properties': {'a': {'type': 'string'}}}
+        first = gemini_registry.get_model('gemini-x', schema=schema, temperature=0.2)
+        same = gemini_registry.get_model('gemini-x', schema=dict(reversed(list(schema.items()))), temperature=0.2)
+        other = gemini_registry.get_model('gemini-x', schema=schema, temperature=0.7)
+
+        self.assertIs(first, same)
+        self.assertIsNot(first, other)
+        self.assertEqual(self.genai.GenerativeModel.call_count, 2)
+        self.genai.configure.assert_called_once_with(api_key='k1')
+        self.assertEqual(self.genai.GenerationConfig.call_args_list[0], mock.call(
+            temperature=0.2, response_mime_type='application/json', response_schema=schema))
+
+    def test_plain_model_has_no_generation_config(self):
+        self.assertIsNone(gemini_registry.get_model('gemini-x').config)
+        self.genai.GenerationConfig.assert_not_called()
+
+    def test_key_rotation_reconfigures_and_drops_models(self):
+        old = gemini_registry.get_model('gemini-x')
+        with mock.patch.dict('os.environ', {'GEMINI_API_KEY': 'k2'}):
+            new = gemini_registry.get_model('gemini-x')
+        self.assertIsNot(old, new)
+        self.assertEqual(self.genai.configure.call_args_list, [mock.call(api_key='k1'), mock.call(api_key='k2')])
+
+    def test_missing_key_raises(self):
+        with mock.patch.dict('os.environ', {'GEMINI_API_KEY': ''}):
+            with self.assertRaisesMessage(RuntimeError, 'GEMINI_API_KEY not set'):
+                gemini_registry.get_model('gemini-x')
+
+
+class ReviewQuizVariantsTests(TestCase):
+
+    def setUp(self):
+        self.quiz = SavedQuiz.objects.create(
+            title='t', topic='redes', difficulty='Media', types=['mcq'],
+            counts={'mcq': 3}, questions=[_mcq(0), _mcq(1), _mcq(2)], favorite_questions=[0, 1, 2],
+        )
+        self.url = f'/api/saved-quizzes/{self.quiz.id}/create-review/'
+
+    def variant(self, text):
+        return {**_mcq(0), 'question': text}
+
+    def test_variants_run_concurrently_and_are_applied_in_order(self):
+        barrier = threading.Barrier(3, timeout=5)  # secuencial -> BrokenBarrierError
+        calls = []
+
+        def fake_regen(topic, difficulty, qtype, base_q, avoid_phrases, preferred=None, global_avoid=None):
+            n = int(base_q['question'].split('número ')[1].rstrip('?'))
+            calls.append((n, set(avoid_phrases)))
+            if len([c for c in calls if c[0] == n]) == 1:
+                barrier.wait()
+                if n == 2:
+                    raise RuntimeError('no_providers_available')
+                # 1 devuelve lo mismo que 0: al aplicarse en orden debe reintentarse
+                return self.variant('Variante cero'), 'gemini', False, []
+            return self.variant(f'Variante {n}'), 'gemini', False, []
+
+        with mock.patch('api.views_saved_quizzes._regenerate_with_fallback', side_effect=fake_regen):
+            resp = self.client.post(self.url, secure=True)
+
+        self.assertEqual(resp.status_code, 201)
+        body = resp.json()
+        self.assertEqual([q['question'] for q in body['questions']], ['Variante cero', 'Variante 1'])
+        self.assertEqual([(i['index'], i['status']) for i in body['items']],
+                         [(0, 'ok'), (1, 'retried'), (2, 'failed')])
+        self.assertEqual(body['items'][2]['error'], 'no_providers_available')
+        self.assertEqual(body['failed'], 1)
+
+        bases = {_norm_for_cmp(q['question']) for q in self.quiz.questions}
+        self.assertTrue(all(bases <= avoid for _, avoid in calls))
+        retry_avoid = calls[-1][1]
+        self.assertEqual(calls[-1][0], 1)
+        self.assertIn(_norm_for_cmp('Variante cero'), retry_avoid)
+
+    def test_all_out_of_credits_is_503(self):
+        with mock.patch('api.views_saved_quizzes._regenerate_with_fallback',
+                        side_effect=RuntimeError('no_providers_available')):
+            resp = self.client.post(self.url, secure=True)
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual([i['status'] for i in resp.json()['items']], ['failed'] * 3)
+        self.assertFalse(GenerationSession.objects.exists())
+
+
+class SessionFingerprintTests(TestCase):
+
+    def setUp(self):
+        self.session = GenerationSession.objects.create(
+            topic='redes', difficulty='Media', types=['mcq'], counts={'mcq': 3},
+            latest_preview=[_mcq(0), _mcq(1), _mcq(2)],
+        )
+
+    def norm(self, question):
+        return SessionFingerprint.fingerprint(question)[0]
+
+    def preview_rows(self):
+        return dict(SessionFingerprint.objects.filter(session=self.session, kind=SessionFingerprint.PREVIEW)
+                    .values_list('index', 'pk'))
+
+    def test_preview_rows_follow_the_preview(self):
+        before = self.preview_rows()
+        self.assertEqual(sorted(before), [0, 1, 2])
+
+        self.session.latest_preview = [_mcq(0), _mcq(7), _mcq(2)]
+        self.session.save()
+        after = self.preview_rows()
+        # sólo cambia la fila del hueco reemplazado
+        self.assertEqual((after[0], after[2]), (before[0], before[2]))
+        self.assertNotEqual(after[1], before[1])
+        self.assertEqual(SessionFingerprint.objects.get(pk=after[1]).norm, self.norm(_mcq(7)))
+
+    def test_seen_set_includes_regenerations_for_the_index(self):
+        RegenerationLog.objects.create(session=self.session, index=1, old_question=_mcq(1), new_question=_mcq(11))
+        RegenerationLog.objects.create(session=self.session, index=2, old_question=_mcq(2), new_question=_mcq(12))
+
+        with CaptureQueriesContext(connection) as ctx:
+            seen = build_seen_set(self.session, index=1)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn(self.norm(_mcq(0)), seen)
+        self.assertIn(self.norm(_mcq(11)), seen)
+        self.assertNotIn(self.norm(_mcq(12)), seen)
+
+        self.assertIn(self.norm(_mcq(12)), build_seen_set(self.session))
+
+    def test_replace_question_updates_fingerprints(self):
+        self.session.replace_question(0, _mcq(5))
+        self.assertIn(self.norm(_mcq(5)), build_seen_set(self.session))
+        self.assertEqual(
+            SessionFingerprint.objects.get(session=self.session, kind=SessionFingerprint.PREVIEW, index=0).norm,
+            self.norm(_mcq(5)))
+
+
+class TaxonomyMatcherTests(SimpleTestCase):
+
+    def test_fold(self):
+        self.assertEqual(taxonomy.fold('Teoría de la Computación! C# y C++'), 'teoria de la computacion c# y c++')
+
+    def test_best_match_not_first_match(self):
+        # "sql" va antes en la taxonomía y también está contenido en el tema
+        self.assertEqual(taxonomy.matcher.best('PL/SQL').category, 'pl/sql')
+        self.assertEqual(taxonomy.matcher.best('Teoría de la Computación').score, 1.0)
+        self.assertEqual([m.category for m in taxonomy.matcher.match('C++')], ['c++'])
+
+    def test_prefix_variants_via_trie(self):
+        self.assertEqual(taxonomy.matcher.best('algoritmo').category, 'algoritmos')
+        best = taxonomy.matcher.best('Estructuras de Datos')
+        self.assertEqual(best.category, 'estructura de datos')
+        self.assertLess(best.score, 1.0)
+
+    def test_unrelated_topic_has_no_match_but_suggestions_stay_ordered(self):
+        self.assertIsNone(taxonomy.matcher.best('cocina italiana'))
+        self.assertEqual(taxonomy.matcher.suggest('redes', limit=2), ['redes de computadores', 'seguridad en redes'])
+
+    def test_extract_from_free_text(self):
+        found = taxonomy.matcher.extract('genera un quiz de redes de computadores por favor')
+        self.assertEqual((found.category, found.coverage), ('redes de computadores', 1.0))
+
+    def test_results_are_cached_by_folded_topic(self):
+        matcher = taxonomy.TaxonomyMatcher(taxonomy.ALLOWED_TAXONOMY, cache_size=2)
+        first = matcher.match('Bases de Datos')
+        self.assertEqual(matcher.match('  bases de datos!! '), first)
+        info = matcher.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+        matcher.match('docker')
+        matcher.match('kubernetes')
+        matcher.match('bases de datos')  # expulsada por LRU
+        self.assertEqual(matcher.cache_info().misses, 4)
+
+
+class TopicSuggestIndexTests(TestCase):
+
+    def entry(self, topic, weight, source='history'):
+        return {'topic': topic, 'category': 'algoritmos', 'source': source, 'count': weight, 'weight': weight}
+
+    def test_prefix_of_any_word_ignoring_accents(self):
+        index = topic_suggest.SuggestIndex(topic_suggest._taxonomy_entries())
+        self.assertIn('estructura de datos', [s['topic'] for s in index.suggest('datos', limit=20)])
+        self.assertEqual(index.suggest('TEORIA de la comp')[0]['topic'], 'teoría de la computación')
+        self.assertEqual(index.suggest('zzz'), [])
+
+    def test_ranked_by_weight_and_deduplicated(self):
+        index = topic_suggest.SuggestIndex([
+            self.entry('grafos', 3), self.entry('Grafos!', 2), self.entry('grafos dirigidos', 9),
+            self.entry('gramáticas', 1),
+        ])
+        self.assertEqual([s['topic'] for s in index.suggest('gra')], ['grafos dirigidos', 'grafos', 'gramáticas'])
+        self.assertEqual([s['topic'] for s in index.suggest('gra', limit=1)], ['grafos dirigidos'])
+
+    def test_prefix_buckets_keep_top_k(self):
+        index = topic_suggest.SuggestIndex([self.entry(f'tema {i:02d}', i) for i in range(topic_suggest.TOP_K + 5)])
+        got = index.suggest('tema', limit=100)
+        self.assertEqual(len(got), topic_suggest.TOP_K)
+        self.assertEqual(got[0]['topic'], f'tema {topic_suggest.TOP_K + 4:02d}')
+
+    def test_long_query_falls_back_to_scan(self):
+        topic = 'optimización de rendimiento en bases de datos distribuidas'
+        index = topic_suggest.SuggestIndex([self.entry(topic, 1)])
+        self.assertEqual(index.suggest(topic[:45])[0]['topic'], topic)
+
+    def test_history_topics_need_min_count(self):
+        for topic, n in (('grafos dirigidos', topic_suggest.MIN_COUNT), ('grafos raros', 1)):
+            for _ in range(n):
+                GenerationSession.objects.create(topic=topic, category='algoritmos', difficulty='Media',
+                                                 types=['mcq'], counts={'mcq': 1})
+        index = topic_suggest.build_index()
+        history = [s['topic'] for s in index.suggest('grafos') if s['source'] == 'history']
+        self.assertEqual(history, ['grafos dirigidos'])
+        algoritmos = index.suggest('algoritmos')[0]
+        self.assertEqual((algoritmos['source'], algoritmos['count']), ('taxonomy', topic_suggest.MIN_COUNT + 1))
+
+    def test_first_request_serves_taxonomy_and_schedules_rebuild(self):
+        with mock.patch.object(topic_suggest, '_index', None), \
+                mock.patch.object(topic_suggest, '_schedule_rebuild') as schedule:
+            resp = self.client.get('/api/topics/suggest/?q=kuber', secure=True)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([s['topic'] for s in resp.json()['suggestions']], ['kubernetes'])
+        schedule.assert_called_once_with()
+
+
+class SavedQuizCountersTests(TestCase):
+
+    def setUp(self):
+        self.quiz = SavedQuiz.objects.create(
+            title='t', topic='redes', difficulty='Media', types=['mcq'], counts={'mcq': 4},
+            questions=[_mcq(i) for i in range(4)], user_answers={'0': 'A'}, favorite_questions=[1, 2],
+            current_question=1,
+        )
+
+    def test_counters_follow_the_json_fields(self):
+        self.assertEqual((self.quiz.question_count, self.quiz.answered_count, self.quiz.marked_count), (4, 1, 2))
+        self.assertEqual(self.quiz.progress, 25)
+
+        self.quiz.user_answers = {'0': 'A', '1': 'B', '2': 'C'}
+        self.quiz.save(update_fields=['user_answers'])  # answered_count se añade solo
+        stored = SavedQuiz.objects.values_list('answered_count', 'marked_count').get(pk=self.quiz.pk)
+        self.assertEqual(stored, (3, 2))
+
+    def test_deferred_json_keeps_its_counter(self):
+        quiz = SavedQuiz.objects.defer('user_answers', 'favorite_questions').get(pk=self.quiz.pk)
+        quiz.title = 'renombrado'
+        quiz.save()
+        stored = SavedQuiz.objects.values_list('title', 'answered_count', 'marked_count').get(pk=self.quiz.pk)
+        self.assertEqual(stored, ('renombrado', 1, 2))
+
+    def test_listing_reads_counters_without_heavy_json(self):
+        with CaptureQueriesContext(connection) as ctx:
+            body = self.client.get('/api/saved-quizzes/', secure=True).json()
+        item = body['saved_quizzes'][0]
+        self.assertEqual((item['total_questions'], item['answered_count'], item['marked_count']), (4, 1, 2))
+        self.assertEqual(item['progress_percentage'], 25)
+        selects = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT') and '"saved_quiz"' in q['sql']]
+        self.assertTrue(selects)
+        for sql in selects:
+            self.assertNotIn('"user_answers"', sql)
+            self.assertNotIn('"score"', sql)
+        # las preguntas (QuestionSet) no se leen para listar
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "question_set"' in q['sql']])
+
+
+@override_settings(WRITE_BEHIND_SYNC=False)
+class AccessTrackerTests(TestCase):
+
+    def setUp(self):
+        access_tracker.flush()
+        self.addCleanup(access_tracker.flush)  # nada pendiente para el hilo del buffer
+        self.quiz = SavedQuiz.objects.create(
+            title='t', topic='redes', difficulty='Media', types=['mcq'], counts={'mcq': 1}, questions=[_mcq(0)],
+        )
+        self.stored = SavedQuiz.objects.values_list('last_accessed', flat=True).get(pk=self.quiz.pk)
+
+    def last_accessed(self):
+        return SavedQuiz.objects.values_list('last_accessed', flat=True).get(pk=self.quiz.pk)
+
+    def test_detail_get_does_not_write(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(f'/api/saved-quizzes/{self.quiz.id}/', secure=True)
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')])
+        self.assertEqual(access_tracker.buffer.pending(), 1)
+        self.assertEqual(self.last_accessed(), self.stored)
+
+    def test_touches_of_one_quiz_merge_into_one_write(self):
+        later = self.stored + timedelta(minutes=5)
+        access_tracker.touch(self.quiz, at=self.stored + timedelta(minutes=1))
+        access_tracker.touch(self.quiz, at=later)
+        self.assertEqual(access_tracker.buffer.pending(), 1)
+        self.assertEqual(self.quiz.last_accessed, later)
+
+        self.assertEqual(access_tracker.flush(), 1)
+        self.assertEqual(self.last_accessed(), later)
+
+    def test_flush_never_moves_last_accessed_backwards(self):
+        access_tracker.touch(self.quiz, at=self.stored - timedelta(hours=1))
+        access_tracker.flush()
+        self.assertEqual(self.last_accessed(), self.stored)
+
+    def test_synchronous_mode_writes_immediately(self):
+        later = self.stored + timedelta(minutes=1)
+        with mock.patch.object(access_tracker, 'WRITE_BEHIND', False):
+            access_tracker.touch(self.quiz, at=later)
+        self.assertEqual(access_tracker.buffer.pending(), 0)
+        self.assertEqual(self.last_accessed(), later)
+
+
+class QuestionSetTests(TestCase):
+
+    def test_intern_is_content_addressed(self):
+        a = QuestionSet.intern([{'question': 'x', 'answer': 'A'}])
+        b = QuestionSet.intern([{'answer': 'A', 'question': 'x'}])
+        self.assertEqual(a, b)
+        self.assertEqual(QuestionSet.objects.count(), 1)
+        self.assertIsNone(QuestionSet.intern([]))
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(QuestionSet.intern([{'question': 'x', 'answer': 'A'}], known=a), a)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_load_returns_an_independent_copy(self):
+        digest = QuestionSet.intern([_mcq(0), _mcq(1)])
+        first = QuestionSet.load(digest)
+        first[0]['question'] = 'mutada'
+        self.assertEqual(QuestionSet.load(digest), [_mcq(0), _mcq(1)])
+
+    def test_session_and_saved_quiz_share_one_set(self):
+        questions = [_mcq(i) for i in range(3)]
+        session = GenerationSession.objects.create(topic='redes', difficulty='Media', types=['mcq'],
+                                                   counts={'mcq': 3}, latest_preview=questions)
+        quiz = SavedQuiz.objects.create(title='t', topic='redes', difficulty='Media', types=['mcq'],
+                                        counts={'mcq': 3}, questions=questions)
+        self.assertEqual(QuestionSet.objects.count(), 1)
+        self.assertEqual(session.question_set_id, quiz.question_set_id)
+
+        quiz = SavedQuiz.objects.get(pk=quiz.pk)
+        self.assertEqual(quiz.questions, questions)
+        quiz.questions[1] = _mcq(9)  # mutación en sitio: el hash se recalcula al guardar
+        quiz.save()
+        quiz.refresh_from_db()
+        self.assertNotEqual(quiz.question_set_id, session.question_set_id)
+        self.assertEqual(quiz.questions, [_mcq(0), _mcq(9), _mcq(2)])
+        self.assertEqual(GenerationSession.objects.get(pk=session.pk).latest_preview, questions)
+
+    def test_prune_only_removes_old_unreferenced_sets(self):
+        quiz = SavedQuiz.objects.create(title='t', topic='redes', difficulty='Media', types=['mcq'],
+                                        counts={'mcq': 1}, questions=[_mcq(0)])
+        orphan = QuestionSet.intern([_mcq(1)])
+        recent = QuestionSet.intern([_mcq(2)])
+        QuestionSet.objects.exclude(pk=recent).update(created_at=timezone.now() - timedelta(days=2))
+
+        out = io.StringIO()
+        call_command('prune_question_sets', '--dry-run', stdout=out)
+        self.assertIn('1 sets sin referencias', out.getvalue())
+
+        self.assertEqual(QuestionSet.prune(timezone.now() - timedelta(days=1)), 1)
+        self.assertEqual(set(QuestionSet.objects.values_list('digest', flat=True)),
+                         {quiz.question_set_id, recent})
+        self.assertFalse(QuestionSet.objects.filter(pk=orphan).exists())
+
+
+class SessionQuestionEditTests(TestCase):
+
+    def setUp(self):
+        self.session = GenerationSession.objects.create(
+            topic='redes', difficulty='Media', types=['mcq'], counts={'mcq': 3},
+            latest_preview=[_mcq(0), _mcq(1), _mcq(2)],
+        )
+
+    def preview(self):
+        return GenerationSession.objects.get(pk=self.session.pk).latest_preview
+
+    def test_insert_writes_one_row_between_neighbours(self):
+        self.session.insert_question(1, _mcq(7))  # materializa las filas
+        positions = dict(SessionQuestion.objects.filter(session=self.session).values_list('id', 'position'))
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.session.insert_question(1, _mcq(8)), 1)
+        sq_writes = [q['sql'] for q in ctx.captured_queries
+                     if 'session_question' in q['sql'] and not q['sql'].startswith('SELECT')]
+        self.assertEqual(len(sq_writes), 1)
+        self.assertTrue(sq_writes[0].startswith('INSERT'))
+
+        for row_id, position in positions.items():
+            self.assertEqual(SessionQuestion.objects.get(pk=row_id).position, position)
+        self.assertEqual(self.preview(), [_mcq(0), _mcq(8), _mcq(7), _mcq(1), _mcq(2)])
+        self.assertIsNone(GenerationSession.objects.get(pk=self.session.pk).question_set_id)
+
+    def test_renumbers_when_the_gap_runs_out(self):
+        expected = [_mcq(0), _mcq(1), _mcq(2)]
+        for n in range(12):  # 1024 -> sin hueco tras ~10 inserciones en el mismo sitio
+            self.session.insert_question(1, _mcq(100 + n))
+            expected.insert(1, _mcq(100 + n))
+        self.assertEqual(self.preview(), expected)
+        positions = list(SessionQuestion.objects.filter(session=self.session)
+                         .order_by('position').values_list('position', flat=True))
+        self.assertEqual(len(positions), len(expected))
+        self.assertTrue(all(b - a >= 2 for a, b in zip(positions, positions[1:])))
+
+    def test_duplicate_copies_after_the_original(self):
+        self.assertEqual(self.session.duplicate_question(0), 1)
+        preview = self.preview()
+        self.assertEqual(preview, [_mcq(0), _mcq(0), _mcq(1), _mcq(2)])
+
+        self.session.replace_question(1, {**_mcq(0), 'answer': 'A'})
+        self.assertEqual([q['answer'] for q in self.preview()[:2]], ['C', 'A'])
+
+        with self.assertRaises(IndexError):
+            self.session.duplicate_question(10)
+
+    def test_replace_bumps_only_that_row(self):
+        self.assertEqual(self.session.replace_question(2, _mcq(5)), 2)
+        self.assertEqual(self.session.replace_question(2, _mcq(6)), 3)
+        versions = list(SessionQuestion.objects.filter(session=self.session)
+                        .order_by('position').values_list('version', flat=True))
+        self.assertEqual(versions, [1, 1, 3])
+        self.assertEqual(self.preview(), [_mcq(0), _mcq(1), _mcq(6)])
+
+
+class OptimisticRetryTests(TestCase):
+
+    def setUp(self):
+        self.quiz = SavedQuiz.objects.create(
+            title='t', topic='redes', difficulty='Media', types=['mcq'], counts={'mcq': 2},
+            questions=[_mcq(0), _mcq(1)], user_answers={},
+        )
+        patcher = mock.patch.object(optimistic, 'RETRY_BACKOFF_S', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def conflict(self, current=2):
+        return optimistic.VersionConflict(self.quiz, 1, current)
+
+    def test_retry_repeats_until_success_or_attempts(self):
+        fn = mock.Mock(side_effect=[self.conflict(), self.conflict(), 'ok'])
+        self.assertEqual(optimistic.retry(fn, attempts=3), 'ok')
+        self.assertEqual(fn.call_count, 3)
+
+        fn = mock.Mock(side_effect=self.conflict())
+        with self.assertRaises(optimistic.VersionConflict):
+            optimistic.retry(fn, attempts=2)
+        self.assertEqual(fn.call_count, 2)
+
+    def test_retry_gives_up_when_the_row_is_gone(self):
+        fn = mock.Mock(side_effect=self.conflict(current=None))
+        with self.assertRaises(optimistic.VersionConflict):
+            optimistic.retry(fn, attempts=3)
+        self.assertEqual(fn.call_count, 1)
+
+    def test_modify_rereads_and_reapplies_after_a_concurrent_write(self):
+        calls = []
+
+        def answer(quiz):
+            if not calls:
+                # otra petición responde la pregunta 0 entre la lectura y el save
+                other = SavedQuiz.objects.get(pk=quiz.pk)
+                other.user_answers = {'0': 'A'}
+                other.save(update_fields=['user_answers'])
+            calls.append(quiz.version)
+            quiz.user_answers = {**quiz.user_answers, '1': 'B'}
+
+        saved = optimistic.modify(self.quiz, answer, update_fields=['user_answers'])
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(saved.version, 3)
+        self.quiz.refresh_from_db()
+        self.assertEqual((self.quiz.user_answers, self.quiz.answered_count), ({'0': 'A', '1': 'B'}, 2))
+
+    def test_modify_with_client_version_does_not_retry(self):
+        SavedQuiz.objects.filter(pk=self.quiz.pk).update(version=4)
+        mutate = mock.Mock()
+        with self.assertRaises(optimistic.VersionConflict) as cm:
+            optimistic.modify(self.quiz, mutate, update_fields=['title'], expected_version=1)
+        self.assertEqual(mutate.call_count, 1)
+        self.assertEqual((cm.exception.expected, cm.exception.current), (1, 4))
+
+    def test_claim_is_a_conditional_version_bump(self):
+        self.assertEqual(optimistic.claim(self.quiz), 2)
+        stale = SavedQuiz.objects.get(pk=self.quiz.pk)
+        stale.version = 1
+        with self.assertRaises(optimistic.VersionConflict):
+            optimistic.claim(stale)
+        self.assertEqual(SavedQuiz.objects.get(pk=self.quiz.pk).version, 2)
+
+    def test_confirm_replace_with_stale_version_is_409(self):
+        session = GenerationSession.objects.create(topic='redes', difficulty='Media', types=['mcq'],
+                                                   counts={'mcq': 2}, latest_preview=[_mcq(0), _mcq(1)])
+        url = '/api/confirm-replace/'
+        body = {'session_id': str(session.id), 'index': 0, 'question': _mcq(5), 'version': session.version}
+        resp = self.client.post(url, data=json.dumps(body), content_type='application/json', secure=True)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['version'], session.version + 1)
+
+        resp = self.client.post(url, data=json.dumps({**body, 'question': _mcq(6)}),
+                                content_type='application/json', secure=True)
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(resp.json()['current_version'], session.version + 1)
+        self.assertEqual(GenerationSession.objects.get(pk=session.pk).latest_preview, [_mcq(5), _mcq(1)])
+
+
+class ModerationParityTests(SimpleTestCase):
+    """El motor compilado debe dar exactamente lo mismo que el chequeo por patrón anterior."""
+
+    EDGE_CASES = [
+        '', '   ', 'ETC', 'etcétera', '¿Qué pasa con los datos... y luego?', 'Depende del caso',
+        'Los hombres  son', 'los   gatos son', 'Algunos los ordenan; los nodos son hojas',
+        'ballos son', 'xlos datos son', 'los datos sonoros', 'Las Mujeres Son',
+        'Eres un IDIOTA', 'idiotas', 'estúpidos', 'estupido', 'negro de **** y mierda',
+        'mejorar el código', 'el peor caso', 'más bonito', 'más  bonito', 'a veces; a veces',
+        'idiota etc mejor los x son', 'no hay respuesta correcta', 'podría ser cualquiera?',
+    ]
+
+    def test_categories_match_legacy_checks(self):
+        for text in self.EDGE_CASES:
+            with self.subTest(text=text):
+                found = moderation.engine.categories(text.strip().lower())
+                self.assertEqual('offensive' in found, bench_moderation._legacy_has_offense_or_stereotype(text))
+                self.assertEqual('ambiguous' in found, bench_moderation._legacy_is_ambiguous(text))
+                self.assertEqual('subjective' in found, bench_moderation._legacy_is_too_subjective(text))
+
+    def test_review_questions_match_legacy_on_fixed_sample(self):
+        questions = bench_moderation._synthetic_questions(2000, seed=7, marker_rate=0.5)
+        questions += [{'type': 'mcq', 'question': text, 'options': ['a', 'b', 'c', 'd'], 'answer': 'B'}
+                      for text in self.EDGE_CASES]
+        expected = [bench_moderation.legacy_review_question(q) for q in questions]
+        self.assertEqual(moderation.review_questions(questions), expected)
+        self.assertTrue(any(expected) and not all(expected))
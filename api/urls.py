@@ -2,14 +2,17 @@ from django.urls import path
 from rest_framework.routers import DefaultRouter
 from . import views
 from . import view_hint
-from .views_metrics import metrics_summary, metrics_export
+from .views_metrics import (
+    metrics_summary, metrics_export, llm_metrics_summary,
+    http_pool_metrics, provider_circuit_metrics,
+)
 from .voice_metrics_views import log_voice_event, voice_metrics_summary, voice_metrics_export, voice_metrics_events
 from .views_tts import voice_token, tts_synthesize
 from .views_stt import stt_recognize
 from .views_speech import speech_token
 from .views_saved_quizzes import (
     saved_quizzes, saved_quiz_detail, load_saved_quiz, quiz_statistics,
-    toggle_favorite_question, generate_review_quiz
+    toggle_favorite_question, generate_review_quiz, update_quiz_progress
 )
 from .views_intent_router import (
     intent_health,
@@ -22,6 +25,7 @@ from .suggestion_views import (
     suggestion_feedback,
 )
 from .views_ffmpeg_debug import ffmpeg_debug
+from .views_topics import suggest_topics
 
 router = DefaultRouter()
 
@@ -29,12 +33,17 @@ urlpatterns = [
     path("health/", views.health_check, name="health_check"),
     
     path("sessions/", views.sessions, name="sessions"),
+    path("topics/suggest/", suggest_topics, name="suggest_topics"),
     path("preview/", views.preview_questions, name="preview_questions"),
+    path("preview/stream/", views.preview_questions_stream, name="preview_questions_stream"),
     path("regenerate/", views.regenerate_question, name="regenerate_question"),
     path("confirm-replace/", views.confirm_replace, name="confirm_replace"),
      # nuevos (HU-11)
     path("metrics/", metrics_summary, name="metrics_summary"),
     path("metrics/export/", metrics_export, name="metrics_export"),
+    path("metrics/llm/", llm_metrics_summary, name="llm_metrics_summary"),
+    path("metrics/http-pool/", http_pool_metrics, name="http_pool_metrics"),
+    path("metrics/providers/", provider_circuit_metrics, name="provider_circuit_metrics"),
 
     # Voice metrics (QGAI-108)
     path("voice-metrics/log/", log_voice_event, name="log_voice_event"),
@@ -51,6 +60,7 @@ urlpatterns = [
     path("saved-quizzes/statistics/", quiz_statistics, name="quiz_statistics"),
     path("saved-quizzes/<uuid:quiz_id>/", saved_quiz_detail, name="saved_quiz_detail"),
     path("saved-quizzes/<uuid:quiz_id>/load/", load_saved_quiz, name="load_saved_quiz"),
+    path("saved-quizzes/<uuid:quiz_id>/progress/", update_quiz_progress, name="saved_quiz_progress"),
 
     path("saved-quizzes/<uuid:quiz_id>/toggle-mark/", toggle_favorite_question, name="saved_quiz_toggle_mark"),
 
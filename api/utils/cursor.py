@@ -0,0 +1,29 @@
+# api/utils/cursor.py
+import base64
+import json
+from datetime import datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values: dict) -> str:
+    """Cursor opaco (base64 url-safe de un JSON); las fechas van en ISO 8601."""
+    payload = {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in values.items()}
+    raw = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, datetime_keys=()) -> dict:
+    """Inverso de encode_cursor; lanza InvalidCursor si está mal formado."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, dict):
+            raise ValueError("cursor no es un objeto")
+        for key in datetime_keys:
+            values[key] = datetime.fromisoformat(values[key])
+        return values
+    except (ValueError, TypeError, KeyError, UnicodeError) as e:
+        raise InvalidCursor(f"cursor inválido: {e}") from e
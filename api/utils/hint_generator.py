@@ -1,16 +1,14 @@
 # api/utils/hint_generator.py
 import os, re
 from dotenv import load_dotenv
-import requests
-import google.generativeai as genai
+from ..services import http_client, gemini_registry, circuit_breaker, llm_telemetry
 
 load_dotenv()
 
 PPLX_API_KEY = os.getenv("PPLX_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-genai.configure(api_key=GEMINI_API_KEY)
-gemini_model = genai.GenerativeModel('gemini-2.5-flash')
+HINT_GEMINI_MODEL = 'gemini-2.5-flash'
 
 THINK_BLOCK_RE = re.compile(r"</?think\b[^>]*>", re.IGNORECASE)
 ANY_TAG_RE = re.compile(r"<[^>]+>")
@@ -39,7 +37,7 @@ def generate_hint_with_perplexity(question_text: str):
     # Usa modelo no-reasoning para evitar <think>
     model_name = os.getenv("PPLX_MODEL", "sonar-pro")
 
-    response = requests.post(
+    response = http_client.post(
         "https://api.perplexity.ai/chat/completions",
         headers={
             "Authorization": f"Bearer {PPLX_API_KEY}",
@@ -60,6 +58,9 @@ def generate_hint_with_perplexity(question_text: str):
     response.raise_for_status()
     data = response.json()
     raw = data.get("choices", [{}])[0].get("message", {}).get("content", "")
+    llm_telemetry.annotate_openai_usage(
+        data.get("usage"), prompt=_base_prompt(question_text), response=raw, model=model_name
+    )
     return clean_hint_text(raw)[:120]
 
 def generate_hint_with_gemini(question_text: str):
@@ -67,17 +68,21 @@ def generate_hint_with_gemini(question_text: str):
         raise ValueError("⚠️ Falta GEMINI_API_KEY")
 
     print(f"[Hint] Gemini para: {question_text[:50]}...")
-    response = gemini_model.generate_content(_base_prompt(question_text))
+    prompt = _base_prompt(question_text)
+    response = gemini_registry.get_model(HINT_GEMINI_MODEL).generate_content(prompt)
+    llm_telemetry.annotate_gemini(response, prompt=prompt, model=HINT_GEMINI_MODEL)
     raw = response.text if hasattr(response, "text") else str(response)
     return clean_hint_text(raw)[:120]
 
 def generate_hint(question_text: str) -> str:
     try:
-        return generate_hint_with_perplexity(question_text)
+        with llm_telemetry.track("perplexity", "hint"):
+            return circuit_breaker.call("perplexity", generate_hint_with_perplexity, question_text)
     except Exception as e1:
         print(f"[Hint] Error PPLX: {e1}. Probando Gemini…")
         try:
-            return generate_hint_with_gemini(question_text)
+            with llm_telemetry.track("gemini", "hint", fallback=True):
+                return circuit_breaker.call("gemini", generate_hint_with_gemini, question_text)
         except Exception as e2:
             print(f"[Hint] Error Gemini: {e2}")
             return "⚠️ No se pudo generar pista en este momento."
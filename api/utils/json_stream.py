@@ -0,0 +1,91 @@
+# api/utils/json_stream.py
+import json
+import re
+
+_QUESTIONS_KEY_RE = re.compile(r'"questions"\s*:\s*\[')
+
+
+class QuestionStreamParser:
+    """
+    Extrae objetos completos de la lista "questions" a medida que llega el
+    texto parcial de un LLM en streaming.
+
+    Acepta {"questions": [ {...}, {...} ]} (con o sin ```json) o un array suelto
+    [ {...}, ... ]. feed(chunk) devuelve los objetos que se completaron con ese
+    trozo; el texto ya escaneado no se vuelve a recorrer.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0            # siguiente carácter a escanear
+        self._in_array = False
+        self._done = False
+        self._depth = 0          # profundidad dentro del objeto actual
+        self._obj_start = None
+        self._in_str = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> list:
+        if self._done or not chunk:
+            return []
+        self._buf += chunk
+        if not self._in_array and not self._find_array():
+            return []
+
+        out = []
+        buf = self._buf
+        i = self._pos
+        n = len(buf)
+        while i < n:
+            ch = buf[i]
+            if self._in_str:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_str = False
+            elif ch == '"':
+                self._in_str = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._obj_start = i
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._obj_start is not None:
+                    try:
+                        obj = json.loads(buf[self._obj_start:i + 1])
+                        if isinstance(obj, dict):
+                            out.append(obj)
+                    except ValueError:
+                        pass
+                    self._obj_start = None
+            elif ch == "]" and self._depth == 0:
+                self._done = True
+                i += 1
+                break
+            i += 1
+
+        # Descartar lo ya consumido para no acumular el texto completo
+        keep_from = self._obj_start if self._obj_start is not None else i
+        self._buf = buf[keep_from:]
+        self._pos = i - keep_from
+        if self._obj_start is not None:
+            self._obj_start = 0
+        return out
+
+    def _find_array(self) -> bool:
+        m = _QUESTIONS_KEY_RE.search(self._buf)
+        if m:
+            start = m.end()
+        else:
+            # array suelto: el primer '[' aparece antes que cualquier '{'
+            lb, cb = self._buf.find("["), self._buf.find("{")
+            if lb == -1 or (cb != -1 and cb < lb):
+                return False
+            start = lb + 1
+        self._buf = self._buf[start:]
+        self._pos = 0
+        self._in_array = True
+        return True
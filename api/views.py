@@ -3,16 +3,32 @@ import os
 import json
 import re
 import uuid
+import time
+import threading
 from dotenv import load_dotenv
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework.decorators import api_view
 from rest_framework import status
 from django.utils import timezone
-import requests  # <— NUEVO
+from django.db.models import Q
 
 
 #import google.generativeai as genai
-from .models import GenerationSession, RegenerationLog
+from .models import GenerationSession, RegenerationLog, SessionFingerprint
+from .services.parallel import map_bounded, DeadlineExceeded
+from .services import llm_stats, http_client, optimistic
+from .services.llm_hedging import HEDGE_ENABLED, HEDGE_HEADER_ALLOWED, HedgeFailed, hedged_call
+from .services import gemini_registry, question_bank, circuit_breaker, llm_telemetry, question_fingerprints
+from .services.near_duplicates import NearDuplicateIndex, normalize as normalize_question
+from .services import taxonomy
+from .services.taxonomy import ALLOWED_TAXONOMY
+from .utils.json_stream import QuestionStreamParser
+# Moderación (HU-08): listas compiladas una vez en services/moderation;
+# se re-exportan porque otros módulos importan review_question desde views
+from .services.moderation import (
+    BAD_WORDS, STEREOTYPE_PATTERNS, AMBIG_MARKERS, SUBJECTIVE_MARKERS,
+    review_question, review_questions, moderation_severity,
+)
 
 load_dotenv()
 
@@ -47,11 +63,13 @@ def _extract_json(raw: str) -> dict:
     return json.loads(raw)
 
 
-def _configure_gemini():
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise RuntimeError("GEMINI_API_KEY not set")
-    genai.configure(api_key=api_key)
+class ShortBatchError(ValueError):
+    """El proveedor devolvió menos preguntas de las pedidas; `questions` trae las que sí llegaron."""
+
+    def __init__(self, questions, expected: int):
+        self.questions = list(questions or [])
+        self.expected = expected
+        super().__init__(f"Se esperaban {expected} preguntas y llegaron {len(self.questions)}")
 
 
 def _normalize_difficulty(diff: str) -> str:
@@ -66,7 +84,8 @@ def _normalize_difficulty(diff: str) -> str:
 PPLX_API = "https://api.perplexity.ai/chat/completions"
 PPLX_DEFAULT_MODEL = os.getenv("PPLX_MODEL", "llama-3.1-sonar-small-128k-chat")  # ajustable por .env
 
-def _pplx_call_json(prompt: str, max_tokens: int = 1200, temperature: float = 0.9) -> str:
+def _pplx_request(prompt: str, max_tokens: int, temperature: float, stream: bool = False):
+    """Cabeceras y body de chat/completions; devuelve (headers, body)."""
     api_key = os.getenv("PPLX_API_KEY")
     if not api_key:
         raise RuntimeError("PPLX_API_KEY not set")
@@ -90,7 +109,14 @@ def _pplx_call_json(prompt: str, max_tokens: int = 1200, temperature: float = 0.
             {"role": "user", "content": prompt},
         ],
     }
-    r = requests.post(PPLX_API, headers=headers, json=body, timeout=60)
+    if stream:
+        body["stream"] = True
+    return headers, body
+
+
+def _pplx_call_json(prompt: str, max_tokens: int = 1200, temperature: float = 0.9) -> str:
+    headers, body = _pplx_request(prompt, max_tokens, temperature)
+    r = http_client.post(PPLX_API, headers=headers, json=body, timeout=60)
     if r.status_code != 200:
         # propagar texto de error, útil para detectar 'no credits'
         raise RuntimeError(f"pplx_http_{r.status_code}: {r.text}")
@@ -101,96 +127,36 @@ def _pplx_call_json(prompt: str, max_tokens: int = 1200, temperature: float = 0.
     except Exception:
         raise RuntimeError("pplx_invalid_response")
 
+    llm_telemetry.annotate_openai_usage(
+        data.get("usage"), prompt=prompt, response=content, model=body["model"]
+    )
     return content  # cadena con JSON (según prompt)
 
 
+def _pplx_stream_text(prompt: str, max_tokens: int = 1200, temperature: float = 0.9):
+    """Igual que _pplx_call_json pero en streaming (SSE): genera los trozos de texto."""
+    headers, body = _pplx_request(prompt, max_tokens, temperature, stream=True)
+    r = http_client.post(PPLX_API, headers=headers, json=body, timeout=60, stream=True)
+    llm_telemetry.annotate(prompt=prompt, model=body["model"])
+    try:
+        if r.status_code != 200:
+            raise RuntimeError(f"pplx_http_{r.status_code}: {r.text}")
+        for line in r.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            payload = line[5:].strip()
+            if payload == "[DONE]":
+                break
+            try:
+                delta = json.loads(payload)["choices"][0].get("delta", {}).get("content")
+            except Exception:
+                raise RuntimeError("pplx_invalid_response")
+            if delta:
+                llm_telemetry.annotate(response=delta)
+                yield delta
+    finally:
+        r.close()
 
-# =========================================================
-# Moderación / Calidad (HU-08 simple)
-# =========================================================
-
-BAD_WORDS = {
-    "idiota","estúpido","imbécil","tarado","mierda","maldito","pendejo","marica","negro de ****",
-}
-STEREOTYPE_PATTERNS = [
-    r"\blas\s+mujeres\s+son\b",
-    r"\blos\s+hombres\s+son\b",
-    r"\blos\s+\w+\s+son\b",
-]
-AMBIG_MARKERS = [
-    "etc.", "etc", "...", "depende", "generalmente", "a veces", "comúnmente",
-    "de manera subjetiva", "podría ser cualquiera", "no hay respuesta correcta",
-]
-SUBJECTIVE_MARKERS = ["mejor", "peor", "más bonito", "más feo"]
-
-def _norm_txt(s: str) -> str:
-    return (s or "").strip().lower()
-
-def _has_offense_or_stereotype(text: str) -> bool:
-    t = _norm_txt(text)
-    if any(bw in t for bw in BAD_WORDS):
-        return True
-    return any(re.search(pat, t) for pat in STEREOTYPE_PATTERNS)
-
-def _is_ambiguous(text: str) -> bool:
-    t = _norm_txt(text)
-    return any(marker in t for marker in AMBIG_MARKERS)
-
-def _is_too_subjective(text: str) -> bool:
-    t = _norm_txt(text)
-    return any(w in t for w in SUBJECTIVE_MARKERS)
-
-def _mcq_has_issues(options) -> bool:
-    if not isinstance(options, list) or len(options) != 4:
-        return True
-    cleaned = [(_norm_txt(o) or "") for o in options]
-    if any(not c for c in cleaned):
-        return True
-    if len(set(cleaned)) < 4:
-        return True
-    return False
-
-def review_question(q: dict) -> list:
-    """
-    Devuelve lista de issues: 
-    ["offensive_or_stereotype","ambiguous","subjective","mcq_invalid","vf_invalid","too_long"]
-    Si lista vacía => OK.
-    """
-    issues = []
-    qtype = (q.get("type") or "").lower()
-    question = q.get("question") or ""
-
-    if _has_offense_or_stereotype(question):
-        issues.append("offensive_or_stereotype")
-    if _is_ambiguous(question):
-        issues.append("ambiguous")
-    if _is_too_subjective(question):
-        issues.append("subjective")
-
-    if qtype == "mcq":
-        if _mcq_has_issues(q.get("options")):
-            issues.append("mcq_invalid")
-        ans = str(q.get("answer","")).strip().upper()[:1]
-        if ans not in ("A","B","C","D"):
-            issues.append("mcq_invalid")
-
-    if qtype == "vf":
-        ans = str(q.get("answer","")).strip().capitalize()
-        if ans not in ("Verdadero","Falso"):
-            issues.append("vf_invalid")
-
-    if len(question) > 300:
-        issues.append("too_long")
-
-    return issues
-
-def moderation_severity(issues: list) -> str:
-    """'severe' si hay ofensa/estereotipo; 'minor' para el resto; '' si vacío."""
-    if not issues:
-        return ""
-    if "offensive_or_stereotype" in issues:
-        return "severe"
-    return "minor"
 
 
 # =========================================================
@@ -198,23 +164,23 @@ def moderation_severity(issues: list) -> str:
 # =========================================================
 
 def _norm_for_cmp(s: str) -> str:
-    return re.sub(r"[\W_]+", " ", (s or "").lower()).strip()
-
-def build_seen_set(session: GenerationSession, index: int = None) -> set:
-    seen = set()
-    if isinstance(session.latest_preview, list):
-        for q in session.latest_preview:
-            if isinstance(q, dict):
-                seen.add(_norm_for_cmp(q.get("question", "")))
+    return normalize_question(s)
+
+def build_seen_set(session: GenerationSession, index: int = None) -> NearDuplicateIndex:
+    """
+    Enunciados ya vistos en la sesión; `in` detecta también paráfrasis cercanas.
+    Sale de SessionFingerprint (mantenida al guardar el preview y los logs):
+    el preview completo más lo regenerado en `index` (o en todos si es None),
+    con una sola consulta indexada.
+    """
+    rows = SessionFingerprint.objects.filter(session_id=session.pk)
+    if index is not None:
+        rows = rows.filter(Q(kind=SessionFingerprint.PREVIEW) | Q(index=index))
     try:
-        logs = session.regens.all().order_by("-id")[:50]
-        for lg in logs:
-            if index is None or lg.index == index:
-                seen.add(_norm_for_cmp((lg.old_question or {}).get("question", "")))
-                seen.add(_norm_for_cmp((lg.new_question or {}).get("question", "")))
+        norms = list(rows.order_by("kind", "index", "-id").values_list("norm", flat=True))
     except Exception:
-        pass
-    return {s for s in seen if s}
+        norms = []
+    return NearDuplicateIndex(norms)
 
 
 # =========================================================
@@ -222,13 +188,20 @@ def build_seen_set(session: GenerationSession, index: int = None) -> set:
 # =========================================================
 
 
-def generate_questions_with_pplx(topic, difficulty, types, counts):
-    total = sum(int(counts.get(t, 0)) for t in types)
+def _global_avoid_clause(global_avoid) -> str:
+    """Bloque de prompt con enunciados ya servidos a otros usuarios (índice global)."""
+    if not global_avoid:
+        return ""
+    bullets = "\n".join(f"- {p}" for p in list(global_avoid)[:question_fingerprints.GLOBAL_AVOID_PROMPT_K])
+    return f"No repitas preguntas ya usadas en otros cuestionarios de este tema, como:\n{bullets}\n"
+
 
+def _pplx_questions_prompt(topic, difficulty, total, counts, global_avoid=None) -> str:
     schema_hint = json.dumps(_json_schema_questions(), ensure_ascii=False)
-    prompt = f"""
+    return f"""
 Genera exactamente {total} preguntas sobre "{topic}" en nivel {difficulty}.
 Distribución por tipo (counts): {json.dumps(counts, ensure_ascii=False)}.
+{_global_avoid_clause(global_avoid)}
 
 Política de calidad (OBLIGATORIA):
 - Sin sesgos ni estereotipos.
@@ -242,6 +215,11 @@ Política de calidad (OBLIGATORIA):
 Devuelve SOLO un JSON que cumpla con este schema:
 {schema_hint}
 """
+
+
+def generate_questions_with_pplx(topic, difficulty, types, counts, global_avoid=None):
+    total = sum(int(counts.get(t, 0)) for t in types)
+    prompt = _pplx_questions_prompt(topic, difficulty, total, counts, global_avoid)
     raw = _pplx_call_json(prompt, temperature=0.9, max_tokens=1800)
     data = _extract_json(raw)
 
@@ -251,14 +229,14 @@ Devuelve SOLO un JSON que cumpla con este schema:
     expected = total
     got = len(data["questions"])
     if got < expected:
-        raise ValueError(f"Se esperaban {expected} preguntas y llegaron {got}")
+        raise ShortBatchError(data["questions"], expected)
     if got > expected:
         data["questions"] = data["questions"][:expected]
 
     return data["questions"]
 
 
-def regenerate_question_with_pplx(topic, difficulty, qtype, base_question=None, avoid_phrases=None):
+def regenerate_question_with_pplx(topic, difficulty, qtype, base_question=None, avoid_phrases=None, global_avoid=None):
     schema_hint = json.dumps(_json_schema_one(), ensure_ascii=False)
     if qtype not in ("mcq", "vf", "short"):
         qtype = "mcq"
@@ -281,6 +259,7 @@ def regenerate_question_with_pplx(topic, difficulty, qtype, base_question=None,
     if avoid_phrases:
         bullets = "\n".join(f"- {p}" for p in list(avoid_phrases)[:8])
         avoid_txt = f"Evita enunciados similares a:\n{bullets}\n"
+    avoid_txt += _global_avoid_clause(global_avoid)
 
     rules = """
 Reglas de calidad:
@@ -329,28 +308,6 @@ Schema:
 
 
 
-def _get_genai():
-    """
-    Import tardío para evitar que Azure cargue primero /agents/python y rompa typing_extensions.
-    Si falla la importación, elevamos un RuntimeError 'genai_unavailable' que se maneja como 503.
-    """
-    try:
-        import google.generativeai as genai  # import perezoso
-        return genai
-    except Exception as e:
-        raise RuntimeError(f"genai_unavailable: {e}")
-
-def _configure_gemini():
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise RuntimeError("GEMINI_API_KEY not set")
-    genai = _get_genai()
-    genai.configure(api_key=api_key)
-    return genai
-
-
-
-
 # Modelo con free tier generoso y buen rendimiento.
 GEMINI_MODEL = "gemini-2.5-flash"
 
@@ -389,16 +346,11 @@ def _json_schema_one():
         }
     }
 
-def generate_questions_with_gemini(topic, difficulty, types, counts):
-    # Configurar e importar aquí (perezoso)
-    genai = _configure_gemini()
-
-    total = sum(int(counts.get(t, 0)) for t in types)
-    schema = _json_schema_questions()
-
-    prompt = f"""
+def _gemini_questions_prompt(topic, difficulty, total, counts, global_avoid=None) -> str:
+    return f"""
 Genera exactamente {total} preguntas sobre "{topic}" en nivel {difficulty}.
 Distribución por tipo (counts): {json.dumps(counts, ensure_ascii=False)}.
+{_global_avoid_clause(global_avoid)}
 
 Política de calidad (OBLIGATORIA):
 - Sin sesgos ni estereotipos (no generalizaciones sobre grupos).
@@ -412,17 +364,20 @@ Política de calidad (OBLIGATORIA):
 Devuelve ÚNICAMENTE un JSON que cumpla con el schema dado.
 """
 
-    model = genai.GenerativeModel(
-        GEMINI_MODEL,
-        generation_config=genai.GenerationConfig(
-            response_mime_type="application/json",
-            response_schema=schema,
-            temperature=0.9,
-            top_p=0.95,
-            top_k=64,
-        )
+
+def _gemini_questions_model():
+    return gemini_registry.get_model(
+        GEMINI_MODEL, schema=_json_schema_questions(), temperature=0.9, top_p=0.95, top_k=64
     )
-    resp = model.generate_content(prompt)
+
+
+def generate_questions_with_gemini(topic, difficulty, types, counts, global_avoid=None):
+    total = sum(int(counts.get(t, 0)) for t in types)
+    prompt = _gemini_questions_prompt(topic, difficulty, total, counts, global_avoid)
+
+    # Modelo compartido (import/configuración perezosos en el registro)
+    resp = _gemini_questions_model().generate_content(prompt)
+    llm_telemetry.annotate_gemini(resp, prompt=prompt, model=GEMINI_MODEL)
     raw = (resp.text or "").strip()
     data = json.loads(raw)
 
@@ -432,21 +387,45 @@ Devuelve ÚNICAMENTE un JSON que cumpla con el schema dado.
     expected = total
     got = len(data["questions"])
     if got < expected:
-        raise ValueError(f"Se esperaban {expected} preguntas y llegaron {got}")
+        raise ShortBatchError(data["questions"], expected)
     if got > expected:
         data["questions"] = data["questions"][:expected]
 
     return data["questions"]
 
 
-def regenerate_question_with_gemini(topic, difficulty, qtype, base_question=None, avoid_phrases=None):
+def stream_questions(provider, topic, difficulty, counts, global_avoid=None):
+    """
+    Genera preguntas en modo streaming y las va devolviendo (yield) en cuanto
+    el proveedor termina de escribir cada objeto de la lista "questions".
+    No valida el total: el caller lleva la cuenta por tipo.
+    """
+    total = sum(int(counts.get(t, 0)) for t in counts)
+    parser = QuestionStreamParser()
+    if provider == "gemini":
+        prompt = _gemini_questions_prompt(topic, difficulty, total, counts, global_avoid)
+        llm_telemetry.annotate(prompt=prompt, model=GEMINI_MODEL)
+        chunks = (
+            getattr(c, "text", "") or ""
+            for c in _gemini_questions_model().generate_content(prompt, stream=True)
+        )
+    else:
+        prompt = _pplx_questions_prompt(topic, difficulty, total, counts, global_avoid)
+        chunks = _pplx_stream_text(prompt, temperature=0.9, max_tokens=1800)
+
+    for chunk in chunks:
+        if provider == "gemini":
+            llm_telemetry.annotate(response=chunk)
+        for q in parser.feed(chunk):
+            yield q
+
+
+def regenerate_question_with_gemini(topic, difficulty, qtype, base_question=None, avoid_phrases=None, global_avoid=None):
     """
     Genera UNA variante, manteniendo tema/dificultad/tipo.
     - avoid_phrases: set/list de enunciados normalizados a evitar (anti-repetición).
+    - global_avoid: enunciados ya servidos en otras sesiones (question_fingerprints).
     """
-    # Configurar e importar aquí (perezoso)
-    genai = _configure_gemini()
-
     schema = _json_schema_one()
     if qtype not in ("mcq", "vf", "short"):
         qtype = "mcq"
@@ -470,6 +449,7 @@ def regenerate_question_with_gemini(topic, difficulty, qtype, base_question=None
     if avoid_phrases:
         bullets = "\n".join(f"- {p}" for p in list(avoid_phrases)[:8])
         avoid_txt = f"Evita formular enunciados similares a los siguientes:\n{bullets}\n"
+    avoid_txt += _global_avoid_clause(global_avoid)
 
     rules = """
 Reglas de calidad:
@@ -490,17 +470,11 @@ Genera 1 pregunta de tipo "{qtype}" sobre "{topic}" en nivel {difficulty}.
 {rules}
 """
 
-    model = genai.GenerativeModel(
-        GEMINI_MODEL,
-        generation_config=genai.GenerationConfig(
-            response_mime_type="application/json",
-            response_schema=schema,
-            temperature=0.95,
-            top_p=0.95,
-            top_k=64,
-        )
+    model = gemini_registry.get_model(
+        GEMINI_MODEL, schema=schema, temperature=0.95, top_p=0.95, top_k=64
     )
     resp = model.generate_content(prompt)
+    llm_telemetry.annotate_gemini(resp, prompt=prompt, model=GEMINI_MODEL)
     raw = (resp.text or "").strip()
     data = json.loads(raw)
 
@@ -525,28 +499,48 @@ Genera 1 pregunta de tipo "{qtype}" sobre "{topic}" en nivel {difficulty}.
 
 
 
-def _generate_with_fallback(topic, difficulty, types, counts, preferred: str):
+def _run_with_fallback(preferred: str, call, operation: str, hedge=None, report=None, cancel=None):
     """
-    Devuelve (questions, provider_used, fallback_used, errors_map)
-    Si ambos fallan por créditos -> levanta RuntimeError('no_providers_available')
+    Ejecuta call(provider) con el proveedor preferido y, si falla, con el otro.
+    Si `cancel` (threading.Event) está activado no se hace ninguna llamada más:
+    cada proveedor pendiente falla con DeadlineExceeded sin tocar el circuit breaker.
+    Con hedge=True (o LLM_HEDGING=1 si hedge es None) el secundario se lanza en
+    paralelo cuando el primario supera su umbral de latencia (ver llm_hedging).
+    Si se pasa `report` (dict) se rellena con el detalle del hedging.
+    Devuelve (resultado, provider_used, fallback_used, errors_map)
     """
     order = [preferred, "gemini" if preferred == "perplexity" else "perplexity"]
     errors = {}
     fallback_used = False
+    if hedge is None:
+        hedge = HEDGE_ENABLED
+
+    def guarded(prov):
+        if cancel is not None and cancel.is_set():
+            raise DeadlineExceeded("cancelled")
+        # Circuito abierto -> CircuitOpen inmediato y se pasa al otro proveedor sin llamar
+        with llm_telemetry.track(prov, operation, fallback=prov != order[0]):
+            return circuit_breaker.call(prov, call, prov)
 
-    for i, prov in enumerate(order):
+    if hedge:
         try:
-            if prov == "gemini":
-                qs = generate_questions_with_gemini(topic, difficulty, types, counts)
-            else:
-                qs = generate_questions_with_pplx(topic, difficulty, types, counts)
-            return qs, prov, fallback_used, errors
-        except Exception as e:
-            msg = str(e)
-            errors[prov] = {"message": msg, "no_credits": _is_no_credits_msg(msg)}
-            if i == 0:
-                fallback_used = True
-            continue
+            result, prov, excs, rep = hedged_call(order[0], order[1], guarded, operation)
+            errors = {p: _provider_error(e) for p, e in excs.items()}
+            if report is not None:
+                report.update(rep)
+            return result, prov, prov != order[0], errors
+        except HedgeFailed as e:
+            errors = {p: _provider_error(x) for p, x in e.errors.items()}
+    else:
+        for i, prov in enumerate(order):
+            try:
+                result = llm_stats.timed(prov, operation, guarded, prov)
+                return result, prov, fallback_used, errors
+            except Exception as e:
+                errors[prov] = _provider_error(e)
+                if i == 0:
+                    fallback_used = True
+                continue
 
     # Ambos fallaron:
     if errors.get(order[0], {}).get("no_credits") and errors.get(order[1], {}).get("no_credits"):
@@ -555,72 +549,211 @@ def _generate_with_fallback(topic, difficulty, types, counts, preferred: str):
     raise RuntimeError(f"providers_failed: {errors}")
 
 
-def _regenerate_with_fallback(topic, difficulty, qtype, base_q, avoid_phrases, preferred: str):
+def _provider_error(exc) -> dict:
+    msg = str(exc)
+    return {"message": msg, "no_credits": _is_no_credits_msg(msg)}
+
+
+LLM_TOPUP_MAX_ROUNDS = int(os.getenv("LLM_TOPUP_MAX_ROUNDS", "2"))
+
+
+def _question_shape_ok(q, types) -> bool:
+    """Forma mínima de una pregunta del proveedor (lote o stream): dict, tipo pedido y enunciado."""
+    return (
+        isinstance(q, dict)
+        and q.get("type") in types
+        and isinstance(q.get("question"), str)
+        and bool(_norm_for_cmp(q["question"]))
+    )
+
+
+def _fill_by_type(questions, types, counts):
     """
-    Devuelve (question, provider_used, fallback_used, errors_map)
+    Se queda con hasta counts[t] preguntas por tipo (sin enunciados repetidos),
+    agrupadas en el orden de `types`. Devuelve (preguntas, faltantes {tipo: n}).
     """
-    order = [preferred, "gemini" if preferred == "perplexity" else "perplexity"]
-    errors = {}
-    fallback_used = False
+    buckets = {t: [] for t in types}
+    norms = set()
+    for q in questions:
+        if not _question_shape_ok(q, buckets):
+            continue
+        bucket = buckets[q["type"]]
+        norm = _norm_for_cmp(q["question"])
+        if norm in norms:
+            continue
+        if len(bucket) < int(counts.get(q["type"], 0)):
+            bucket.append(q)
+            norms.add(norm)
+    missing = {t: int(counts.get(t, 0)) - len(buckets[t]) for t in types}
+    return [q for t in types for q in buckets[t]], {t: n for t, n in missing.items() if n > 0}
 
-    for i, prov in enumerate(order):
-        try:
-            if prov == "gemini":
-                q = regenerate_question_with_gemini(topic, difficulty, qtype, base_q, avoid_phrases)
+
+def _generate_with_fallback(topic, difficulty, types, counts, preferred: str, hedge=None, report=None,
+                            global_avoid=None):
+    """
+    Devuelve (questions, provider_used, fallback_used, errors_map)
+    Si ambos fallan por créditos -> levanta RuntimeError('no_providers_available')
+
+    Un lote corto no se descarta: se conservan las preguntas válidas y se piden
+    sólo las que faltan por tipo (hasta LLM_TOPUP_MAX_ROUNDS veces al mismo
+    proveedor). Si aun así falta alguna, el siguiente proveedor parte de lo ya
+    obtenido en lugar de regenerar las N.
+
+    Con hedging los dos intentos corren a la vez: cada uno trabaja sobre su
+    propia copia y sólo se devuelve la lista del ganador; `carry` (bajo lock)
+    guarda el mejor parcial de los intentos fallidos para el siguiente.
+    """
+    carry = []
+    carry_lock = threading.Lock()
+
+    def _keep_partial(got):
+        with carry_lock:
+            if len(got) > len(carry):
+                carry[:] = got
+
+    def _generate(prov, need_types, need_counts):
+        if prov == "gemini":
+            return generate_questions_with_gemini(topic, difficulty, need_types, need_counts, global_avoid)
+        return generate_questions_with_pplx(topic, difficulty, need_types, need_counts, global_avoid)
+
+    def _call(prov):
+        with carry_lock:
+            start = list(carry)
+        got, missing = _fill_by_type(start, types, counts)
+        rounds = 0
+        while True:
+            partial = bool(got)
+            if partial:
+                if rounds >= LLM_TOPUP_MAX_ROUNDS:
+                    _keep_partial(got)
+                    raise ShortBatchError(got, sum(int(counts.get(t, 0)) for t in types))
+                rounds += 1
+                llm_stats.incr("topup")
+                llm_stats.incr("topup_questions", sum(missing.values()))
+                need_types, need_counts = list(missing), missing
             else:
-                q = regenerate_question_with_pplx(topic, difficulty, qtype, base_q, avoid_phrases)
-            return q, prov, fallback_used, errors
-        except Exception as e:
-            msg = str(e)
-            errors[prov] = {"message": msg, "no_credits": _is_no_credits_msg(msg)}
-            if i == 0:
-                fallback_used = True
-            continue
+                need_types, need_counts = types, counts
+            try:
+                batch = _generate(prov, need_types, need_counts)
+            except ShortBatchError as e:
+                batch = e.questions
+            except Exception:
+                # p. ej. sin créditos a mitad del top-up: el siguiente proveedor
+                # parte de lo ya obtenido
+                _keep_partial(got)
+                raise
+            got, missing = _fill_by_type(got + batch, types, counts)
+            if not missing:
+                return got
+            if not got:
+                raise ShortBatchError(got, sum(int(counts.get(t, 0)) for t in types))
+
+    return _run_with_fallback(preferred, _call, "generate", hedge=hedge, report=report)
+
+
+def _regenerate_with_fallback(topic, difficulty, qtype, base_q, avoid_phrases, preferred: str, hedge=None, report=None,
+                              global_avoid=None, cancel=None):
+    """
+    Devuelve (question, provider_used, fallback_used, errors_map)
+    """
+    def _call(prov):
+        if prov == "gemini":
+            return regenerate_question_with_gemini(topic, difficulty, qtype, base_q, avoid_phrases, global_avoid)
+        return regenerate_question_with_pplx(topic, difficulty, qtype, base_q, avoid_phrases, global_avoid)
 
-    if errors.get(order[0], {}).get("no_credits") and errors.get(order[1], {}).get("no_credits"):
-        raise RuntimeError("no_providers_available")
-    raise RuntimeError(f"providers_failed: {errors}")
+    return _run_with_fallback(preferred, _call, "regenerate", hedge=hedge, report=report, cancel=cancel)
+
+# =========================================================
+# Reparación concurrente del preview (moderación)
+# =========================================================
+
+PREVIEW_REPAIR_MAX_WORKERS = int(os.getenv("PREVIEW_REPAIR_MAX_WORKERS", "4"))
+PREVIEW_REPAIR_DEADLINE_S = float(os.getenv("PREVIEW_REPAIR_DEADLINE_S", "25"))
+
+
+def _moderation_placeholder(topic: str, qtype: str, severe_retry_failed: bool) -> dict:
+    """Pregunta segura de reemplazo cuando no hay variante aceptable (HU-08)."""
+    if severe_retry_failed:
+        question = f"[{topic}] Pregunta ajustada por moderación — describe el concepto con claridad."
+        options = ["A) Definición correcta","B) Distractor 1","C) Distractor 2","D) Distractor 3"]
+    else:
+        question = f"[{topic}] Pregunta ajustada por moderación — redacta con claridad."
+        options = ["A) Opción 1","B) Opción 2","C) Opción 3","D) Opción 4"]
+    return {
+        "type": qtype,
+        "question": question,
+        "options": options if qtype == "mcq" else None,
+        "answer": "A" if qtype == "mcq" else ("Verdadero" if qtype == "vf" else "Respuesta breve"),
+        "explanation": "Ajuste automático por reglas de calidad (HU-08)."
+    }
+
+
+def _repair_flagged_questions(flagged, slots, seen, topic, difficulty, provider):
+    """
+    Regenera en paralelo las preguntas marcadas por moderación/duplicado.
+
+    - flagged: lista de (index, pregunta, severidad)
+    - slots: lista del preview; se rellena slots[index] con el reemplazo
+    - seen: enunciados normalizados ya aceptados; se actualiza en orden de índice
+
+    Diferencias con el flujo secuencial anterior (una reparación tras otra):
+    - Todas las variantes se piden a la vez (como máximo PREVIEW_REPAIR_MAX_WORKERS)
+      evitando el mismo `seen` de partida (en el preview síncrono, el de las
+      preguntas limpias de todo el lote), no el de las anteriores a cada índice
+      más las ya reparadas.
+    - Al recogerlas se aplican en orden de índice y una variante cuyo enunciado
+      ya está en `seen` (p. ej. igual a otra reparada antes) se descarta como si
+      el proveedor hubiera fallado; antes se aceptaba.
+    - Por eso los reemplazos entran en `seen` después de esas preguntas limpias.
+    Lo que no termina antes de PREVIEW_REPAIR_DEADLINE_S cae al mismo reemplazo
+    que un error del proveedor; esas tareas quedan canceladas y no hacen más
+    llamadas al proveedor (la que ya esté en curso no se puede cortar).
+    """
+    avoid = frozenset(seen)
+    cancel = threading.Event()
+
+    def _fix(job):
+        _, q, _ = job
+        return _regenerate_with_fallback(topic, difficulty, q.get("type","mcq"), q, avoid, provider,
+                                         cancel=cancel)[0]
+
+    try:
+        results = map_bounded(
+            _fix, flagged,
+            max_workers=PREVIEW_REPAIR_MAX_WORKERS,
+            deadline_s=PREVIEW_REPAIR_DEADLINE_S,
+        )
+    finally:
+        cancel.set()
+
+    timed_out = 0
+    for (i, q, sev), (ok, fixed) in zip(flagged, results):
+        if not ok and isinstance(fixed, DeadlineExceeded):
+            timed_out += 1
+        usable = (
+            ok
+            and moderation_severity(review_question(fixed)) != "severe"
+            and _norm_for_cmp(fixed.get("question","")) not in seen
+        )
+
+        if usable:
+            candidate = fixed
+        elif sev == "severe":
+            candidate = _moderation_placeholder(topic, q.get("type","mcq"), severe_retry_failed=ok)
+        else:
+            candidate = q
+
+        slots[i] = candidate
+        seen.add(_norm_for_cmp(candidate.get("question","")))
+
+    return {"attempted": len(flagged), "timed_out": timed_out}
 
 
 # =========================================================
 # Taxonomía / Dominio (HU-06)
 # =========================================================
 
-ALLOWED_TAXONOMY = [
-    "algoritmos", "estructura de datos", "complejidad computacional", "np-completitud",
-    "teoría de la computación", "autómatas y gramáticas", "compiladores", "intérpretes",
-    "lenguajes de programación", "sistemas de tipos", "verificación formal", "model checking",
-    "programación orientada a objetos", "patrones de diseño", "programación funcional",
-    "metodologías ágiles", "scrum", "kanban", "devops", "sre", "observabilidad",
-    "logging", "monitoring", "tracing", "apm", "optimización de rendimiento", "profiling",
-    "cachés", "cdn", "sistemas operativos", "gestión de memoria", "concurrencia",
-    "paralelismo", "hilos", "procesos", "bloqueos y semáforos", "sistemas distribuidos",
-    "consenso", "microservicios", "arquitectura hexagonal", "ddd", "event sourcing",
-    "mensajería asíncrona", "kafka", "rabbitmq", "mqtt", "rest", "graphql", "grpc",
-    "redes de computadores", "tcp/ip", "enrutamiento", "dns", "http/2", "http/3", "quic",
-    "seguridad informática", "owasp", "criptografía", "pki", "ssl/tls", "iam",
-    "seguridad en redes", "seguridad web", "pentesting", "forense digital",
-    "bases de datos", "modelado relacional", "normalización", "transacciones",
-    "aislamiento y concurrencia", "sql", "pl/sql", "postgresql", "mysql", "sqlite",
-    "mariadb", "nosql", "mongodb", "redis", "elasticsearch", "data warehousing",
-    "etl", "elt", "data lakes", "big data", "hadoop", "spark", "procesamiento en stream",
-    "procesamiento batch", "ingeniería de datos", "mlops", "machine learning",
-    "deep learning", "nlp", "computer vision", "reinforcement learning",
-    "transformers", "embeddings", "llms", "prompt engineering", "evaluación de llms",
-    "edge ai", "federated learning", "differential privacy", "autoML", "explicabilidad (xai)",
-    "estadística", "probabilidad", "álgebra lineal", "cálculo", "matemática discreta",
-    "optimización", "investigación de operaciones", "series de tiempo",
-    "arquitectura de software", "requisitos de software", "uml", "pruebas unitarias",
-    "pruebas de integración", "tdd", "ci/cd", "contenedores", "docker", "kubernetes",
-    "serverless", "nubes públicas", "aws", "azure", "gcp", "iac (terraform)", "ansible",
-    "backend", "frontend", "fullstack", "html", "css", "javascript",
-    "typescript", "react", "next.js", "vue", "angular", "svelte", "node.js", "deno",
-    "python", "java", "c", "c++", "c#", "go", "rust", "php", "ruby", "swift", "kotlin", "r",
-    "matlab", "apis", "sockets", "iot", "sistemas embebidos", "esp32", "arduino", "robótica",
-    "gráficos por computador", "opengl", "unity", "unreal", "ar/vr", "hci", "accesibilidad",
-    "ux/ui", "bioinformática", "gis", "fintech", "e-commerce", "blockchain",
-    "contratos inteligentes", "zk-proofs", "escalado blockchain", "privacidad", "etica en ia"
-]
+# ALLOWED_TAXONOMY y el matcher indexado viven en services/taxonomy
 
 MAX_TOTAL_QUESTIONS = 20
 MAX_PER_TYPE = 20
@@ -629,11 +762,9 @@ def normalize_topic(t):
     return (t or "").strip().lower()
 
 def find_category_for_topic(topic):
-    t = normalize_topic(topic)
-    for cat in ALLOWED_TAXONOMY:
-        if cat in t or t in cat:
-            return cat
-    return None
+    """Mejor categoría de la taxonomía para el tema (sin tildes/puntuación), o None."""
+    found = taxonomy.matcher.best(topic)
+    return found.category if found else None
 
 
 # ---------------------------
@@ -650,13 +781,25 @@ def _header_provider(request) -> str:
     # por defecto, lo que tengas como preferido
     return "perplexity"
 
+def _header_hedge(request):
+    """
+    X-LLM-Hedge: 1 activa el hedging para esta petición; 0 lo desactiva.
+    Sólo con LLM_HEDGE_HEADER_ALLOWED=1 (cualquier cliente podría duplicar el
+    gasto); si no, o sin cabecera -> None (se usa LLM_HEDGING del entorno).
+    """
+    if not HEDGE_HEADER_ALLOWED:
+        return None
+    raw = (request.headers.get("X-LLM-Hedge") or "").strip().lower()
+    if raw in ("1", "true", "yes", "on"):
+        return True
+    if raw in ("0", "false", "no", "off"):
+        return False
+    return None
+
 def _is_no_credits_msg(msg: str) -> bool:
-    m = (msg or "").lower()
-    # heurística suficiente para 402/429/quotas/creditos
-    return any(kw in m for kw in [
-        "quota", "over quota", "insufficient", "billing", "payment required",
-        "credit", "out of credits", "429", "402"
-    ])
+    # 402/429/quotas/creditos: cualquiera deja al proveedor sin servir ahora mismo
+    # (el circuit breaker sí los distingue para el cooldown)
+    return circuit_breaker.is_no_credits(msg) or circuit_breaker.is_rate_limited(msg)
 
 
 
@@ -677,7 +820,8 @@ def sessions(request):
     cat = find_category_for_topic(topic)
     if not cat:
         return JsonResponse({
-            'error':'topic fuera de dominio. Temas permitidos: ' + ', '.join(ALLOWED_TAXONOMY)
+            'error': 'topic fuera de dominio',
+            'suggestions': taxonomy.matcher.suggest(topic),
         }, status=400)
 
     valid_types = {'mcq','vf','short'}
@@ -718,6 +862,8 @@ def preview_questions(request):
     POST /api/preview/?debug=1
     body: { session_id? , topic?, difficulty?, types?, counts? }
     - Si session_id existe, usa la configuración guardada y PERSISTE latest_preview en DB.
+    - Con QUESTION_BANK_ENABLED=1 intenta armar el preview desde el banco de
+      preguntas pre-generadas (source="bank") y sólo genera en vivo si falta alguna.
     """
     data = request.data
     session = None
@@ -743,59 +889,48 @@ def preview_questions(request):
     debug = request.GET.get('debug') == '1'
 
     preferred = _header_provider(request)
+    hedge_report = {}
     try:
-        generated, provider_used, did_fallback, errors = _generate_with_fallback(
-            topic, difficulty, types, counts, preferred
-        )
+        category = (session.category if session else None) or find_category_for_topic(topic)
+        banked = None
+        if question_bank.BANK_ENABLED:
+            banked = question_bank.take(category, difficulty, types, counts, topic=topic)
+
+        if banked:
+            generated, provider_used, did_fallback, errors = banked, "bank", False, {}
+        else:
+            generated, provider_used, did_fallback, errors = _generate_with_fallback(
+                topic, difficulty, types, counts, preferred,
+                hedge=_header_hedge(request), report=hedge_report,
+                global_avoid=question_fingerprints.avoid_phrases(category, difficulty)
+            )
 
-        # === Moderación + anti-dup como ya lo tenías ===
-        clean = []
+        # === Moderación + anti-dup ===
+        # 1) pasada barata: se aceptan las preguntas limpias y se anotan las marcadas
+        clean = [None] * len(generated)
         moderation = {"flagged": 0, "details": []}
-        seen = set()
+        seen = NearDuplicateIndex()
+        flagged = []
 
-        for i, q in enumerate(generated):
-            issues = review_question(q)
+        for i, (q, issues) in enumerate(zip(generated, review_questions(generated))):
             sev = moderation_severity(issues)
             is_dup = _norm_for_cmp(q.get("question","")) in seen
 
             if not issues and not is_dup:
-                clean.append(q)
+                clean[i] = q
                 seen.add(_norm_for_cmp(q.get("question","")))
                 continue
 
             moderation["flagged"] += 1
             moderation["details"].append({"index": i, "issues": issues, "severity": sev, "dup": is_dup})
+            flagged.append((i, q, sev))
 
-            if sev == "severe":
-                try:
-                    fixed = _regenerate_with_fallback(topic, difficulty, q.get("type","mcq"), q, seen, provider_used)[0]
-                    if moderation_severity(review_question(fixed)) != "severe":
-                        clean.append(fixed)
-                        seen.add(_norm_for_cmp(fixed.get("question","")))
-                    else:
-                        clean.append({
-                            "type": q.get("type","mcq"),
-                            "question": f"[{topic}] Pregunta ajustada por moderación — describe el concepto con claridad.",
-                            "options": ["A) Definición correcta","B) Distractor 1","C) Distractor 2","D) Distractor 3"] if q.get("type")=="mcq" else None,
-                            "answer": "A" if q.get("type")=="mcq" else ("Verdadero" if q.get("type")=="vf" else "Respuesta breve"),
-                            "explanation": "Ajuste automático por reglas de calidad (HU-08)."
-                        })
-                except Exception:
-                    clean.append({
-                        "type": q.get("type","mcq"),
-                        "question": f"[{topic}] Pregunta ajustada por moderación — redacta con claridad.",
-                        "options": ["A) Opción 1","B) Opción 2","C) Opción 3","D) Opción 4"] if q.get("type")=="mcq" else None,
-                        "answer": "A" if q.get("type")=="mcq" else ("Verdadero" if q.get("type")=="vf" else "Respuesta breve"),
-                        "explanation": "Ajuste automático por reglas de calidad (HU-08)."
-                    })
-            else:
-                try:
-                    fixed = _regenerate_with_fallback(topic, difficulty, q.get("type","mcq"), q, seen, provider_used)[0]
-                    candidate = fixed if moderation_severity(review_question(fixed)) != "severe" else q
-                except Exception:
-                    candidate = q
-                clean.append(candidate)
-                seen.add(_norm_for_cmp(candidate.get("question","")))
+        # 2) reparación concurrente de todas las marcadas con un deadline común
+        if flagged:
+            moderation["repair"] = _repair_flagged_questions(
+                flagged, clean, seen, topic, difficulty,
+                preferred if provider_used == "bank" else provider_used
+            )
 
         generated = clean
 
@@ -813,11 +948,13 @@ def preview_questions(request):
                 'preferred': preferred,
                 'errors': errors,
                 'topic': topic, 'difficulty': difficulty, 'types': types, 'counts': counts,
-                'moderation': moderation
+                'moderation': moderation,
+                'hedge': hedge_report or None,
             }
         response = JsonResponse(resp, status=200)
         response["X-LLM-Effective-Provider"] = provider_used
         response["X-LLM-Fallback"] = "1" if did_fallback else "0"
+        response["X-LLM-Hedged"] = "1" if hedge_report.get("hedged") else "0"
         return response
 
 
@@ -836,6 +973,180 @@ def preview_questions(request):
             status=500
         )
 
+def _ndjson(event: dict) -> str:
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+
+@api_view(['POST'])
+def preview_questions_stream(request):
+    """
+    POST /api/preview/stream/
+    body: { session_id? , topic?, difficulty?, types?, counts?, version? }
+
+    Variante en streaming de /api/preview/ (NDJSON, un evento por línea):
+      {"event":"meta", ...}                          configuración efectiva
+      {"event":"question","index":i,"question":{...}} en cuanto cada pregunta
+                                                      sale del proveedor y pasa moderación
+      {"event":"done", ...} | {"event":"error", ...}  cierre
+
+    Cada pregunta se modera al llegar; si está marcada (o repite enunciado) se
+    repara antes de emitirla. Si el proveedor falla a mitad, se piden al otro
+    sólo las que faltan por tipo. Al final se PERSISTE latest_preview, sólo si
+    el preview salió completo y la sesión no cambió durante el stream (`version`
+    del body, o la leída al empezar); si cambió, evento error "version_conflict".
+    """
+    data = request.data
+    session = None
+    session_id = data.get('session_id')
+    if session_id:
+        try:
+            session = GenerationSession.objects.get(id=session_id)
+        except GenerationSession.DoesNotExist:
+            return JsonResponse({'error':'session not found'}, status=404)
+
+    if session:
+        topic = session.topic
+        difficulty = session.difficulty
+        types = session.types
+        counts = session.counts
+    else:
+        topic = data.get('topic','Tema de ejemplo')
+        difficulty = _normalize_difficulty(data.get('difficulty','Fácil'))
+        types = data.get('types',['mcq','vf'])
+        counts = data.get('counts', {t:1 for t in types})
+
+    types = list(dict.fromkeys(types))
+    try:
+        remaining = {t: int(counts.get(t, 0) or 0) for t in types}
+    except (TypeError, ValueError):
+        return JsonResponse({'error':'counts must be integers'}, status=400)
+    remaining = {t: n for t, n in remaining.items() if n > 0}
+    if not remaining:
+        return JsonResponse({'error': 'total questions must be > 0'}, status=400)
+
+    try:
+        expected_version = int(data["version"]) if data.get("version") is not None else None
+    except (TypeError, ValueError):
+        return JsonResponse({"error":"version inválida"}, status=400)
+    if session and expected_version is None:
+        expected_version = session.version
+
+    preferred = _header_provider(request)
+
+    def events():
+        started = time.monotonic()
+        preview = []
+        seen = NearDuplicateIndex()
+        errors = {}
+        moderation = {"flagged": 0, "repaired": 0}
+        provider_used = None
+        contributors = set()
+        first_ms = None
+
+        yield _ndjson({
+            "event": "meta",
+            "topic": topic, "difficulty": difficulty, "types": types,
+            "counts": remaining, "total": sum(remaining.values()),
+            "preferred": preferred,
+        })
+
+        def _accept(q, provider):
+            nonlocal first_ms
+            issues = review_question(q)
+            is_dup = _norm_for_cmp(q.get("question","")) in seen
+            if issues or is_dup:
+                moderation["flagged"] += 1
+                slot = [None]
+                sev = moderation_severity(issues)
+                _repair_flagged_questions([(0, q, sev)], slot, seen, topic, difficulty, provider)
+                if slot[0] is not q:
+                    moderation["repaired"] += 1
+                q = slot[0]
+            else:
+                seen.add(_norm_for_cmp(q.get("question","")))
+            preview.append(q)
+            if first_ms is None:
+                first_ms = int((time.monotonic() - started) * 1000)
+            return _ndjson({"event": "question", "index": len(preview) - 1, "question": q})
+
+        category = (session.category if session else None) or find_category_for_topic(topic)
+        banked = None
+        if question_bank.BANK_ENABLED:
+            banked = question_bank.take(category, difficulty, list(remaining), remaining, topic=topic)
+        if banked:
+            provider_used = "bank"
+            for q in banked:
+                yield _accept(q, preferred)
+            remaining.clear()
+
+        global_avoid = question_fingerprints.avoid_phrases(category, difficulty)
+        order = [preferred, "gemini" if preferred == "perplexity" else "perplexity"]
+        for prov in order:
+            if not remaining:
+                break
+            try:
+                with llm_telemetry.track(prov, "stream", fallback=prov != order[0]), circuit_breaker.guard(prov):
+                    for q in stream_questions(prov, topic, difficulty, dict(remaining), global_avoid):
+                        if not _question_shape_ok(q, remaining):
+                            continue  # mal formada, tipo no pedido o ya completo
+                        qtype = q["type"]
+                        remaining[qtype] -= 1
+                        if not remaining[qtype]:
+                            del remaining[qtype]
+                        provider_used = provider_used or prov
+                        contributors.add(prov)
+                        yield _accept(q, prov)
+                        if not remaining:
+                            break
+                if remaining:
+                    raise ValueError(f"stream incompleto: faltan {remaining}")
+            except Exception as e:
+                errors[prov] = _provider_error(e)
+
+        if remaining:
+            no_credits = len(errors) == 2 and all(v["no_credits"] for v in errors.values())
+            yield _ndjson({
+                "event": "error",
+                "error": "no_providers_available" if no_credits and not preview else "providers_failed",
+                "delivered": len(preview),
+                "missing": remaining,
+                "errors": errors,
+            })
+            return  # un preview incompleto no reemplaza el último bueno
+
+        version = None
+        if session:
+            session.latest_preview = preview
+            try:
+                optimistic.save(session, update_fields=["latest_preview"], expected_version=expected_version)
+            except optimistic.VersionConflict as exc:
+                yield _ndjson({
+                    "event": "error",
+                    "error": "version_conflict",
+                    "delivered": len(preview),
+                    "expected_version": exc.expected,
+                    "current_version": exc.current,
+                })
+                return
+            version = session.version
+
+        yield _ndjson({
+            "event": "done",
+            "version": version,
+            "total": len(preview),
+            "source": provider_used,
+            "fallback_used": any(p != preferred for p in contributors),
+            "moderation": moderation,
+            "errors": errors,
+            "first_question_ms": first_ms,
+            "elapsed_ms": int((time.monotonic() - started) * 1000),
+        })
+
+    response = StreamingHttpResponse(events(), content_type="application/x-ndjson")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx: no acumular el cuerpo
+    return response
+
 
 
 @api_view(['POST'])
@@ -877,11 +1188,14 @@ def regenerate_question(request):
     topic = session.topic
     difficulty = session.difficulty
     preferred = _header_provider(request)
+    hedge = _header_hedge(request)
+    hedge_report = {}
 
     gemini_error = None
     try:
         # Anti-repetición con historial del índice
         seen = build_seen_set(session, index=index)
+        global_avoid = question_fingerprints.avoid_phrases(session.category, difficulty)
 
         def _is_dup(qobj):
             return _norm_for_cmp(qobj.get("question","")) in seen
@@ -891,7 +1205,8 @@ def regenerate_question(request):
         while True:
             attempts += 1
             new_q, provider_used, did_fallback, errors = _regenerate_with_fallback(
-                topic, difficulty, qtype, base_q, seen, preferred
+                topic, difficulty, qtype, base_q, seen, preferred,
+                hedge=hedge, report=hedge_report, global_avoid=global_avoid
             )
             issues = review_question(new_q)
             sev = moderation_severity(issues)
@@ -991,10 +1306,12 @@ def regenerate_question(request):
             "base_available": base_q is not None,
             "moderation_issues": issues,
             "moderation_retry": retry_used,
+            "hedge": hedge_report or None,
         }
     response = JsonResponse(resp, status=200)
     response["X-LLM-Effective-Provider"] = provider_used
     response["X-LLM-Fallback"] = "1" if did_fallback else "0"
+    response["X-LLM-Hedged"] = "1" if hedge_report.get("hedged") else "0"
     return response
 
 
@@ -1004,8 +1321,14 @@ def regenerate_question(request):
 def confirm_replace(request):
     """
     POST /api/confirm-replace/
-    body: { session_id: str, index: int, question: {...} }
-    Actualiza session.latest_preview[index] = question
+    body: { session_id: str, index: int, question: {...}, op?: "replace"|"insert"|"duplicate",
+            version?: int }
+    - replace (por defecto): session.latest_preview[index] = question
+    - insert: inserta question en index
+    - duplicate: copia latest_preview[index] justo después (no requiere question)
+    Cada operación escribe una sola fila SessionQuestion, no la lista entera.
+    Con `version` (de la sesión) responde 409 si la sesión cambió; sin ella, un
+    cambio concurrente se resuelve releyendo la sesión y reintentando.
     """
     data = request.data
     session_id = data.get("session_id")
@@ -1021,27 +1344,46 @@ def confirm_replace(request):
     if index < 0:
         return JsonResponse({"error":"index debe ser >= 0"}, status=400)
 
+    op = data.get("op") or "replace"
+    if op not in ("replace", "insert", "duplicate"):
+        return JsonResponse({"error":"op inválida"}, status=400)
+    try:
+        expected_version = int(data["version"]) if data.get("version") is not None else None
+    except (TypeError, ValueError):
+        return JsonResponse({"error":"version inválida"}, status=400)
+
     new_q = data.get("question")
-    if not isinstance(new_q, dict) or "type" not in new_q or "question" not in new_q or "answer" not in new_q:
+    if op != "duplicate" and (not isinstance(new_q, dict) or "type" not in new_q
+                              or "question" not in new_q or "answer" not in new_q):
         return JsonResponse({"error":"question inválida o incompleta"}, status=400)
 
-    lp = list(session.latest_preview or [])
-    while len(lp) <= index:
-        lp.append({})
-    lp[index] = new_q
-    session.latest_preview = lp
-    session.save(update_fields=["latest_preview"])
+    current = [session]
 
-    return JsonResponse({"ok": True})
+    def apply():
+        s = current.pop() if current else GenerationSession.objects.get(id=session_id)
+        if op == "duplicate":
+            return {"index": s.duplicate_question(index, expected_version=expected_version)}, s
+        if op == "insert":
+            return {"index": s.insert_question(index, new_q, expected_version=expected_version)}, s
+        return {"index": index, "question_version": s.replace_question(index, new_q, expected_version)}, s
+
+    try:
+        result, session = optimistic.retry(apply, attempts=1 if expected_version is not None else None)
+    except optimistic.VersionConflict as e:
+        return optimistic.conflict_response(e)
+    except IndexError:
+        return JsonResponse({"error":"index fuera de rango"}, status=400)
+    return JsonResponse({"ok": True, **result, "version": session.version})
 
 
 @api_view(['POST'])
 def gemini_generate(request):
     prompt = request.data.get('prompt', '')
     try:
-        genai = _configure_gemini()   # importa y configura aquí
-        model = genai.GenerativeModel(GEMINI_MODEL)
-        response = model.generate_content(prompt)
+        with llm_telemetry.track("gemini", "gemini_generate", model=GEMINI_MODEL):
+            model = gemini_registry.get_model(GEMINI_MODEL)   # importa y configura perezosamente
+            response = model.generate_content(prompt)
+            llm_telemetry.annotate_gemini(response, prompt=prompt)
         return JsonResponse({'result': response.text})
     except RuntimeError as e:
         # genai_unavailable o falta de API key -> 503 para que Front distinga “servicio externo caído”
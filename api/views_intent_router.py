@@ -7,6 +7,7 @@ from rest_framework.decorators import api_view
 from rest_framework import status
 
 from .models import VoiceMetricEvent  # ya lo tienes
+from .services import taxonomy
 # Si prefieres registrar métricas vía endpoint en vez de ORM directo,
 # podrías usar requests.post(...) a /api/voice-metrics/log/, pero con ORM es más simple.
 
@@ -85,8 +86,29 @@ _PATTERNS = [
 ]
 
 
+_DIFFICULTY_PATTERNS = [
+    ("Fácil", re.compile(r"\b(f[aá]cil|b[aá]sico|principiante)\b", re.I)),
+    ("Media", re.compile(r"\b(media|medio|intermedio)\b", re.I)),
+    ("Difícil", re.compile(r"\b(dif[ií]cil|avanzado|experto)\b", re.I)),
+]
+
+
+def _fill_quiz_slots(text: str) -> Dict[str, Any]:
+    """Slots de generate_quiz: tema (matcher de la taxonomía) y dificultad."""
+    slots: Dict[str, Any] = {}
+    found = taxonomy.matcher.extract(text)
+    if found:
+        slots["topic"] = found.category
+        slots["topic_score"] = found.score
+    for difficulty, pattern in _DIFFICULTY_PATTERNS:
+        if pattern.search(text):
+            slots["difficulty"] = difficulty
+            break
+    return slots
+
+
 def _match_intent(text: str) -> Dict[str, Any]:
-    """Router local tipo 'grammar' con latencia simulada y slots vacíos."""
+    """Router local tipo 'grammar'; sólo generate_quiz rellena slots (tema/dificultad)."""
     t0 = time.perf_counter()
     text_norm = (text or "").strip()
 
@@ -100,6 +122,9 @@ def _match_intent(text: str) -> Dict[str, Any]:
             confidence = 0.6  # heurística
             break
 
+    if intent == "generate_quiz":
+        slots = _fill_quiz_slots(text_norm)
+
     latency_ms = int((time.perf_counter() - t0) * 1000)
 
     return {
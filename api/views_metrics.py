@@ -3,6 +3,9 @@ from django.http import JsonResponse, HttpResponse
 from rest_framework.decorators import api_view
 
 from .services.metrics import compute_metrics, build_metrics_csv
+from .services.http_client import pool_stats
+from .services import circuit_breaker
+from .services.llm_telemetry import compute_llm_metrics
 
 
 @api_view(["GET"])
@@ -31,3 +34,37 @@ def metrics_export(request):
     resp = HttpResponse(csv_text, content_type="text/csv; charset=utf-8")
     resp["Content-Disposition"] = 'attachment; filename="qgai_metrics.csv"'
     return resp
+
+
+@api_view(["GET"])
+def llm_metrics_summary(request):
+    """
+    GET /api/metrics/llm/?start=YYYY-MM-DD&end=YYYY-MM-DD&provider=gemini
+    Latencia p50/p95/p99, resultados y tokens por proveedor y operación
+    (tabla llm_call_events). Sin fechas: últimos 7 días.
+    """
+    metrics = compute_llm_metrics(
+        start=request.GET.get("start"),
+        end=request.GET.get("end"),
+        provider=request.GET.get("provider"),
+    )
+    return JsonResponse(metrics, status=200)
+
+
+@api_view(["GET"])
+def http_pool_metrics(request):
+    """
+    GET /api/metrics/http-pool/
+    Estadísticas del pool HTTP saliente por host (reutilización de conexiones).
+    Los valores son por proceso (worker) desde su arranque.
+    """
+    return JsonResponse({"hosts": pool_stats()}, status=200)
+
+
+@api_view(["GET"])
+def provider_circuit_metrics(request):
+    """
+    GET /api/metrics/providers/
+    Estado del circuit breaker de cada proveedor externo (compartido entre workers sólo con REDIS_URL; si no, el de este proceso).
+    """
+    return JsonResponse({"providers": circuit_breaker.snapshot()}, status=200)
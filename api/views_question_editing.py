@@ -10,6 +10,7 @@ Este módulo contiene las vistas mejoradas que soportan:
 """
 
 import logging
+from django.db import transaction
 from django.http import JsonResponse
 from django.utils import timezone
 from rest_framework.decorators import api_view
@@ -33,6 +34,8 @@ from .views import (
     moderation_severity,
     _norm_for_cmp
 )
+from .services.near_duplicates import NearDuplicateIndex
+from .services import question_fingerprints, taxonomy
 
 logger = logging.getLogger(__name__)
 
@@ -116,27 +119,22 @@ def create_session_with_edits(request):
         category = find_category_for_topic(topic)
         if not category:
             return JsonResponse({
-                'error': 'Tema fuera de dominio permitido'
+                'error': 'Tema fuera de dominio permitido',
+                'suggestions': taxonomy.matcher.suggest(topic),
             }, status=400)
 
-        # Crear la sesión
-        session = GenerationSession.objects.create(
+        session_fields = dict(
             topic=topic,
             category=category,
             difficulty=difficulty,
             types=types,
             counts=counts,
-            latest_preview=[]  # Se llenará después
-        )
-
-        logger.info(
-            f"Sesión creada: {session.id} - Topic: {topic} - Difficulty: {difficulty}",
-            extra={'session_id': str(session.id)}
         )
 
         # CASO 1: Preguntas editadas provistas (usuario confirmó después de editar)
         if questions:
-            # Sanitizar y validar cada pregunta adicional
+            # Sanitizar y validar todas antes de escribir nada: un error no deja
+            # sesiones a medio crear
             sanitized_questions = []
 
             for i, q in enumerate(questions):
@@ -148,10 +146,8 @@ def create_session_with_edits(request):
                 if not q_serializer.is_valid():
                     logger.error(
                         f"Pregunta {i} no pasó validación secundaria",
-                        extra={'session_id': str(session.id), 'errors': q_serializer.errors}
+                        extra={'topic': topic, 'errors': q_serializer.errors}
                     )
-                    # Eliminar sesión creada (rollback manual)
-                    session.delete()
                     return JsonResponse({
                         'error': f'Pregunta {i+1} tiene datos inválidos',
                         'details': q_serializer.errors
@@ -159,15 +155,16 @@ def create_session_with_edits(request):
 
                 sanitized_questions.append(q_serializer.validated_data)
 
-            # Guardar preguntas sanitizadas
-            session.latest_preview = sanitized_questions
-            session.save(update_fields=['latest_preview'])
-
-            # TRACKING: Crear logs para cada pregunta
-            _create_edit_tracking_logs(session, questions, sanitized_questions)
+            # Sesión, preguntas y TRACKING en una sola transacción
+            with transaction.atomic():
+                session = GenerationSession.objects.create(
+                    latest_preview=sanitized_questions, **session_fields
+                )
+                _create_edit_tracking_logs(session, questions, sanitized_questions)
 
             logger.info(
-                f"Sesión {session.id} creada con {len(sanitized_questions)} preguntas editadas",
+                f"Sesión {session.id} creada con {len(sanitized_questions)} preguntas editadas"
+                f" - Topic: {topic} - Difficulty: {difficulty}",
                 extra={'session_id': str(session.id)}
             )
 
@@ -183,52 +180,19 @@ def create_session_with_edits(request):
         else:
             preferred_provider = _header_provider(request)
 
+            # La llamada al proveedor va fuera de la transacción: sólo se
+            # escribe cuando ya hay preguntas
             try:
                 generated, provider_used, did_fallback, errors = _generate_with_fallback(
-                    topic, difficulty, types, counts, preferred_provider
+                    topic, difficulty, types, counts, preferred_provider,
+                    global_avoid=question_fingerprints.avoid_phrases(category, difficulty)
                 )
-
-                # Guardar preguntas generadas
-                session.latest_preview = generated
-                session.save(update_fields=['latest_preview'])
-
-                # TRACKING: Marcar como generadas por IA pura
-                for i, q in enumerate(generated):
-                    QuestionOriginMetadata.objects.create(
-                        session=session,
-                        question_index=i,
-                        origin_type='pure_ai',
-                        initial_ai_provider=provider_used
-                    )
-
-                logger.info(
-                    f"Sesión {session.id} creada con {len(generated)} preguntas de IA",
-                    extra={
-                        'session_id': str(session.id),
-                        'provider': provider_used,
-                        'fallback': did_fallback
-                    }
-                )
-
-                return JsonResponse({
-                    'session_id': str(session.id),
-                    'topic': topic,
-                    'difficulty': difficulty,
-                    'questions_count': len(generated),
-                    'mode': 'ai_generated',
-                    'provider': provider_used
-                }, status=201)
-
             except RuntimeError as e:
                 error_msg = str(e)
                 logger.error(
-                    f"Error generando preguntas para sesión {session.id}: {error_msg}",
-                    extra={'session_id': str(session.id)}
+                    f"Error generando preguntas (topic={topic}, difficulty={difficulty}): {error_msg}"
                 )
 
-                # Eliminar sesión (rollback)
-                session.delete()
-
                 if error_msg == "no_providers_available":
                     return JsonResponse({
                         'error': 'no_providers_available',
@@ -240,6 +204,41 @@ def create_session_with_edits(request):
                     'message': error_msg
                 }, status=500)
 
+            with transaction.atomic():
+                session = GenerationSession.objects.create(
+                    latest_preview=generated, **session_fields
+                )
+
+                # TRACKING: Marcar como generadas por IA pura
+                QuestionOriginMetadata.objects.bulk_create([
+                    QuestionOriginMetadata(
+                        session=session,
+                        question_index=i,
+                        origin_type='pure_ai',
+                        initial_ai_provider=provider_used
+                    )
+                    for i in range(len(generated))
+                ])
+
+            logger.info(
+                f"Sesión {session.id} creada con {len(generated)} preguntas de IA"
+                f" - Topic: {topic} - Difficulty: {difficulty}",
+                extra={
+                    'session_id': str(session.id),
+                    'provider': provider_used,
+                    'fallback': did_fallback
+                }
+            )
+
+            return JsonResponse({
+                'session_id': str(session.id),
+                'topic': topic,
+                'difficulty': difficulty,
+                'questions_count': len(generated),
+                'mode': 'ai_generated',
+                'provider': provider_used
+            }, status=201)
+
     except Exception as e:
         logger.exception(
             f"Error inesperado en create_session_with_edits: {str(e)}",
@@ -313,11 +312,15 @@ def regenerate_in_preview_mode(request):
                 logger.warning(f"Session {session_id} no encontrada para regeneración")
 
         # Construir seen set para evitar duplicados
-        seen = set()
+        seen = NearDuplicateIndex()
         if session:
             seen = build_seen_set(session)
         elif avoid_phrases:
-            seen = {_norm_for_cmp(p) for p in avoid_phrases}
+            seen = NearDuplicateIndex(_norm_for_cmp(p) for p in avoid_phrases)
+
+        # Enunciados ya servidos en otras sesiones de la misma categoría
+        category = (session.category if session else None) or find_category_for_topic(topic)
+        global_avoid = question_fingerprints.avoid_phrases(category, difficulty)
 
         # Obtener proveedor preferido
         preferred = _header_provider(request)
@@ -325,7 +328,8 @@ def regenerate_in_preview_mode(request):
         # Regenerar con IA
         try:
             new_q, provider_used, did_fallback, errors = _regenerate_with_fallback(
-                topic, difficulty, qtype, base_question, seen, preferred
+                topic, difficulty, qtype, base_question, seen, preferred,
+                global_avoid=global_avoid
             )
 
             # Validar pregunta generada
@@ -342,7 +346,8 @@ def regenerate_in_preview_mode(request):
                 # Reintentar una vez
                 seen.add(_norm_for_cmp(new_q.get("question", "")))
                 new_q, provider_used, did_fallback, errors = _regenerate_with_fallback(
-                    topic, difficulty, qtype, base_question, seen, preferred
+                    topic, difficulty, qtype, base_question, seen, preferred,
+                    global_avoid=global_avoid
                 )
 
             # Si hay session_id, crear log de regeneración
@@ -578,7 +583,12 @@ def _create_edit_tracking_logs(session, original_questions, sanitized_questions)
     - isNew: log de 'creation'
     - isModified: log de 'manual_edit'
     - ni isNew ni isModified: log de 'pure_ai' (si aplica)
+
+    Todo se inserta con un bulk_create por tabla (dos INSERT sin importar el
+    número de preguntas); llamar dentro de la transacción que crea la sesión.
     """
+    edit_logs = []
+    metadata = []
 
     for i, (original, sanitized) in enumerate(zip(original_questions, sanitized_questions)):
         is_new = original.get('isNew', False)
@@ -587,19 +597,20 @@ def _create_edit_tracking_logs(session, original_questions, sanitized_questions)
 
         if is_new:
             # Pregunta nueva (creada o duplicada)
-            QuestionEditLog.log_creation(
+            edit_logs.append(QuestionEditLog.log_creation(
                 session=session,
                 index=i,
-                question_data=sanitized
-            )
+                question_data=sanitized,
+                commit=False
+            ))
 
-            QuestionOriginMetadata.objects.create(
+            metadata.append(QuestionOriginMetadata(
                 session=session,
                 question_index=i,
                 origin_type='user_created' if original_index == -1 else 'duplicated',
                 edit_count=0,
                 regeneration_count=0
-            )
+            ))
 
         elif is_modified:
             # Pregunta editada
@@ -609,26 +620,34 @@ def _create_edit_tracking_logs(session, original_questions, sanitized_questions)
                 if session.latest_preview and original_index < len(session.latest_preview):
                     before = session.latest_preview[original_index]
 
-            QuestionEditLog.log_manual_edit(
+            edit_logs.append(QuestionEditLog.log_manual_edit(
                 session=session,
                 index=i,
                 before=before,
-                after=sanitized
-            )
+                after=sanitized,
+                commit=False
+            ))
 
-            QuestionOriginMetadata.create_or_update_metadata(
+            # Lo mismo que create_or_update_metadata(..., 'manual_edit') sobre
+            # una sesión recién creada
+            metadata.append(QuestionOriginMetadata(
                 session=session,
-                index=i,
-                operation_type='manual_edit'
-            )
+                question_index=i,
+                origin_type='ai_edited',
+                edit_count=1,
+                regeneration_count=0
+            ))
 
         else:
             # Pregunta no modificada (IA pura)
-            QuestionOriginMetadata.objects.create(
+            metadata.append(QuestionOriginMetadata(
                 session=session,
                 question_index=i,
                 origin_type='pure_ai',
                 edit_count=0,
                 regeneration_count=0,
                 initial_ai_provider='gemini'  # o detectar del header
-            )
+            ))
+
+    QuestionEditLog.objects.bulk_create(edit_logs)
+    QuestionOriginMetadata.objects.bulk_create(metadata)
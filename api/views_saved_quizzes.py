@@ -1,18 +1,21 @@
 # api/views_saved_quizzes.py
+import os
+
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view
 from rest_framework import status
 from django.utils import timezone
-from django.db.models import Q, Count, Avg
+from django.db.models import Q
 from django.db import transaction
 
-from .models import SavedQuiz, GenerationSession
+from .models import SavedQuiz, GenerationSession, QuizStatCounter
 from .serializers import (
     SavedQuizSerializer,
     SavedQuizListSerializer,
     SaveQuizRequestSerializer,
-    UpdateQuizProgressSerializer
+    UpdateQuizProgressSerializer,
+    QuizProgressDeltaSerializer
 )
 from .views import (
     regenerate_question_with_gemini,
@@ -21,12 +24,39 @@ from .views import (
     _header_provider,
     _norm_for_cmp
 )
+from .services.parallel import map_bounded, DeadlineExceeded
+from .utils.cursor import InvalidCursor, decode_cursor, encode_cursor
+from .services.near_duplicates import NearDuplicateIndex
+from .services import access_tracker, optimistic, question_fingerprints
+
+REVIEW_MAX_WORKERS = int(os.getenv("REVIEW_MAX_WORKERS", "4"))
+REVIEW_DEADLINE_S = float(os.getenv("REVIEW_DEADLINE_S", "45"))
+
+# JSON pesados que SavedQuizListSerializer no necesita (usa los contadores desnormalizados;
+# las preguntas viven en QuestionSet y sólo se leen si se accede a .questions)
+LIST_DEFERRED_FIELDS = ('user_answers', 'score', 'types', 'counts')
+
+# Lo que PATCH .../progress/ necesita cargar: ni questions ni score
+PROGRESS_FIELDS = ('id', 'user_answers', 'current_question', 'is_completed', 'question_count',
+                   'answered_count', 'progress', 'topic', 'difficulty', 'last_accessed', 'version')
+
+SAVED_QUIZ_PAGE_SIZE = int(os.getenv("SAVED_QUIZ_PAGE_SIZE", "20"))
+SAVED_QUIZ_MAX_PAGE_SIZE = int(os.getenv("SAVED_QUIZ_MAX_PAGE_SIZE", "100"))
+
+
+def _list_queryset():
+    """SavedQuiz para listados: sin JSON pesados y con el quiz original en el mismo SELECT."""
+    return (SavedQuiz.objects
+            .select_related('original_quiz')
+            .defer(*LIST_DEFERRED_FIELDS, *(f'original_quiz__{f}' for f in LIST_DEFERRED_FIELDS)))
 
 
 @api_view(['GET', 'POST'])
 def saved_quizzes(request):
     """
-    GET: Lista todos los cuestionarios guardados
+    GET: Lista los cuestionarios guardados, del más nuevo al más antiguo,
+         paginados por cursor: ?page_size=N (máx. SAVED_QUIZ_MAX_PAGE_SIZE) &cursor=<next_cursor>
+         `count` es el total de cuestionarios que cumplen los filtros (no el de la página).
     POST: Crea un nuevo cuestionario guardado
     """
     if request.method == 'GET':
@@ -34,8 +64,13 @@ def saved_quizzes(request):
         topic = request.GET.get('topic')
         difficulty = request.GET.get('difficulty')
         completed = request.GET.get('completed')
-        
-        queryset = SavedQuiz.objects.all()
+        try:
+            page_size = int(request.GET.get('page_size', SAVED_QUIZ_PAGE_SIZE))
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'page_size debe ser entero'}, status=400)
+        page_size = max(1, min(page_size, SAVED_QUIZ_MAX_PAGE_SIZE))
+
+        queryset = _list_queryset()
         
         if topic:
             queryset = queryset.filter(topic__icontains=topic)
@@ -45,14 +80,36 @@ def saved_quizzes(request):
             is_completed = completed.lower() in ['true', '1', 'yes']
             queryset = queryset.filter(is_completed=is_completed)
         
-        # Ordenar por último acceso
-        queryset = queryset.order_by('-last_accessed', '-updated_at')
-        
-        serializer = SavedQuizListSerializer(queryset, many=True)
-        return JsonResponse({
+        total = queryset.count()
+
+        # Keyset: (-created_at, id), que no cambia al abrir un cuestionario (last_accessed
+        # sí, y movería filas entre páginas); el cursor es la última fila servida
+        cursor = request.GET.get('cursor')
+        if cursor:
+            try:
+                after = decode_cursor(cursor, datetime_keys=('created_at',))
+                created, last_id = after['created_at'], after['id']
+            except (InvalidCursor, KeyError) as e:
+                return JsonResponse({'error': 'cursor inválido', 'details': str(e)}, status=400)
+            queryset = queryset.filter(Q(created_at__lt=created) | Q(created_at=created, id__gt=last_id))
+
+        page = list(queryset.order_by('-created_at', 'id')[:page_size + 1])
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        next_cursor = None
+        if has_more:
+            last = page[-1]
+            next_cursor = encode_cursor({'created_at': last.created_at, 'id': str(last.id)})
+
+        serializer = SavedQuizListSerializer(page, many=True)
+        body = {
             'saved_quizzes': serializer.data,
-            'count': queryset.count()
-        }, status=200)
+            'count': total,
+            'page_size': page_size,
+            'has_more': has_more,
+            'next_cursor': next_cursor,
+        }
+        return JsonResponse(body, status=200)
     
     elif request.method == 'POST':
         serializer = SaveQuizRequestSerializer(data=request.data)
@@ -66,6 +123,7 @@ def saved_quizzes(request):
         
         # Si se proporciona session_id, obtener datos de la sesión
         questions = data.get('questions', [])
+        question_set_id = None
         if 'session_id' in data and data['session_id']:
             try:
                 session = GenerationSession.objects.get(id=data['session_id'])
@@ -74,7 +132,11 @@ def saved_quizzes(request):
                 difficulty = data.get('difficulty', session.difficulty)
                 types = data.get('types', session.types)
                 counts = data.get('counts', session.counts)
-                questions = data.get('questions', session.latest_preview or [])
+                if 'questions' not in data:
+                    # mismo contenido que la sesión: se comparte su QuestionSet
+                    # (si se editó pregunta a pregunta, vive en filas y se copia la lista)
+                    question_set_id = session.question_set_id
+                    questions = [] if question_set_id else session.latest_preview
                 
                 # Usar categoría de la sesión si existe
                 category = getattr(session, 'category', '')
@@ -106,6 +168,9 @@ def saved_quizzes(request):
                 # (no bloqueamos el guardado por esto)
                 pass
 
+        # Preguntas: puntero al QuestionSet de la sesión o lista recibida
+        content = {'question_set_id': question_set_id} if question_set_id else {'questions': questions}
+
         # Crear el cuestionario guardado
         saved_quiz = SavedQuiz.objects.create(
             title=data['title'],
@@ -114,7 +179,7 @@ def saved_quizzes(request):
             difficulty=difficulty,
             types=types,
             counts=counts,
-            questions=questions,
+            **content,
             user_answers=data.get('user_answers', {}),
             current_question=data.get('current_question', 0),
             original_quiz=original_quiz  # Establecer relación jerárquica
@@ -132,14 +197,14 @@ def saved_quiz_detail(request, quiz_id):
     """
     GET: Obtiene detalles de un cuestionario guardado
     PUT: Actualiza un cuestionario guardado
+         (con `version` en el body, 409 si el quiz cambió desde esa versión)
     DELETE: Elimina un cuestionario guardado
     """
     saved_quiz = get_object_or_404(SavedQuiz, id=quiz_id)
     
     if request.method == 'GET':
-        # Actualizar último acceso
-        saved_quiz.last_accessed = timezone.now()
-        saved_quiz.save(update_fields=['last_accessed'])
+        # Actualizar último acceso (diferido, sin escribir en la petición)
+        access_tracker.touch(saved_quiz)
         
         serializer = SavedQuizSerializer(saved_quiz)
         return JsonResponse({
@@ -158,24 +223,29 @@ def saved_quiz_detail(request, quiz_id):
         progress_data = progress_serializer.validated_data
         
         # Validar que current_question no exceda el número de preguntas
-        if progress_data['current_question'] >= len(saved_quiz.questions):
+        if progress_data['current_question'] >= saved_quiz.question_count:
             if not progress_data.get('is_completed', False):
                 return JsonResponse({
                     'error': 'Índice de pregunta fuera de rango'
                 }, status=400)
         
         # Actualizar campos
-        saved_quiz.current_question = progress_data['current_question']
-        saved_quiz.user_answers = progress_data['user_answers']
-        saved_quiz.last_accessed = timezone.now()
-        
-        if 'is_completed' in progress_data:
-            saved_quiz.is_completed = progress_data['is_completed']
-        
-        if 'score' in progress_data:
-            saved_quiz.score = progress_data['score']
-        
-        saved_quiz.save()
+        def apply_progress(quiz):
+            quiz.current_question = progress_data['current_question']
+            quiz.user_answers = progress_data['user_answers']
+            quiz.last_accessed = timezone.now()
+
+            if 'is_completed' in progress_data:
+                quiz.is_completed = progress_data['is_completed']
+
+            if 'score' in progress_data:
+                quiz.score = progress_data['score']
+
+        try:
+            saved_quiz = optimistic.modify(saved_quiz, apply_progress,
+                                           expected_version=progress_data.get('version'))
+        except optimistic.VersionConflict as e:
+            return optimistic.conflict_response(e)
         
         serializer = SavedQuizSerializer(saved_quiz)
         return JsonResponse({
@@ -190,6 +260,76 @@ def saved_quiz_detail(request, quiz_id):
         }, status=200)
 
 
+@api_view(['PATCH'])
+def update_quiz_progress(request, quiz_id):
+    """
+    PATCH: Aplica un delta de progreso sin reescribir el cuestionario
+
+    Body: {answers?: {índice: respuesta}, index?, answer?, current_question?,
+           is_completed?, score?, version?}
+
+    Sólo se cargan y escriben las columnas de progreso (update_fields); el JSON de
+    preguntas no se toca. Retorna un acuse mínimo con el estado resultante.
+    """
+    delta_serializer = QuizProgressDeltaSerializer(data=request.data)
+    if not delta_serializer.is_valid():
+        return JsonResponse({
+            'error': 'Datos inválidos',
+            'details': delta_serializer.errors
+        }, status=400)
+    delta = delta_serializer.validated_data
+
+    queryset = SavedQuiz.objects.only(*PROGRESS_FIELDS)
+    saved_quiz = get_object_or_404(queryset, id=quiz_id)
+    total = saved_quiz.question_count
+    out_of_range = [k for k in delta['answers'] if int(k) >= total]
+    if out_of_range:
+        return JsonResponse({
+            'error': 'Índice de pregunta fuera de rango',
+            'details': {'answers': out_of_range}
+        }, status=400)
+    if 'current_question' in delta and delta['current_question'] >= total \
+            and not delta.get('is_completed', saved_quiz.is_completed):
+        return JsonResponse({
+            'error': 'Índice de pregunta fuera de rango'
+        }, status=400)
+
+    update_fields = ['last_accessed']
+    if delta['answers']:
+        update_fields.append('user_answers')
+    update_fields += [f for f in ('current_question', 'is_completed', 'score') if f in delta]
+
+    def apply_delta(quiz):
+        # sin lock: ante una escritura concurrente se relee y se vuelve a fusionar
+        quiz.last_accessed = timezone.now()
+        if delta['answers']:
+            answers = quiz.user_answers if isinstance(quiz.user_answers, dict) else {}
+            answers.update(delta['answers'])
+            quiz.user_answers = answers
+        for field in ('current_question', 'is_completed', 'score'):
+            if field in delta:
+                setattr(quiz, field, delta[field])
+
+    try:
+        saved_quiz = optimistic.modify(
+            saved_quiz, apply_delta, update_fields=update_fields,
+            expected_version=delta.get('version'),
+            reload=lambda: queryset.get(id=quiz_id),
+        )
+    except optimistic.VersionConflict as e:
+        return optimistic.conflict_response(e)
+
+    return JsonResponse({
+        'ok': True,
+        'id': str(saved_quiz.id),
+        'current_question': saved_quiz.current_question,
+        'answered_count': saved_quiz.answered_count,
+        'is_completed': saved_quiz.is_completed,
+        'progress': saved_quiz.progress,
+        'version': saved_quiz.version,
+    }, status=200)
+
+
 @api_view(['POST'])
 def load_saved_quiz(request, quiz_id):
     """
@@ -207,12 +347,11 @@ def load_saved_quiz(request, quiz_id):
                 difficulty=saved_quiz.difficulty,
                 types=saved_quiz.types,
                 counts=saved_quiz.counts,
-                latest_preview=saved_quiz.questions
+                question_set_id=saved_quiz.question_set_id  # puntero, no copia del JSON
             )
             
             # Actualizar último acceso del cuestionario guardado
-            saved_quiz.last_accessed = timezone.now()
-            saved_quiz.save(update_fields=['last_accessed'])
+            access_tracker.touch(saved_quiz)
             
             return JsonResponse({
                 'message': 'Cuestionario cargado exitosamente',
@@ -240,13 +379,15 @@ def toggle_favorite_question(request, quiz_id):
 
     Body params:
         - question_index (int): Índice de la pregunta a marcar/desmarcar
+        - version (int, opcional): 409 si el quiz cambió desde esa versión;
+          sin ella, un cambio concurrente se resuelve releyendo y reintentando
 
     Returns:
         - favorite_questions: Lista actualizada de preguntas favoritas
         - is_favorite: Estado actual de la pregunta (True si fue marcada, False si fue desmarcada)
     """
-    # Validar que el quiz existe
-    saved_quiz = get_object_or_404(SavedQuiz, id=quiz_id)
+    # Validar que el quiz existe (el rango se valida con question_count, sin cargar los JSON)
+    saved_quiz = get_object_or_404(SavedQuiz.objects.defer(*LIST_DEFERRED_FIELDS), id=quiz_id)
 
     # Obtener el índice de la pregunta del body
     question_index = request.data.get('question_index')
@@ -266,34 +407,49 @@ def toggle_favorite_question(request, quiz_id):
         }, status=status.HTTP_400_BAD_REQUEST)
 
     # Validar que el índice esté dentro del rango válido
-    if question_index < 0 or question_index >= len(saved_quiz.questions):
+    if question_index < 0 or question_index >= saved_quiz.question_count:
         return JsonResponse({
-            'error': f'Índice de pregunta inválido. Debe estar entre 0 y {len(saved_quiz.questions) - 1}'
+            'error': f'Índice de pregunta inválido. Debe estar entre 0 y {saved_quiz.question_count - 1}'
         }, status=status.HTTP_400_BAD_REQUEST)
 
-    # Inicializar favorite_questions si es None o no es una lista
-    if saved_quiz.favorite_questions is None or not isinstance(saved_quiz.favorite_questions, list):
-        saved_quiz.favorite_questions = []
-
-    # Toggle: agregar o remover el índice
-    is_favorite = False
-    if question_index in saved_quiz.favorite_questions:
-        # Ya está marcada, desmarcamos
-        saved_quiz.favorite_questions.remove(question_index)
-        is_favorite = False
-    else:
-        # No está marcada, marcamos
-        saved_quiz.favorite_questions.append(question_index)
-        is_favorite = True
+    expected_version = request.data.get('version')
+    try:
+        expected_version = int(expected_version) if expected_version is not None else None
+    except (ValueError, TypeError):
+        return JsonResponse({
+            'error': 'version debe ser un número entero'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    def toggle(quiz):
+        # Inicializar favorite_questions si es None o no es una lista
+        if quiz.favorite_questions is None or not isinstance(quiz.favorite_questions, list):
+            quiz.favorite_questions = []
+
+        # Toggle: agregar o remover el índice
+        if question_index in quiz.favorite_questions:
+            # Ya está marcada, desmarcamos
+            quiz.favorite_questions.remove(question_index)
+        else:
+            # No está marcada, marcamos
+            quiz.favorite_questions.append(question_index)
 
     # Actualizar solo el campo necesario para optimizar
-    saved_quiz.save(update_fields=['favorite_questions', 'updated_at'])
+    try:
+        saved_quiz = optimistic.modify(
+            saved_quiz, toggle, update_fields=['favorite_questions', 'updated_at'],
+            expected_version=expected_version,
+            reload=lambda: SavedQuiz.objects.defer(*LIST_DEFERRED_FIELDS).get(id=quiz_id),
+        )
+    except optimistic.VersionConflict as e:
+        return optimistic.conflict_response(e)
+    is_favorite = question_index in saved_quiz.favorite_questions
 
     return JsonResponse({
         'message': f'Pregunta {"marcada" if is_favorite else "desmarcada"} como favorita exitosamente',
         'favorite_questions': saved_quiz.favorite_questions,
         'is_favorite': is_favorite,
-        'question_index': question_index
+        'question_index': question_index,
+        'version': saved_quiz.version
     }, status=status.HTTP_200_OK)
 
 
@@ -303,36 +459,36 @@ def quiz_statistics(request):
     GET: Obtiene estadísticas generales de los cuestionarios guardados
     """
     try:
-        # Estadísticas básicas
-        total_quizzes = SavedQuiz.objects.count()
-        completed_quizzes = SavedQuiz.objects.filter(is_completed=True).count()
-        in_progress_quizzes = SavedQuiz.objects.filter(is_completed=False).count()
-        
+        # Totales, dificultades y top de temas salen del resumen incremental
+        # (QuizStatCounter): el costo no depende de cuántos cuestionarios haya
+        counters = list(QuizStatCounter.objects.filter(dimension__in=['all', 'difficulty']))
+        overall = next((c for c in counters if c.dimension == 'all'), None) or QuizStatCounter()
+        total_quizzes = overall.total
+        completed_quizzes = overall.completed
+        in_progress_quizzes = overall.in_progress
+        avg_progress = overall.average_progress
+
         # Estadísticas por tema
-        topic_stats = (SavedQuiz.objects
-                      .values('topic')
-                      .annotate(count=Count('id'))
-                      .order_by('-count')[:10])
-        
+        topic_stats = [
+            {'topic': c.value, 'count': c.total}
+            for c in (QuizStatCounter.objects
+                      .filter(dimension='topic', total__gt=0)
+                      .order_by('-total', 'value')[:10])
+        ]
+
         # Estadísticas por dificultad
-        difficulty_stats = (SavedQuiz.objects
-                           .values('difficulty')
-                           .annotate(count=Count('id'))
-                           .order_by('difficulty'))
-        
-        # Progreso promedio
-        progress_data = SavedQuiz.objects.filter(is_completed=False)
-        avg_progress = 0
-        if progress_data.exists():
-            total_progress = sum([quiz.get_progress_percentage() for quiz in progress_data])
-            avg_progress = total_progress / progress_data.count()
+        difficulty_stats = sorted(
+            ({'difficulty': c.value, 'count': c.total}
+             for c in counters if c.dimension == 'difficulty' and c.total > 0),
+            key=lambda row: row['difficulty'],
+        )
         
         # Cuestionarios más recientes
-        recent_quizzes = SavedQuiz.objects.order_by('-last_accessed')[:5]
+        recent_quizzes = _list_queryset().order_by('-last_accessed')[:5]
         recent_serializer = SavedQuizListSerializer(recent_quizzes, many=True)
         
         # Cuestionarios completados recientemente
-        recent_completed = (SavedQuiz.objects
+        recent_completed = (_list_queryset()
                            .filter(is_completed=True)
                            .order_by('-updated_at')[:5])
         completed_serializer = SavedQuizListSerializer(recent_completed, many=True)
@@ -345,8 +501,8 @@ def quiz_statistics(request):
                 'completion_rate': round((completed_quizzes / total_quizzes * 100) if total_quizzes > 0 else 0, 2),
                 'average_progress': round(avg_progress, 2)
             },
-            'topic_stats': list(topic_stats),
-            'difficulty_stats': list(difficulty_stats),
+            'topic_stats': topic_stats,
+            'difficulty_stats': difficulty_stats,
             'recent_quizzes': recent_serializer.data,
             'recent_completed': completed_serializer.data
         }, status=200)
@@ -372,12 +528,19 @@ def generate_review_quiz(request, quiz_id):
         - original_quiz_id: ID del quiz original para trazabilidad
         - topic: Tema del quiz de repaso
         - count: Cantidad de preguntas generadas
+        - items: Estado por favorita ({index, status, provider?, error?});
+          status ∈ ok | retried | failed | timeout
+
+    Las variantes se piden en paralelo (REVIEW_MAX_WORKERS, deadline común
+    REVIEW_DEADLINE_S). Todas evitan los enunciados base; al recogerlas en orden,
+    una variante que repite una base o una variante anterior se reintenta una
+    vez evitando todo lo ya aceptado, como en el flujo secuencial.
 
     Errores:
         - 404: Quiz no encontrado
         - 400: No hay preguntas marcadas como favoritas
         - 500: Error en la generación de variantes
-        - 503: Sin créditos en proveedores LLM
+        - 503: Sin créditos en proveedores LLM (todas las variantes fallaron por créditos)
     """
     # Validar que el quiz existe
     saved_quiz = get_object_or_404(SavedQuiz, id=quiz_id)
@@ -428,55 +591,71 @@ def generate_review_quiz(request, quiz_id):
         # Recuperar las preguntas favoritas completas
         favorite_base_questions = [questions[idx] for idx in valid_indices]
 
-        # Generar variantes para cada pregunta favorita
-        generated_variants = []
-        seen_phrases = set()
+        # Frases a evitar: todos los enunciados base desde el principio
+        seen_phrases = NearDuplicateIndex(_norm_for_cmp(q.get('question', '')) for q in favorite_base_questions)
 
-        for base_question in favorite_base_questions:
-            # Obtener datos de la pregunta base
-            qtype = base_question.get('type', 'mcq')
-            question_text = base_question.get('question', '')
+        global_avoid = question_fingerprints.avoid_phrases(saved_quiz.category, saved_quiz.difficulty)
 
-            # Agregar el texto de la pregunta base al conjunto de frases a evitar
-            seen_phrases.add(_norm_for_cmp(question_text))
+        def _variant(base_question, avoid_phrases):
+            return _regenerate_with_fallback(
+                topic=saved_quiz.topic,
+                difficulty=saved_quiz.difficulty,
+                qtype=base_question.get('type', 'mcq'),
+                base_q=base_question,
+                avoid_phrases=avoid_phrases,
+                preferred=preferred,
+                global_avoid=global_avoid
+            )
 
-            # Crear conjunto de frases a evitar para esta pregunta
-            avoid_phrases = seen_phrases.copy()
+        avoid_all = frozenset(seen_phrases)
+        results = map_bounded(
+            lambda base_question: _variant(base_question, avoid_all),
+            favorite_base_questions,
+            max_workers=REVIEW_MAX_WORKERS,
+            deadline_s=REVIEW_DEADLINE_S,
+        )
 
-            try:
-                # Llamar a la función de regeneración con fallback
-                variant, provider_used, did_fallback, errors = _regenerate_with_fallback(
-                    topic=saved_quiz.topic,
-                    difficulty=saved_quiz.difficulty,
-                    qtype=qtype,
-                    base_q=base_question,
-                    avoid_phrases=avoid_phrases,
-                    preferred=preferred
-                )
-
-                # Agregar la variante generada
-                generated_variants.append(variant)
-
-                # Agregar el texto de la variante al conjunto de frases a evitar
-                variant_text = variant.get('question', '')
-                seen_phrases.add(_norm_for_cmp(variant_text))
-
-            except RuntimeError as e:
-                if str(e) == "no_providers_available":
-                    return JsonResponse({
-                        'error': 'no_providers_available',
-                        'message': 'No hay créditos disponibles en los proveedores LLM (Perplexity/Gemini).'
-                    }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
-                else:
-                    # Si falla la generación de una variante, continuar con las demás
-                    # pero registrar el error
-                    continue
+        # Aplicar en orden: anti-repetición contra bases y variantes ya aceptadas
+        generated_variants = []
+        items = []
+        for idx, base_question, (ok, result) in zip(valid_indices, favorite_base_questions, results):
+            item = {'index': idx}
+            item_status = 'ok'
+            if ok and _norm_for_cmp(result[0].get('question', '')) in seen_phrases:
+                # Duplicado: un reintento con todo lo aceptado hasta ahora
+                item_status = 'retried'
+                try:
+                    result = _variant(base_question, frozenset(seen_phrases))
+                    ok = _norm_for_cmp(result[0].get('question', '')) not in seen_phrases
+                    if not ok:
+                        result = RuntimeError('duplicate_variant')
+                except Exception as e:
+                    ok, result = False, e
+
+            if not ok:
+                item['status'] = 'timeout' if isinstance(result, DeadlineExceeded) else 'failed'
+                item['error'] = str(result) or result.__class__.__name__
+                items.append(item)
+                continue
+
+            variant, provider_used, did_fallback, _ = result
+            generated_variants.append(variant)
+            seen_phrases.add(_norm_for_cmp(variant.get('question', '')))
+            item.update(status=item_status, provider=provider_used, fallback_used=did_fallback)
+            items.append(item)
 
         # Verificar que se generaron al menos algunas variantes
         if not generated_variants:
+            if all(item.get('error') == 'no_providers_available' for item in items):
+                return JsonResponse({
+                    'error': 'no_providers_available',
+                    'message': 'No hay créditos disponibles en los proveedores LLM (Perplexity/Gemini).',
+                    'items': items
+                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
             return JsonResponse({
                 'error': 'No se pudieron generar variantes',
-                'message': 'No fue posible generar variantes para ninguna de las preguntas favoritas.'
+                'message': 'No fue posible generar variantes para ninguna de las preguntas favoritas.',
+                'items': items
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         # Crear una nueva GenerationSession para el quiz de repaso
@@ -510,7 +689,9 @@ def generate_review_quiz(request, quiz_id):
             'questions': generated_variants,
             'count': len(generated_variants),
             'types': types,
-            'counts': types_count
+            'counts': types_count,
+            'items': items,
+            'failed': sum(1 for item in items if item['status'] in ('failed', 'timeout'))
         }, status=status.HTTP_201_CREATED)
 
     except Exception as e:
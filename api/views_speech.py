@@ -1,9 +1,11 @@
 # api/views_speech.py
-import os, requests
+import os
 from django.http import JsonResponse
 from django.views.decorators.http import require_GET
 from django.conf import settings
 
+from .services import http_client
+
 SPEECH_KEY = os.getenv("AZURE_SPEECH_KEY") or getattr(settings, "AZURE_SPEECH_KEY", None)
 SPEECH_REGION = os.getenv("AZURE_SPEECH_REGION") or getattr(settings, "AZURE_SPEECH_REGION", None)
 
@@ -12,7 +14,7 @@ def speech_token(request):
     if not SPEECH_KEY or not SPEECH_REGION:
         return JsonResponse({"error": "Missing AZURE_SPEECH_KEY/AZURE_SPEECH_REGION"}, status=500)
 
-    r = requests.post(
+    r = http_client.post(
         f"https://{SPEECH_REGION}.api.cognitive.microsoft.com/sts/v1.0/issueToken",
         headers={"Ocp-Apim-Subscription-Key": SPEECH_KEY},
         timeout=10,
@@ -0,0 +1,27 @@
+# api/views_topics.py
+from django.http import JsonResponse
+from rest_framework.decorators import api_view
+
+from .services import topic_suggest
+
+MAX_SUGGEST_LIMIT = 20
+
+
+@api_view(["GET"])
+def suggest_topics(request):
+    """
+    GET /api/topics/suggest/?q=<texto>&limit=8
+    Autocompletado de temas válidos (taxonomía + temas populares), por prefijo
+    de cualquier palabra y sin distinguir tildes/mayúsculas.
+    """
+    q = request.GET.get("q", "")
+    try:
+        limit = int(request.GET.get("limit", 8))
+    except (TypeError, ValueError):
+        return JsonResponse({"error": "limit debe ser entero"}, status=400)
+    limit = max(1, min(limit, MAX_SUGGEST_LIMIT))
+
+    resp = JsonResponse({"q": q, "suggestions": topic_suggest.suggest(q, limit=limit)}, status=200)
+    # incluye temas escritos por otros usuarios: sin cachés compartidas
+    resp["Cache-Control"] = "private, max-age=60"
+    return resp
@@ -145,6 +145,34 @@ DATABASES = {
     )
 }
 
+# -------------------------
+# Caché
+# -------------------------
+# El circuit breaker y los contadores de llm_stats viven en la caché. Sólo se
+# comparten entre workers de gunicorn con REDIS_URL; sin ella cada proceso usa
+# su LocMemCache y tiene su propio circuito y sus propios contadores.
+REDIS_URL = os.getenv("REDIS_URL", "")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+
+# -------------------------
+# Escrituras diferidas (api/services/write_behind)
+# -------------------------
+# Con WRITE_BEHIND_SYNC cada elemento se escribe al momento en la petición. Se
+# activa solo con `manage.py test`: el volcado de atexit llegaría con la BD de
+# tests ya borrada, y los tests ven los eventos sin esperar al hilo.
+TESTING = len(sys.argv) > 1 and sys.argv[1] == "test"
+WRITE_BEHIND_SYNC = os.getenv("WRITE_BEHIND_SYNC", "false").lower() in ("1", "true", "yes") or TESTING
+
 # -------------------------
 # Password validators
 # -------------------------